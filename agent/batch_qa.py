@@ -0,0 +1,148 @@
+"""
+batch_qa.py
+
+Batch question answering for offline evaluation and cache warming.
+
+Questions are read from a JSONL file (one object per line with a
+``pregunta``/``question`` field and optional ``id`` and ``idioma``) or a CSV
+file with the same columns, and answered with the same pipeline the app
+serves: FAQ store, BM25 fast path, semantic answer cache, fused retrieval,
+extractive routing and generation. Only the expensive calls are batched: one
+embedding call, one Qdrant ``search_batch`` request and one padded flan-t5
+``generate`` call per batch.
+
+Each output line holds the answer, the route that produced it, the retrieved
+passage ids and scores, and per-question timings in milliseconds. Embedding, search and
+generation run per batch, so their timings are the batch time divided by the
+questions that went through them. The output file can be loaded into the
+answer cache with ANSWER_CACHE_SEED.
+
+Usage:
+    python agent/batch_qa.py preguntas.jsonl --salida data/eval/respuestas.jsonl
+"""
+
+# === Imports ===
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import os
+import csv
+import json
+import time
+import argparse
+from typing import Iterator, List
+
+from dotenv import load_dotenv
+from qdrant_client import QdrantClient
+from agent.rag_agent import responder_preguntas_lote
+from utils.language_detection import resolver_idioma
+
+# === Load environment variables ===
+load_dotenv()
+
+# === Input ===
+def leer_preguntas(ruta: Path) -> List[dict]:
+    """
+    Read questions from a JSONL or CSV file.
+
+    Returns:
+        List[dict]: Records with ``id``, ``pregunta`` and ``idioma`` ("" if not given).
+    """
+    with ruta.open(encoding="utf-8", newline="") as archivo:
+        if ruta.suffix.lower() == ".csv":
+            filas = list(csv.DictReader(archivo))
+        else:
+            filas = [json.loads(linea) for linea in archivo if linea.strip()]
+
+    preguntas = []
+    for posicion, fila in enumerate(filas):
+        pregunta = (fila.get("pregunta") or fila.get("question") or "").strip()
+        if pregunta:
+            preguntas.append({
+                "id": fila.get("id") or str(posicion),
+                "pregunta": pregunta,
+                "idioma": fila.get("idioma") or fila.get("language") or "",
+            })
+    return preguntas
+
+
+def agrupar(registros: List[dict], tamano: int) -> Iterator[List[dict]]:
+    for inicio in range(0, len(registros), tamano):
+        yield registros[inicio:inicio + tamano]
+
+# === Pipeline ===
+def responder_lote(cliente: QdrantClient, lote: List[dict], k: int, max_tokens: int) -> List[dict]:
+    """
+    Answer a batch of questions with the served pipeline (see responder_preguntas_lote).
+
+    Args:
+        cliente (QdrantClient): Connected Qdrant client.
+        lote (List[dict]): Question records (see leer_preguntas).
+        k (int): Passages retrieved per question.
+        max_tokens (int): Maximum tokens generated per answer.
+
+    Returns:
+        List[dict]: One result record per question, in the same order.
+    """
+    preguntas = [registro["pregunta"] for registro in lote]
+    idiomas = [resolver_idioma(registro["pregunta"], registro["idioma"]) for registro in lote]
+    resultados = responder_preguntas_lote(preguntas, cliente, idiomas, k, max_tokens)
+
+    salida = []
+    for registro, idioma, resultado in zip(lote, idiomas, resultados):
+        salida.append({
+            "id": registro["id"],
+            "pregunta": registro["pregunta"],
+            "idioma": idioma,
+            "respuesta": resultado["respuesta"],
+            "ruta": resultado["ruta"],
+            "ids_pasajes": [str(clave) for clave, _, _ in resultado["hits"]],
+            "puntuaciones": [puntuacion for *_, puntuacion in resultado["hits"]],
+            "tiempos_ms": {etapa: round(ms, 3) for etapa, ms in resultado["tiempos_ms"].items()},
+        })
+    return salida
+
+
+def percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+# === Main ===
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Answer a file of questions with the RAG pipeline in batches.")
+    parser.add_argument("entrada", type=Path, help="Questions (.jsonl or .csv).")
+    parser.add_argument("--salida", type=Path, default=Path("data/eval/respuestas.jsonl"))
+    parser.add_argument("--k", type=int, default=3, help="Passages retrieved per question.")
+    parser.add_argument("--lote", type=int, default=16, help="Questions per batch.")
+    parser.add_argument("--max-tokens", type=int, default=256)
+    args = parser.parse_args()
+
+    preguntas = leer_preguntas(args.entrada)
+    if not preguntas:
+        print(f"⚠️ No questions found in {args.entrada}.")
+        return
+
+    cliente_qdrant = QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"))
+    args.salida.parent.mkdir(parents=True, exist_ok=True)
+
+    totales = []
+    inicio = time.perf_counter()
+    with args.salida.open("w", encoding="utf-8") as archivo:
+        for lote in agrupar(preguntas, args.lote):
+            for resultado in responder_lote(cliente_qdrant, lote, args.k, args.max_tokens):
+                archivo.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+                totales.append(resultado["tiempos_ms"]["total"])
+            print(f"🔄 {len(totales)}/{len(preguntas)} questions answered.")
+    segundos = time.perf_counter() - inicio
+
+    print(
+        f"✅ {len(totales)} answers saved to {args.salida} in {segundos:.1f}s "
+        f"({len(totales) / segundos:.1f} questions/s) — per question p50 {percentil(totales, 50):.0f} ms, "
+        f"p95 {percentil(totales, 95):.0f} ms."
+    )
+    print(f"ℹ️ Set ANSWER_CACHE_SEED={args.salida} to load these answers into the app's answer cache.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+faq_store.py
+
+Precomputed answer store for frequent recruiter questions.
+
+Canonical questions (and their paraphrases) are listed per language in
+``data/faq/preguntas.json``. The rebuild command embeds every question and
+fills missing answers by running the RAG pipeline in batch, then writes one
+compact store per language to ``data/cache/faq/`` (untracked build output):
+a normalized float16 matrix (``<idioma>.npy``) and the answers
+(``<idioma>.json``). At startup the store is loaded into
+memory and questions are matched by normalized text first and then by cosine
+similarity, so frequent questions are answered without search or generation.
+
+Generated answers are written back to ``preguntas.json`` with
+``"revisada": false`` so they can be reviewed and edited; only reviewed
+answers are served unless the store is built with ``--incluir-sin-revisar``.
+
+Usage:
+    python agent/faq_store.py                       # rebuild after the knowledge base changes
+    python agent/faq_store.py --incluir-sin-revisar # also serve answers nobody has reviewed yet
+"""
+
+# === Imports ===
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import os
+import json
+import argparse
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+from vector_db.embedding_client import DIMENSION_EMBEDDING, embed_textos, modelo_embeddings, normalizar_texto
+
+# === Load environment variables ===
+load_dotenv()
+
+# === Constants ===
+DIRECTORIO_FAQ = Path(os.getenv("FAQ_DIR", "data/faq"))
+RUTA_PREGUNTAS = DIRECTORIO_FAQ / "preguntas.json"
+DIRECTORIO_ALMACEN_FAQ = Path(os.getenv("FAQ_STORE_DIR", "data/cache/faq"))  # Built store, rebuilt from RUTA_PREGUNTAS
+UMBRAL_FAQ = float(os.getenv("FAQ_THRESHOLD", "0.9"))  # Min cosine similarity
+
+# === Store ===
+class AlmacenFAQ:
+    """
+    In-memory FAQ index for one or more languages.
+
+    Args:
+        umbral (float): Minimum cosine similarity for an embedding match.
+    """
+
+    def __init__(self, umbral: float = UMBRAL_FAQ):
+        self.umbral = umbral
+        self._exactas: Dict[str, Dict[str, str]] = {}
+        self._matrices: Dict[str, np.ndarray] = {}
+        self._respuestas: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(respuestas) for respuestas in self._respuestas.values())
+
+    def cargar(self, directorio: Path = DIRECTORIO_ALMACEN_FAQ) -> "AlmacenFAQ":
+        """Load every ``<idioma>.json``/``<idioma>.npy`` pair built with the current embedding model."""
+        for ruta_meta in sorted(Path(directorio).glob("*.json")):
+            ruta_matriz = ruta_meta.with_suffix(".npy")
+            if not ruta_matriz.exists():
+                continue
+
+            meta = json.loads(ruta_meta.read_text(encoding="utf-8"))
+            if meta.get("modelo") != modelo_embeddings:
+                print(f"⚡ Skipping {ruta_meta}: built with {meta.get('modelo')}, current model is {modelo_embeddings}.")
+                continue
+
+            idioma = meta["idioma"]
+            self._respuestas[idioma] = [entrada["respuesta"] for entrada in meta["entradas"]]
+            self._matrices[idioma] = np.load(ruta_matriz, mmap_mode="r").astype(np.float32)
+            self._exactas[idioma] = {
+                normalizar_texto(entrada["pregunta"]): entrada["respuesta"] for entrada in meta["entradas"]
+            }
+        return self
+
+    def buscar_texto(self, pregunta: str, idioma: str) -> Optional[str]:
+        """Return the answer of a question that matches a stored one after normalization."""
+        return self._exactas.get(idioma, {}).get(normalizar_texto(pregunta))
+
+    def buscar(self, vector: Optional[List[float]], idioma: str) -> Optional[str]:
+        """Return the answer of the most similar stored question, if above the threshold."""
+        matriz = self._matrices.get(idioma)
+        if matriz is None or not len(matriz) or not vector:
+            return None
+
+        consulta = np.asarray(vector, dtype=np.float32)
+        norma = np.linalg.norm(consulta)
+        similitudes = matriz @ (consulta / norma if norma else consulta)
+        mejor = int(np.argmax(similitudes))
+        return self._respuestas[idioma][mejor] if similitudes[mejor] >= self.umbral else None
+
+# === Build ===
+def construir_almacen(
+    preguntas: Dict[str, List[dict]],
+    directorio: Path = DIRECTORIO_ALMACEN_FAQ,
+    incluir_sin_revisar: bool = False,
+) -> Dict[str, int]:
+    """
+    Write the per-language store files from canonical questions with answers.
+
+    Every canonical question and paraphrase gets its own row pointing to the
+    entry's answer.
+
+    Args:
+        preguntas (Dict[str, List[dict]]): Entries per language (``pregunta``,
+            ``variantes``, ``respuesta``, ``revisada``).
+        directorio (Path): Output directory.
+        incluir_sin_revisar (bool): Also store answers marked ``"revisada": false``.
+
+    Returns:
+        Dict[str, int]: Stored rows per language.
+    """
+    directorio.mkdir(parents=True, exist_ok=True)
+    filas_por_idioma = {}
+
+    for idioma, entradas in preguntas.items():
+        filas = []
+        for entrada in entradas:
+            if not entrada.get("respuesta") or not (entrada.get("revisada", True) or incluir_sin_revisar):
+                continue
+            for pregunta in [entrada["pregunta"], *entrada.get("variantes", [])]:
+                filas.append({"pregunta": pregunta, "respuesta": entrada["respuesta"]})
+
+        vectores = np.asarray(embed_textos([fila["pregunta"] for fila in filas]), dtype=np.float32)
+        vectores = vectores.reshape(len(filas), DIMENSION_EMBEDDING)
+        normas = np.linalg.norm(vectores, axis=1, keepdims=True)
+        normas[normas == 0] = 1.0
+        np.save(directorio / f"{idioma}.npy", (vectores / normas).astype(np.float16))
+
+        meta = {
+            "idioma": idioma,
+            "modelo": modelo_embeddings,
+            "creado": datetime.now().isoformat(timespec="seconds"),
+            "entradas": filas,
+        }
+        (directorio / f"{idioma}.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+        filas_por_idioma[idioma] = len(filas)
+
+    return filas_por_idioma
+
+
+def generar_respuestas_pendientes(preguntas: Dict[str, List[dict]], k: int = 3, lote: int = 16) -> int:
+    """
+    Fill entries without an answer by running the RAG pipeline in batch.
+
+    Generated answers are marked ``"revisada": false``.
+
+    Returns:
+        int: Number of answers generated.
+    """
+    from qdrant_client import QdrantClient
+    from agent.batch_qa import agrupar, responder_lote
+    from agent.rag_agent import es_respuesta_fallida
+
+    pendientes = [
+        (entrada, {"id": str(i), "pregunta": entrada["pregunta"], "idioma": idioma})
+        for idioma, entradas in preguntas.items()
+        for i, entrada in enumerate(entradas)
+        if not entrada.get("respuesta")
+    ]
+    if not pendientes:
+        return 0
+
+    cliente_qdrant = QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"))
+    generadas = 0
+    for grupo in agrupar(pendientes, lote):
+        resultados = responder_lote(cliente_qdrant, [registro for _, registro in grupo], k, max_tokens=256)
+        for (entrada, _), resultado in zip(grupo, resultados):
+            if not es_respuesta_fallida(resultado["respuesta"]):
+                entrada["respuesta"] = resultado["respuesta"]
+                entrada["revisada"] = False
+                generadas += 1
+    return generadas
+
+# === Main ===
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the precomputed FAQ answer store.")
+    parser.add_argument("--preguntas", type=Path, default=RUTA_PREGUNTAS)
+    parser.add_argument("--salida", type=Path, default=DIRECTORIO_ALMACEN_FAQ)
+    parser.add_argument("--incluir-sin-revisar", action="store_true", help="Also serve answers not reviewed yet.")
+    parser.add_argument("--regenerar", action="store_true", help="Regenerate answers not reviewed yet.")
+    args = parser.parse_args()
+
+    preguntas = json.loads(args.preguntas.read_text(encoding="utf-8"))
+    if args.regenerar:
+        for entradas in preguntas.values():
+            for entrada in entradas:
+                if entrada.get("revisada") is False:
+                    entrada.pop("respuesta", None)
+
+    generadas = generar_respuestas_pendientes(preguntas)
+    if generadas:
+        args.preguntas.write_text(json.dumps(preguntas, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"📝 {generadas} answers generated and saved to {args.preguntas} with \"revisada\": false.")
+
+    filas = construir_almacen(preguntas, args.salida, args.incluir_sin_revisar)
+    for idioma, n in filas.items():
+        print(f"✅ {idioma}: {n} questions stored in {args.salida / (idioma + '.npy')}.")
+
+
+if __name__ == "__main__":
+    main()
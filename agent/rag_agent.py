@@ -4,25 +4,77 @@ This module handles document retrieval and answer generation
 based on recruiter questions.
 
 Functions:
-    cargar_qdrant(): Load a Qdrant client from environment variables.
+    cargar_qdrant(): Return the pooled Qdrant client of the managed connection.
+    obtener_conexion_qdrant(): Process-wide Qdrant connection with health checks and reconnects.
+    buscar_hits_relevantes(pregunta, cliente, k): Retrieve top-k scored passages and whether they are confident.
     buscar_contexto_relevante(pregunta, client, k): Retrieve top-k relevant context passages.
+    buscar_hits_densos_lote(cliente, vectores, k): Dense hits for several questions in one request.
+    buscar_contexto_lexico(pregunta, cliente, k): BM25 hits and whether they can skip dense retrieval.
+    responder_extractivo(pregunta, hits, idioma): Answer from the best passage sentences without the generator.
+    construir_prompt(contexto, pregunta, idioma): Build the language-specific generation prompt.
+    obtener_control_admision(): Process-wide admission controller for the generation stage.
     generar_respuesta(contexto, pregunta, idioma): Generate a final answer based on retrieved context and question.
+    generar_respuesta_stream(contexto, pregunta, idioma): Stream the answer as text deltas.
+    responder_pregunta(pregunta, cliente, idioma): Full pipeline with a semantic answer cache in front of generation.
+    responder_pregunta_stream(pregunta, cliente, idioma): Streaming variant of responder_pregunta.
+    responder_preguntas_lote(preguntas, cliente, idiomas): Served pipeline for many questions with batched stages.
+    invalidar_cache_respuestas(): Drop every cached answer (e.g. after re-ingesting documents).
+    precargar_cache_respuestas(ruta): Seed the answer cache from a batch QA output file.
+    responder_desde_faq(pregunta, idioma): Answer from the precomputed FAQ store, if it matches.
+    cargar_qdrant_async(): Load an AsyncQdrantClient from environment variables.
+    buscar_hits_relevantes_async(pregunta, cliente_async, k): Non-blocking scored retrieval.
+    buscar_contexto_relevante_async(pregunta, cliente_async, k): Non-blocking context retrieval.
+    generar_respuesta_async(contexto, pregunta, idioma): Generate an answer in the generation executor.
+    generar_respuesta_stream_en_ejecutor(contexto, pregunta, idioma): Stream an answer decoded from the generation executor.
+    responder_pregunta_async(pregunta, cliente, cliente_async, idioma): Async pipeline with non-blocking stages.
 """
 
 # === Imports ===
 import os
-from typing import List
+import json
+import math
+import hashlib
+import time
+import queue
+import asyncio
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+import grpc
+import httpx
+import numpy as np
+import streamlit as st
 from dotenv import load_dotenv
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams
-from vector_db.embedding_client import embed_texto
-from vector_db.generate_response_hf import generar_respuesta_hf
-
-# Optional: automatic language detection
-try:
-    from langdetect import detect
-except ImportError:
-    detect = lambda text: "es"  # fallback to Spanish
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from qdrant_client.models import SearchRequest
+from vector_db.embedding_client import buscar_embedding_en_cache, embed_texto, embed_texto_async, embed_textos
+from vector_db.generate_response_hf import (
+    contar_tokens,
+    generar_respuesta_hf,
+    generar_respuesta_hf_stream,
+    generar_respuestas_hf_lote,
+)
+from utils.text_processing import dividir_frases, empaquetar_contexto
+from utils.language_detection import detectar_idioma
+from vector_db.local_index import IndiceLocal
+from vector_db.lexical_index import IndiceBM25, fusionar_rrf, tokenizar
+from agent.faq_store import AlmacenFAQ
+from utils.admission import MAX_COLA_GENERACION, MAX_GENERACIONES_CONCURRENTES, ControlAdmision
+from utils.deadline import Plazo
+from vector_db.collection_profile import crear_coleccion, obtener_perfil, parametros_busqueda
+from utils.metrics import (
+    continuar_traza,
+    incrementar,
+    medir_etapa,
+    nueva_traza,
+    observar,
+    registrar_duracion,
+    registrar_gauge,
+    traza_actual,
+)
 
 # === Load Environment Variables ===
 load_dotenv()
@@ -32,100 +84,1482 @@ QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 VECTOR_SIZE = 384
 COLLECTION_NAME = "itsmehi_collection"
-MAX_CONTEXT_LENGTH = 3000  # Limit context length to 3000 characters
+MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", "400"))  # Encoder token budget for the context
+FRACCION_MINIMA_CONTEXTO = float(os.getenv("CONTEXT_MIN_SCORE_RATIO", "0.5"))  # Of the best passage's score
+
+# Managed connection
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "0") == "1"
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "10"))  # Seconds
+TAMANO_POOL_QDRANT = int(os.getenv("QDRANT_POOL_SIZE", "10"))  # Pooled HTTP connections
+INTERVALO_SALUD_QDRANT = float(os.getenv("QDRANT_HEALTH_INTERVAL", "30"))  # Seconds
+
+# Collection profile (quantization, HNSW and search-time settings, see vector_db/collection_profile.py)
+PERFIL_QDRANT = obtener_perfil()
+PARAMETROS_BUSQUEDA = parametros_busqueda(PERFIL_QDRANT)
+
+# Retrieval mode: "qdrant" searches Qdrant Cloud, "local" searches an in-process mirror
+MODO_INDICE = os.getenv("INDEX_MODE", "qdrant").lower()
+DTYPE_INDICE_LOCAL = os.getenv("LOCAL_INDEX_DTYPE", "float32")
+INTERVALO_REFRESCO_INDICE = float(os.getenv("LOCAL_INDEX_REFRESH_INTERVAL", "60"))  # Seconds
+MAX_ANTIGUEDAD_INDICE = float(os.getenv("LOCAL_INDEX_MAX_STALENESS", "600"))  # Seconds
+
+# Lexical fast path: BM25 over the chunk texts, fused with dense hits by reciprocal rank fusion
+BUSQUEDA_LEXICA = os.getenv("LEXICAL_SEARCH", "1") == "1"
+UMBRAL_COBERTURA_LEXICA = float(os.getenv("LEXICAL_MIN_COVERAGE", "0.75"))  # Share of the question's IDF mass
+MARGEN_LEXICO = float(os.getenv("LEXICAL_MIN_MARGIN", "1.2"))  # Best / second-best BM25 score
+
+# Extractive answers: confident retrievals are answered with the best passage sentences, skipping flan-t5
+RESPUESTAS_EXTRACTIVAS = os.getenv("EXTRACTIVE_ANSWERS", "1") == "1"
+UMBRAL_EXTRACTIVO = float(os.getenv("EXTRACTIVE_MIN_SCORE", "0.75"))  # Cosine similarity of the best dense hit
+MARGEN_EXTRACTIVO = float(os.getenv("EXTRACTIVE_MIN_MARGIN", "0.05"))  # Over the second dense hit
+MAX_FRASES_EXTRACTIVAS = int(os.getenv("EXTRACTIVE_MAX_SENTENCES", "3"))
+PASAJES_EXTRACTIVOS = 2  # Top passages sentences are taken from
+COBERTURA_EXTRACTIVA = 0.4  # Min share of the question's terms in the best sentence
+PLANTILLAS_EXTRACTIVAS = {
+    "es": "Esto es lo que puedo contarte: {}",
+    "en": "Here's what I can tell you: {}",
+}
+
+# Semantic answer cache
+UMBRAL_CACHE_RESPUESTAS = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # Min cosine similarity
+TTL_CACHE_RESPUESTAS = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # Seconds
+MAX_CACHE_RESPUESTAS = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+INTERVALO_COMPROBACION_COLECCION = float(os.getenv("ANSWER_CACHE_CHECK_INTERVAL", "60"))  # Seconds
+LOTE_HUELLA_COLECCION = 1024  # Point ids per scroll request when fingerprinting the collection
+SEMILLA_CACHE_RESPUESTAS = os.getenv("ANSWER_CACHE_SEED")  # Batch QA output (JSONL) loaded at startup
+
+# Async pipeline: embedding and search off the script thread, generation in an executor
+PIPELINE_ASYNC = os.getenv("RAG_ASYNC", "1") == "1"
+# Requests waiting in the admission queue hold a worker too, so the default covers running plus queued ones
+HILOS_GENERACION = int(os.getenv("GENERATION_WORKERS", str(MAX_GENERACIONES_CONCURRENTES + MAX_COLA_GENERACION)))
+
+# Per-stage time budgets within the request deadline (REQUEST_DEADLINE, see utils/deadline.py)
+PRESUPUESTO_EMBEDDING = float(os.getenv("EMBEDDING_BUDGET", "5"))  # Seconds
+PRESUPUESTO_BUSQUEDA = float(os.getenv("SEARCH_BUDGET", "5"))  # Seconds
+
+# Fallback answers (never cached)
+RESPUESTA_VACIA = "⚠️ No se pudo generar una respuesta útil."
+RESPUESTA_TIMEOUT = "⚡ El modelo no respondió a tiempo. Intenta nuevamente."
+RESPUESTA_SATURADA = "🚦 Hay muchas preguntas en curso ahora mismo. Inténtalo de nuevo en unos segundos."
+RESPUESTA_DEGRADADA = "⚡ No me dio tiempo a elaborar la respuesta. Esto es lo más relevante que encontré:"
 
 # === Qdrant connection ===
+class ConexionQdrant:
+    """
+    Process-wide managed Qdrant connection.
+
+    The client is created once (REST with a pooled HTTP client, or gRPC when
+    QDRANT_PREFER_GRPC=1), the collection is checked once at startup, and a
+    background thread pings Qdrant periodically, replacing the client with a
+    fresh one when the ping fails. After each successful ping the same thread
+    runs the periodic tasks (e.g. the answer cache's collection fingerprint),
+    so their Qdrant round trips never land on a user request.
+    """
+
+    def __init__(
+        self,
+        intervalo_salud: float = INTERVALO_SALUD_QDRANT,
+        tareas_periodicas: Sequence[Callable[[QdrantClient], None]] = (),
+    ):
+        self.intervalo_salud = intervalo_salud
+        self.tareas_periodicas = list(tareas_periodicas)
+        self.sana = False
+        self.reconexiones = 0
+        self._cliente = self._conectar()
+        self._asegurar_coleccion()
+        self.sana = True
+        self._parar = threading.Event()
+        threading.Thread(target=self._vigilar, name="salud-qdrant", daemon=True).start()
+
+    @staticmethod
+    def _conectar() -> QdrantClient:
+        return QdrantClient(
+            url=QDRANT_URL,
+            api_key=QDRANT_API_KEY,
+            prefer_grpc=QDRANT_PREFER_GRPC,
+            timeout=QDRANT_TIMEOUT,
+            limits=httpx.Limits(max_connections=TAMANO_POOL_QDRANT, max_keepalive_connections=TAMANO_POOL_QDRANT),
+        )
+
+    @property
+    def cliente(self) -> QdrantClient:
+        return self._cliente
+
+    def _asegurar_coleccion(self) -> None:
+        colecciones = self._cliente.get_collections().collections
+        nombres = [col.name for col in colecciones]
+
+        if COLLECTION_NAME not in nombres:
+            crear_coleccion(self._cliente, COLLECTION_NAME, VECTOR_SIZE, PERFIL_QDRANT)
+
+    def comprobar_salud(self) -> bool:
+        """Ping Qdrant and reconnect if the current client no longer answers."""
+        try:
+            self._cliente.get_collections()
+            self.sana = True
+            return True
+        except Exception as error:
+            print(f"⚡ Qdrant health check failed, reconnecting: {error}")
+
+        try:
+            nuevo = self._conectar()
+            nuevo.get_collections()
+        except Exception as error:
+            print(f"⚡ Qdrant reconnection failed: {error}")
+            self.sana = False
+            return False
+
+        anterior, self._cliente = self._cliente, nuevo
+        self.reconexiones += 1
+        self.sana = True
+        try:
+            anterior.close()
+        except Exception:
+            pass
+        return True
+
+    def _ejecutar_tareas(self) -> None:
+        for tarea in self.tareas_periodicas:
+            try:
+                tarea(self._cliente)
+            except Exception as error:
+                print(f"⚡ Periodic Qdrant task failed: {error}")
+
+    def _vigilar(self) -> None:
+        self._ejecutar_tareas()
+        while not self._parar.wait(self.intervalo_salud):
+            if self.comprobar_salud():
+                self._ejecutar_tareas()
+
+    def cerrar(self) -> None:
+        self._parar.set()
+        self._cliente.close()
+
+
+@st.cache_resource(show_spinner="🔗 Connecting to Qdrant Cloud...")
+def obtener_conexion_qdrant() -> ConexionQdrant:
+    """Return the process-wide managed Qdrant connection."""
+    conexion = ConexionQdrant(tareas_periodicas=[cache_respuestas.comprobar_coleccion])
+    registrar_gauge(
+        "qdrant_connection",
+        lambda: {"sana": float(conexion.sana), "reconexiones": conexion.reconexiones},
+        "Qdrant connection health and reconnections since startup.",
+    )
+    return conexion
+
+
 def cargar_qdrant() -> QdrantClient:
     """
     Load a Qdrant client connected to Qdrant Cloud.
 
+    The client comes from the process-wide managed connection, so Streamlit
+    reruns reuse it instead of reconnecting and re-checking the collection.
+
     Returns:
         QdrantClient: A Qdrant client instance.
     """
-    cliente = QdrantClient(
-        url=QDRANT_URL,
-        api_key=QDRANT_API_KEY,
+    return obtener_conexion_qdrant().cliente
+
+# === In-process index ===
+@st.cache_resource(show_spinner="🧠 Loading local vector index...")
+def obtener_indice_local(_cliente: QdrantClient) -> IndiceLocal:
+    """
+    Build the process-wide in-memory mirror of the collection.
+
+    Args:
+        _cliente (QdrantClient): Connected Qdrant client (not hashed by Streamlit).
+
+    Returns:
+        IndiceLocal: The loaded index.
+    """
+    indice = IndiceLocal(
+        COLLECTION_NAME,
+        dtype=DTYPE_INDICE_LOCAL,
+        intervalo_refresco=INTERVALO_REFRESCO_INDICE,
+        max_antiguedad=MAX_ANTIGUEDAD_INDICE,
+    )
+    indice.construir(_cliente)
+    return indice
+
+@st.cache_resource(show_spinner="🔤 Building keyword index...")
+def obtener_indice_bm25(_cliente: QdrantClient) -> IndiceBM25:
+    """
+    Build the process-wide BM25 index over the collection's chunk texts.
+
+    Args:
+        _cliente (QdrantClient): Connected Qdrant client (not hashed by Streamlit).
+
+    Returns:
+        IndiceBM25: The loaded index.
+    """
+    indice = IndiceBM25(
+        COLLECTION_NAME,
+        intervalo_refresco=INTERVALO_REFRESCO_INDICE,
+        umbral_cobertura=UMBRAL_COBERTURA_LEXICA,
+        margen=MARGEN_LEXICO,
     )
+    indice.construir(_cliente)
+    return indice
+
+# === Semantic answer cache ===
+class CacheSemanticaRespuestas:
+    """
+    Cache of generated answers indexed by the embedding of their question.
+
+    A new question is served from the cache when a previous question in the
+    same language has a cosine similarity above the threshold. Entries expire
+    after a TTL, the oldest are evicted beyond the size limit, and the whole
+    cache is dropped when the Qdrant collection changes.
+    """
+
+    def __init__(self, umbral: float, ttl: float, max_entradas: int):
+        self.umbral = umbral
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.hits = 0
+        self.misses = 0
+        self._entradas: "OrderedDict[int, dict]" = OrderedDict()
+        self._siguiente_id = 0
+        self._huella_coleccion = None
+        self._ultima_comprobacion = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalizar(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norma = np.linalg.norm(array)
+        return array / norma if norma else array
+
+    def _purgar_caducadas(self, ahora: float) -> None:
+        caducadas = [clave for clave, entrada in self._entradas.items() if ahora - entrada["creada"] > self.ttl]
+        for clave in caducadas:
+            del self._entradas[clave]
+
+    def buscar(self, vector: List[float], idioma: str) -> Optional[str]:
+        """Return the cached answer of the most similar previous question, if above the threshold."""
+        consulta = self._normalizar(vector)
+
+        with self._lock:
+            self._purgar_caducadas(time.time())
+            candidatas = [(clave, e) for clave, e in self._entradas.items() if e["idioma"] == idioma]
+
+            if candidatas:
+                matriz = np.stack([e["vector"] for _, e in candidatas])
+                similitudes = matriz @ consulta
+                mejor = int(np.argmax(similitudes))
+
+                if similitudes[mejor] >= self.umbral:
+                    clave, entrada = candidatas[mejor]
+                    self._entradas.move_to_end(clave)
+                    self.hits += 1
+                    incrementar("answer_cache_total", resultado="hit")
+                    return entrada["respuesta"]
+
+            self.misses += 1
+            incrementar("answer_cache_total", resultado="miss")
+            return None
+
+    def guardar(self, vector: List[float], idioma: str, pregunta: str, respuesta: str) -> None:
+        """Store an answer for a question embedding."""
+        with self._lock:
+            self._entradas[self._siguiente_id] = {
+                "vector": self._normalizar(vector),
+                "idioma": idioma,
+                "pregunta": pregunta,
+                "respuesta": respuesta,
+                "creada": time.time(),
+            }
+            self._siguiente_id += 1
+
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self) -> None:
+        """Drop every cached answer."""
+        with self._lock:
+            self._entradas.clear()
+
+    @staticmethod
+    def _hash_contenido(cliente: QdrantClient) -> str:
+        """Hash of the collection's point ids (content-hash ids, see ingest_documents.py)."""
+        ids = []
+        desplazamiento = None
+        while True:
+            puntos, desplazamiento = cliente.scroll(
+                collection_name=COLLECTION_NAME,
+                limit=LOTE_HUELLA_COLECCION,
+                offset=desplazamiento,
+                with_payload=False,
+                with_vectors=False,
+            )
+            ids.extend(str(punto.id) for punto in puntos)
+            if desplazamiento is None:
+                break
+        return hashlib.sha1("\n".join(sorted(ids)).encode("utf-8")).hexdigest()
+
+    def comprobar_coleccion(self, cliente: QdrantClient) -> None:
+        """
+        Invalidate the cache if the Qdrant collection changed since the last check.
+
+        Runs on the Qdrant health thread (see ConexionQdrant), at most once per
+        check interval; requests only read the cache. Besides the point and
+        segment counts it hashes every point id, which ingestion derives from
+        the chunk content, so re-ingesting edited documents with the same
+        number of chunks still invalidates the cache.
+        """
+        ahora = time.time()
+        if ahora - self._ultima_comprobacion < INTERVALO_COMPROBACION_COLECCION:
+            return
+        self._ultima_comprobacion = ahora
+
+        try:
+            info = cliente.get_collection(COLLECTION_NAME)
+            huella = (info.points_count, info.segments_count, self._hash_contenido(cliente))
+        except Exception as error:
+            print(f"⚡ Could not check collection for cache invalidation: {error}")
+            return
+
+        if self._huella_coleccion is not None and huella != self._huella_coleccion:
+            print("🧹 Collection changed: invalidating answer cache.")
+            self.invalidar()
+        self._huella_coleccion = huella
+
+    def estadisticas(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "tasa_aciertos": self.hits / total if total else 0.0,
+            "entradas": len(self._entradas),
+        }
+
+
+cache_respuestas = CacheSemanticaRespuestas(
+    umbral=UMBRAL_CACHE_RESPUESTAS,
+    ttl=TTL_CACHE_RESPUESTAS,
+    max_entradas=MAX_CACHE_RESPUESTAS,
+)
+
+
+registrar_gauge(
+    "answer_cache",
+    lambda: {clave: valor for clave, valor in cache_respuestas.estadisticas().items() if clave in ("tasa_aciertos", "entradas")},
+    "Semantic answer cache hit rate and entries.",
+)
+
+
+def invalidar_cache_respuestas() -> None:
+    """Drop every cached answer (e.g. after re-ingesting documents)."""
+    cache_respuestas.invalidar()
+
+
+def es_respuesta_fallida(respuesta: str) -> bool:
+    """Return True for empty answers and fallback messages, which are never cached."""
+    return not respuesta or any(
+        aviso in respuesta for aviso in (RESPUESTA_VACIA, RESPUESTA_TIMEOUT, RESPUESTA_SATURADA, RESPUESTA_DEGRADADA)
+    )
+
+
+def precargar_cache_respuestas(ruta: str) -> int:
+    """
+    Seed the answer cache with the answers of a batch QA run (agent/batch_qa.py).
+
+    Questions are embedded in one batch; failed answers are skipped.
+
+    Args:
+        ruta (str): JSONL file with ``pregunta``, ``idioma`` and ``respuesta`` fields.
+
+    Returns:
+        int: Number of answers loaded.
+    """
+    with open(ruta, encoding="utf-8") as archivo:
+        filas = [json.loads(linea) for linea in archivo if linea.strip()]
+    filas = [fila for fila in filas if not es_respuesta_fallida(fila.get("respuesta", ""))]
+
+    vectores = embed_textos([fila["pregunta"] for fila in filas])
+    for fila, vector in zip(filas, vectores):
+        cache_respuestas.guardar(vector, fila["idioma"], fila["pregunta"], fila["respuesta"])
+    return len(filas)
+
+
+@st.cache_resource(show_spinner="🌱 Loading precomputed answers...")
+def cargar_semilla_cache_respuestas() -> int:
+    """Seed the answer cache once per process from ANSWER_CACHE_SEED, if set."""
+    if not SEMILLA_CACHE_RESPUESTAS:
+        return 0
+    try:
+        cargadas = precargar_cache_respuestas(SEMILLA_CACHE_RESPUESTAS)
+        print(f"🌱 {cargadas} answers loaded into the answer cache from {SEMILLA_CACHE_RESPUESTAS}.")
+        return cargadas
+    except Exception as error:
+        print(f"⚡ Could not seed the answer cache: {error}")
+        return 0
+
+# === Precomputed FAQ answers ===
+@st.cache_resource(show_spinner=False)
+def obtener_almacen_faq() -> AlmacenFAQ:
+    """Load the precomputed FAQ store once per process (empty if it was never built)."""
+    try:
+        return AlmacenFAQ().cargar()
+    except Exception as error:
+        print(f"⚡ FAQ store unavailable: {error}")
+        return AlmacenFAQ()
 
-    colecciones = cliente.get_collections().collections
-    nombres = [col.name for col in colecciones]
 
-    if COLLECTION_NAME not in nombres:
-        cliente.create_collection(
+def responder_desde_faq(pregunta: str, idioma: str) -> Optional[str]:
+    """
+    Answer a question from the precomputed FAQ store.
+
+    The normalized text is matched first; otherwise the question is embedded
+    (the vector stays in the embedding cache for the pipeline) and compared
+    with the stored questions of the same language.
+
+    Args:
+        pregunta (str): The user's question.
+        idioma (str): Language code ("es", "en").
+
+    Returns:
+        str: The stored answer, or None if no stored question is close enough.
+    """
+    almacen = obtener_almacen_faq()
+    if not len(almacen):
+        return None
+
+    with medir_etapa("faq"):
+        respuesta = almacen.buscar_texto(pregunta, idioma)
+        if respuesta is None:
+            respuesta = almacen.buscar(embed_texto(pregunta), idioma)
+
+    incrementar("faq_total", resultado="hit" if respuesta is not None else "miss")
+    return respuesta
+
+# === Context retrieval ===
+Hits = List[Tuple[object, str, float]]  # (point id, text, score), best first
+SIN_HITS_LEXICOS: Tuple[Hits, bool] = ([], False)
+ERRORES_QDRANT = (UnexpectedResponse, ResponseHandlingException, httpx.HTTPError, grpc.RpcError, ConnectionError)
+
+
+def _es_timeout(error: Exception) -> bool:
+    """True if a Qdrant client error is a timeout (plain, REST wrapped by the client, or gRPC deadline)."""
+    if isinstance(error, ResponseHandlingException):
+        error = error.source
+    if isinstance(error, grpc.RpcError):
+        return getattr(error, "code", lambda: None)() == grpc.StatusCode.DEADLINE_EXCEEDED
+    return isinstance(error, (TimeoutError, httpx.TimeoutException))
+
+
+def buscar_contexto_lexico(pregunta: str, cliente: QdrantClient, k: int = 3) -> Tuple[Hits, bool]:
+    """
+    Search the in-process BM25 index.
+
+    Args:
+        pregunta (str): The user's question.
+        cliente (QdrantClient): Connected Qdrant client (used to build and refresh the index).
+        k (int): Number of top documents to retrieve.
+
+    Returns:
+        Tuple[Hits, bool]: BM25 hits and True if they are confident enough to skip
+        the embedding and dense search.
+    """
+    if not BUSQUEDA_LEXICA:
+        return SIN_HITS_LEXICOS
+
+    try:
+        with medir_etapa("busqueda_lexica"):
+            indice = obtener_indice_bm25(cliente)
+            indice.refrescar_si_toca(cliente)
+            return indice.buscar(pregunta, k)
+    except Exception as error:
+        print(f"⚡ Keyword index unavailable: {error}")
+        return SIN_HITS_LEXICOS
+
+
+def _buscar_hits_densos(cliente: QdrantClient, vector_consulta: List[float], k: int, plazo: Optional[Plazo] = None) -> Hits:
+    if MODO_INDICE == "local":
+        try:
+            with medir_etapa("busqueda_local"):
+                indice = obtener_indice_local(cliente)
+                indice.refrescar_si_toca(cliente)
+                if indice.esta_vigente():
+                    return indice.buscar(vector_consulta, k)
+            print("⚡ Local index is stale, falling back to Qdrant search.")
+        except Exception as error:
+            print(f"⚡ Local index unavailable, falling back to Qdrant search: {error}")
+
+    with medir_etapa("busqueda"):
+        resultados = cliente.search(
             collection_name=COLLECTION_NAME,
-            vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE),
+            query_vector=vector_consulta,
+            limit=k,
+            search_params=PARAMETROS_BUSQUEDA,
+            with_payload=["text"],
+            with_vectors=False,
+            timeout=_timeout_qdrant(plazo),
         )
 
-    return cliente
+    return [(hit.id, hit.payload["text"], hit.score) for hit in resultados]
 
-# === Context retrieval ===
-def buscar_contexto_relevante(pregunta: str, cliente: QdrantClient, k: int = 3) -> List[str]:
+
+def buscar_hits_densos_lote(cliente: QdrantClient, vectores: List[List[float]], k: int) -> List[Hits]:
+    """Dense hits for several query vectors in one Qdrant ``search_batch`` request (same format as a single search)."""
+    if not vectores:
+        return []
+    if MODO_INDICE == "local":
+        return [_buscar_hits_densos(cliente, vector, k) for vector in vectores]
+    with medir_etapa("busqueda"):
+        resultados = cliente.search_batch(
+            collection_name=COLLECTION_NAME,
+            requests=[
+                SearchRequest(vector=vector, limit=k, params=PARAMETROS_BUSQUEDA, with_payload=["text"], with_vector=False)
+                for vector in vectores
+            ],
+        )
+    return [[(hit.id, hit.payload["text"], hit.score) for hit in hits] for hits in resultados]
+
+
+def _etapa(plazo: Optional[Plazo], maximo: float) -> Optional[Plazo]:
+    return plazo.etapa(maximo) if plazo is not None else None
+
+
+def _timeout_qdrant(plazo: Optional[Plazo]) -> Optional[int]:
+    """Server-side search timeout (whole seconds, at least 1) for the search stage of a deadline."""
+    if plazo is None:
+        return None
+    return max(1, math.ceil(plazo.etapa(PRESUPUESTO_BUSQUEDA).restante()))
+
+
+def _combinar_hits(hits_densos: Hits, hits_lexicos: Hits, k: int) -> Tuple[Hits, bool]:
     """
-    Search Qdrant for the most relevant context fragments given a question.
+    Fuse dense and BM25 hits with reciprocal rank fusion (dense only if there are no BM25 hits).
+
+    Returns:
+        Tuple[Hits, bool]: Fused hits, and True if the best dense hit is confident
+        enough to answer extractively (see _denso_confiable).
+    """
+    if hits_lexicos:
+        incrementar("retrieval_total", ruta="fusion")
+        hits = fusionar_rrf([hits_densos, hits_lexicos], k)
+    else:
+        incrementar("retrieval_total", ruta="densa")
+        hits = hits_densos[:k]
+    return hits, _denso_confiable(hits_densos, hits)
+
+
+def _denso_confiable(hits_densos: Hits, hits: Hits) -> bool:
+    """The best dense hit clears the similarity threshold and margin, and also ranks first after fusion."""
+    if not hits_densos or not hits:
+        return False
+    segunda = hits_densos[1][2] if len(hits_densos) > 1 else 0.0
+    return (
+        hits_densos[0][2] >= UMBRAL_EXTRACTIVO
+        and hits_densos[0][2] - segunda >= MARGEN_EXTRACTIVO
+        and str(hits[0][0]) == str(hits_densos[0][0])
+    )
+
+
+def buscar_hits_relevantes(
+    pregunta: str,
+    cliente: QdrantClient,
+    k: int = 3,
+    vector_consulta: Optional[List[float]] = None,
+    lexico: Optional[Tuple[Hits, bool]] = None,
+    plazo: Optional[Plazo] = None,
+    hits_densos: Optional[Hits] = None,
+) -> Tuple[Hits, bool]:
+    """
+    Retrieve the most relevant passages with their scores.
+
+    Confident BM25 hits are returned without embedding the question; otherwise
+    BM25 and dense hits are fused with reciprocal rank fusion. Only the dense
+    similarity decides whether the hits can be answered extractively: a keyword
+    match says the passage shares the question's terms, not that it answers it.
 
     Args:
         pregunta (str): The user's question.
         cliente (QdrantClient): Connected Qdrant client.
         k (int): Number of top documents to retrieve.
+        vector_consulta (List[float], optional): Precomputed embedding of the question.
+        lexico (Tuple[Hits, bool], optional): Precomputed result of buscar_contexto_lexico.
+        plazo (Plazo, optional): Request deadline. When the embedding or the dense
+            search does not fit in it, the BM25 hits are returned on their own.
+        hits_densos (Hits, optional): Precomputed dense hits for ``vector_consulta``
+            (e.g. from buscar_hits_densos_lote); the dense search is skipped.
 
     Returns:
-        List[str]: List of relevant text fragments.
+        Tuple[Hits, bool]: (point id, text, score) hits, best first, scored by the
+        retriever that ranked them (BM25, cosine similarity or RRF), and True if the
+        top dense hit is confident enough to answer extractively (see _denso_confiable).
     """
-    vector_consulta = embed_texto(pregunta)
+    hits_lexicos, confiable = lexico if lexico is not None else buscar_contexto_lexico(pregunta, cliente, k)
+    if confiable:
+        incrementar("retrieval_total", ruta="lexica")
+        return hits_lexicos, False
+
+    if vector_consulta is None:
+        vector_consulta = embed_texto(pregunta, _etapa(plazo, PRESUPUESTO_EMBEDDING))
 
     if not vector_consulta:
         print("⚡ Failed to generate embedding.")
-        return []
+        return hits_lexicos, False
 
-    resultados = cliente.search(
-        collection_name=COLLECTION_NAME,
-        query_vector=vector_consulta,
-        limit=k,
-    )
+    if hits_densos is not None:
+        return _combinar_hits(hits_densos, hits_lexicos, k)
+
+    if plazo is not None:
+        if plazo.agotado():
+            incrementar("deadline_exceeded_total", stage="busqueda")
+            return hits_lexicos, False
+        try:
+            return _combinar_hits(_buscar_hits_densos(cliente, vector_consulta, k, plazo), hits_lexicos, k)
+        except (TimeoutError, *ERRORES_QDRANT) as error:
+            if _es_timeout(error):
+                incrementar("deadline_exceeded_total", stage="busqueda")
+                print(f"⚡ Dense search did not finish within the deadline, using keyword hits: {error}")
+            else:
+                incrementar("search_failures_total")
+                print(f"⚡ Dense search failed, using keyword hits: {error}")
+            return hits_lexicos, False
 
-    return [hit.payload["text"] for hit in resultados]
+    return _combinar_hits(_buscar_hits_densos(cliente, vector_consulta, k), hits_lexicos, k)
+
+
+def buscar_contexto_relevante(
+    pregunta: str,
+    cliente: QdrantClient,
+    k: int = 3,
+    vector_consulta: Optional[List[float]] = None,
+    lexico: Optional[Tuple[Hits, bool]] = None,
+    plazo: Optional[Plazo] = None,
+) -> List[str]:
+    """
+    Search Qdrant for the most relevant context fragments given a question.
+
+    Text-only view of buscar_hits_relevantes (same arguments).
+
+    Returns:
+        List[str]: List of relevant text fragments.
+    """
+    hits, _ = buscar_hits_relevantes(pregunta, cliente, k, vector_consulta, lexico, plazo)
+    return [texto for _, texto, _ in hits]
+
+# === Extractive answers ===
+def responder_extractivo(pregunta: str, hits: Hits, idioma: str, max_frases: int = MAX_FRASES_EXTRACTIVAS) -> Optional[str]:
+    """
+    Answer from the retrieved passages without the generator.
+
+    The sentences of the top passages are ranked by the share of the question's
+    content terms they contain (sentences from lower-ranked passages slightly
+    penalized); those close to the best one are kept in reading order and
+    wrapped in the language's template.
+
+    Args:
+        pregunta (str): The user's question.
+        hits (Hits): Retrieved hits, best first.
+        idioma (str): Language code ("es", "en").
+        max_frases (int): Maximum sentences in the answer.
+
+    Returns:
+        str: The extractive answer, or None if no sentence covers enough of the
+        question or the passages are not in the question's language.
+    """
+    terminos = set(tokenizar(pregunta))
+    if not terminos or not hits:
+        return None
+
+    candidatas, vistas = [], set()
+    for rango, (_, texto, _) in enumerate(hits[:PASAJES_EXTRACTIVOS]):
+        for posicion, frase in enumerate(dividir_frases(texto)):
+            clave = frase.lower()
+            comunes = terminos & set(tokenizar(frase))
+            if not comunes or clave in vistas:
+                continue
+            vistas.add(clave)
+            candidatas.append((len(comunes) / len(terminos) - 0.1 * rango, rango, posicion, frase))
+
+    candidatas.sort(key=lambda candidata: candidata[0], reverse=True)
+    if not candidatas or candidatas[0][0] < COBERTURA_EXTRACTIVA:
+        return None
+
+    elegidas = [candidata for candidata in candidatas if candidata[0] >= 0.75 * candidatas[0][0]][:max_frases]
+    texto = " ".join(frase for *_, frase in sorted(elegidas, key=lambda candidata: candidata[1:3]))
+    if detectar_idioma(texto) != idioma:
+        return None
+    return PLANTILLAS_EXTRACTIVAS.get(idioma, PLANTILLAS_EXTRACTIVAS["es"]).format(texto)
+
+
+def _enrutar(pregunta: str, hits: Hits, confiable: bool, idioma: str) -> Optional[str]:
+    """Return an extractive answer for confident dense retrievals, or None to use the generator."""
+    respuesta = responder_extractivo(pregunta, hits, idioma) if RESPUESTAS_EXTRACTIVAS and confiable else None
+    incrementar("answer_route_total", ruta="extractiva" if respuesta is not None else "generativa")
+    return respuesta
 
 # === Answer generation ===
-def generar_respuesta(contexto: List[str], pregunta: str, idioma: str = "") -> str:
+def construir_prompt(
+    contexto: List[str],
+    pregunta: str,
+    idioma: str = "",
+    puntuaciones: Optional[List[float]] = None,
+) -> str:
     """
-    Generate a natural-language answer using retrieved context and the user's question.
+    Build the generation prompt from retrieved context and the user's question.
+
+    The context is packed as whole, de-duplicated passages within
+    MAX_CONTEXT_TOKENS tokens of the generator's tokenizer. With scores, the
+    best passages go first and those below FRACCION_MINIMA_CONTEXTO of the
+    best score are left out.
 
     Args:
         contexto (List[str]): Retrieved context fragments.
         pregunta (str): The user's question.
         idioma (str, optional): Language code ("es", "en"). If empty, auto-detected.
+        puntuaciones (List[float], optional): Retrieval scores used to order the passages.
 
     Returns:
-        str: The generated answer.
+        str: The prompt for the generation model.
     """
-    contexto_unido = "\n".join(contexto)
-
-    if len(contexto_unido) > MAX_CONTEXT_LENGTH:
-        contexto_unido = contexto_unido[:MAX_CONTEXT_LENGTH]
+    with medir_etapa("contexto"):
+        contexto_unido = "\n".join(
+            empaquetar_contexto(
+                contexto, MAX_CONTEXT_TOKENS, contar_tokens, puntuaciones, fraccion_minima=FRACCION_MINIMA_CONTEXTO
+            )
+        )
+    observar("context_tokens", contar_tokens(contexto_unido))
 
     if not idioma:
-        try:
-            idioma = detect(pregunta)
-        except Exception:
-            idioma = "es"
+        idioma = detectar_idioma(pregunta)
 
     if idioma == "en":
-        prompt = (
+        return (
             f"Use the following context to answer clearly and helpfully.\n\n"
             f"Context:\n{contexto_unido}\n\n"
             f"Question: {pregunta}\n"
             f"Answer:"
         )
+    return (
+        f"Usa el siguiente contexto para responder con claridad y precisión.\n\n"
+        f"Contexto:\n{contexto_unido}\n\n"
+        f"Pregunta: {pregunta}\n"
+        f"Respuesta:"
+    )
+
+
+# === Admission control ===
+@st.cache_resource(show_spinner=False)
+def obtener_control_admision() -> ControlAdmision:
+    """Return the process-wide admission controller shared by every generation."""
+    control = ControlAdmision()
+    registrar_gauge("admission", control.estado, "Running generations and queued waiters.")
+    return control
+
+
+def _respuesta_degradada(contexto: List[str]) -> str:
+    """Best answer available without generation: the top retrieved passage, if any."""
+    if not contexto:
+        return RESPUESTA_TIMEOUT
+    return f"{RESPUESTA_DEGRADADA}\n\n{contexto[0]}"
+
+
+def _no_admitida(contexto: List[str], plazo: Optional[Plazo]) -> str:
+    if plazo is not None and plazo.agotado():
+        incrementar("deadline_exceeded_total", stage="admision")
+        return _respuesta_degradada(contexto)
+    return RESPUESTA_SATURADA
+
+
+def generar_respuesta(
+    contexto: List[str],
+    pregunta: str,
+    idioma: str = "",
+    al_esperar: Optional[Callable[[int], None]] = None,
+    plazo: Optional[Plazo] = None,
+    puntuaciones: Optional[List[float]] = None,
+) -> str:
+    """
+    Generate a natural-language answer using retrieved context and the user's question.
+
+    Args:
+        contexto (List[str]): Retrieved context fragments.
+        pregunta (str): The user's question.
+        idioma (str, optional): Language code ("es", "en"). If empty, auto-detected.
+        al_esperar (Callable[[int], None], optional): Called with the queue position
+            while waiting for a generation slot.
+        plazo (Plazo, optional): Request deadline. Decoding stops when it passes;
+            if no generation could run, the top passage is returned instead.
+        puntuaciones (List[float], optional): Retrieval score of each fragment (see construir_prompt).
+
+    Returns:
+        str: The generated answer, RESPUESTA_SATURADA if not admitted, or a degraded answer.
+    """
+    prompt = construir_prompt(contexto, pregunta, idioma, puntuaciones)
+    espera = plazo.restante() if plazo is not None else None
+
+    with obtener_control_admision().turno(al_esperar, espera) as admitido:
+        if not admitido:
+            return _no_admitida(contexto, plazo)
+        try:
+            with medir_etapa("generacion"):
+                respuesta = generar_respuesta_hf(prompt, plazo=plazo)
+        except TimeoutError:
+            return _respuesta_degradada(contexto)
+        except Exception:
+            incrementar("generation_failures_total")
+            return RESPUESTA_TIMEOUT
+
+    observar("answer_tokens", contar_tokens(respuesta))
+    return respuesta or RESPUESTA_VACIA
+
+
+def generar_respuesta_stream(
+    contexto: List[str],
+    pregunta: str,
+    idioma: str = "",
+    al_esperar: Optional[Callable[[int], None]] = None,
+    plazo: Optional[Plazo] = None,
+    puntuaciones: Optional[List[float]] = None,
+) -> Iterator[str]:
+    """
+    Stream a natural-language answer as text deltas while the model decodes it.
+
+    The generation slot is held until the stream ends or is closed; closing it
+    early cancels the decoding and releases the slot only once it has stopped.
+
+    Args:
+        contexto (List[str]): Retrieved context fragments.
+        pregunta (str): The user's question.
+        idioma (str, optional): Language code ("es", "en"). If empty, auto-detected.
+        al_esperar (Callable[[int], None], optional): Called with the queue position
+            while waiting for a generation slot.
+        plazo (Plazo, optional): Request deadline. The stream ends when it passes;
+            if no generation could run, the top passage is yielded instead.
+        puntuaciones (List[float], optional): Retrieval score of each fragment (see construir_prompt).
+
+    Yields:
+        str: Consecutive fragments of the answer.
+    """
+    prompt = construir_prompt(contexto, pregunta, idioma, puntuaciones)
+    espera = plazo.restante() if plazo is not None else None
+    fragmentos = []
+
+    with obtener_control_admision().turno(al_esperar, espera) as admitido:
+        if not admitido:
+            yield _no_admitida(contexto, plazo)
+            return
+
+        inicio = time.perf_counter()
+        flujo = generar_respuesta_hf_stream(prompt, plazo=plazo)
+        try:
+            for fragmento in flujo:
+                fragmentos.append(fragmento)
+                yield fragmento
+        except TimeoutError:
+            yield _respuesta_degradada(contexto)
+            return
+        except Exception:
+            incrementar("generation_failures_total")
+            yield f"\n\n{RESPUESTA_TIMEOUT}" if fragmentos else RESPUESTA_TIMEOUT
+            return
+        finally:
+            flujo.close()  # Cancel and wait for the decoder before the slot is released
+            registrar_duracion("generacion", time.perf_counter() - inicio)
+
+    observar("answer_tokens", contar_tokens("".join(fragmentos)))
+    if not fragmentos:
+        yield RESPUESTA_VACIA
+
+# === Full pipeline ===
+def _preparar_respuesta(
+    pregunta: str,
+    cliente: QdrantClient,
+    idioma: str,
+    k: int,
+    plazo: Optional[Plazo] = None,
+    lexico: Optional[Tuple[Hits, bool]] = None,
+    hits_densos: Optional[Hits] = None,
+):
+    """Resolve language, embed once and either hit the answer cache or retrieve context.
+
+    When the BM25 hits are confident the embedding model is not called; the
+    answer cache is still checked if the question's embedding is already cached.
+    Confident dense retrievals are answered extractively, so the last item (the
+    direct answer) is set for cache hits and extractive answers alike. The
+    context comes back as scored hits so packing can rank and trim it and
+    batch runs can report which chunks were retrieved.
+
+    responder_preguntas_lote passes the BM25 result and the dense hits it
+    computed for many questions at once; the embedding comes from the
+    embedding cache it warmed.
+    """
+    if not idioma:
+        idioma = detectar_idioma(pregunta)
+
+    if lexico is None:
+        lexico = buscar_contexto_lexico(pregunta, cliente, k)
+    if lexico[1]:
+        vector_consulta = buscar_embedding_en_cache(pregunta)
     else:
-        prompt = (
-            f"Usa el siguiente contexto para responder con claridad y precisión.\n\n"
-            f"Contexto:\n{contexto_unido}\n\n"
-            f"Pregunta: {pregunta}\n"
-            f"Respuesta:"
+        vector_consulta = embed_texto(pregunta, _etapa(plazo, PRESUPUESTO_EMBEDDING))
+
+    if vector_consulta:
+        respuesta_cacheada = cache_respuestas.buscar(vector_consulta, idioma)
+        if respuesta_cacheada is not None:
+            return idioma, vector_consulta, [], respuesta_cacheada
+
+    hits, confiable = buscar_hits_relevantes(
+        pregunta, cliente, k, vector_consulta=vector_consulta, lexico=lexico, plazo=plazo, hits_densos=hits_densos
+    )
+    return idioma, vector_consulta, hits, _enrutar(pregunta, hits, confiable, idioma)
+
+
+def _separar_hits(hits: Hits) -> Tuple[List[str], List[float]]:
+    """Split scored hits into the context and score lists taken by the generation functions."""
+    return [texto for _, texto, _ in hits], [puntuacion for *_, puntuacion in hits]
+
+
+def _guardar_en_cache(
+    vector_consulta, contexto, idioma: str, pregunta: str, respuesta: str, plazo: Optional[Plazo] = None
+) -> None:
+    # An answer finished after the deadline may have been cut by the stopping criterion
+    if plazo is not None and plazo.agotado():
+        return
+    if vector_consulta and contexto and not es_respuesta_fallida(respuesta):
+        cache_respuestas.guardar(vector_consulta, idioma, pregunta, respuesta)
+
+
+def responder_pregunta(
+    pregunta: str,
+    cliente: QdrantClient,
+    idioma: str = "",
+    k: int = 3,
+    al_esperar: Optional[Callable[[int], None]] = None,
+    plazo: Optional[Plazo] = None,
+) -> str:
+    """
+    Answer a question end to end, serving near-identical questions from the answer cache.
+
+    The question is embedded once; that vector is used both to look up the
+    semantic answer cache and, on a miss, to search Qdrant. Confident
+    retrievals are answered extractively; only the rest reach the generator.
+
+    Args:
+        pregunta (str): The user's question.
+        cliente (QdrantClient): Connected Qdrant client.
+        idioma (str, optional): Language code ("es", "en"). If empty, auto-detected.
+        k (int): Number of top documents to retrieve.
+        al_esperar (Callable[[int], None], optional): Called with the queue position
+            while waiting for a generation slot.
+        plazo (Plazo, optional): Request deadline. Defaults to REQUEST_DEADLINE seconds from now.
+
+    Returns:
+        str: The answer.
+    """
+    plazo = plazo or Plazo()
+    with nueva_traza():
+        idioma, vector_consulta, hits, respuesta_directa = _preparar_respuesta(
+            pregunta, cliente, idioma, k, plazo
         )
+        if respuesta_directa is not None:
+            return respuesta_directa
+
+        contexto, puntuaciones = _separar_hits(hits)
+        respuesta = generar_respuesta(contexto, pregunta, idioma, al_esperar, plazo, puntuaciones)
+        _guardar_en_cache(vector_consulta, contexto, idioma, pregunta, respuesta, plazo)
+        return respuesta
+
+
+def responder_pregunta_stream(
+    pregunta: str,
+    cliente: QdrantClient,
+    idioma: str = "",
+    k: int = 3,
+    al_esperar: Optional[Callable[[int], None]] = None,
+    plazo: Optional[Plazo] = None,
+) -> Iterator[str]:
+    """
+    Streaming variant of responder_pregunta that yields the answer as text deltas.
+
+    Cached and extractive answers are yielded in a single fragment; otherwise fragments are
+    yielded as soon as the model decodes them.
+
+    Args:
+        pregunta (str): The user's question.
+        cliente (QdrantClient): Connected Qdrant client.
+        idioma (str, optional): Language code ("es", "en"). If empty, auto-detected.
+        k (int): Number of top documents to retrieve.
+        al_esperar (Callable[[int], None], optional): Called with the queue position
+            while waiting for a generation slot.
+        plazo (Plazo, optional): Request deadline. Defaults to REQUEST_DEADLINE seconds from now.
+
+    Yields:
+        str: Consecutive fragments of the answer.
+    """
+    plazo = plazo or Plazo()
+    with nueva_traza():
+        if PIPELINE_ASYNC:
+            preparacion = _preparar_respuesta_async(pregunta, cliente, cargar_qdrant_async(), idioma, k, plazo)
+            try:
+                idioma, vector_consulta, hits, respuesta_directa = ejecutar_async(preparacion, plazo.restante())
+            except TimeoutError:
+                incrementar("deadline_exceeded_total", stage="preparacion")
+                yield RESPUESTA_TIMEOUT
+                return
+        else:
+            idioma, vector_consulta, hits, respuesta_directa = _preparar_respuesta(
+                pregunta, cliente, idioma, k, plazo
+            )
+
+        if respuesta_directa is not None:
+            yield respuesta_directa
+            return
+
+        contexto, puntuaciones = _separar_hits(hits)
+        fragmentos = []
+        if PIPELINE_ASYNC:
+            flujo = generar_respuesta_stream_en_ejecutor(contexto, pregunta, idioma, al_esperar, plazo, puntuaciones)
+        else:
+            flujo = generar_respuesta_stream(contexto, pregunta, idioma, al_esperar, plazo, puntuaciones)
+        for fragmento in flujo:
+            fragmentos.append(fragmento)
+            yield fragmento
+
+        _guardar_en_cache(vector_consulta, contexto, idioma, pregunta, "".join(fragmentos).strip(), plazo)
+
+
+# === Batch pipeline ===
+def responder_preguntas_lote(
+    preguntas: List[str], cliente: QdrantClient, idiomas: List[str], k: int = 3, max_tokens: int = 256
+) -> List[dict]:
+    """
+    Answer several questions exactly as the app would, batching the expensive calls.
+
+    Every question goes through the app's steps in the same order: FAQ store,
+    then _preparar_respuesta (BM25 fast path, answer cache, fused retrieval and
+    the extractive router), then generation, whose answers are saved to the
+    answer cache. The embeddings of the questions that need one are computed
+    in one call (warming the embedding cache the pipeline reads), their dense
+    hits in one ``search_batch`` request, and the prompts that reach the
+    generator in one ``generate`` call. Used by agent/batch_qa.py.
+
+    Args:
+        preguntas (List[str]): The questions.
+        cliente (QdrantClient): Connected Qdrant client.
+        idiomas (List[str]): Language code of each question ("" to auto-detect).
+        k (int): Passages retrieved per question.
+        max_tokens (int): Maximum tokens generated per answer.
+
+    Returns:
+        List[dict]: Per question, in the same order: ``respuesta``, ``ruta``
+        ("faq", "cache", "extractiva" or "generativa"), the retrieved ``hits``
+        (point id, text, score) and ``tiempos_ms`` per stage. Batched stages
+        report the batch time divided by the questions that went through them.
+    """
+    n = len(preguntas)
+    idiomas = [idioma or detectar_idioma(pregunta) for pregunta, idioma in zip(preguntas, idiomas)]
+    etapas = ("embedding", "busqueda", "preparacion", "contexto", "generacion")
+    tiempos = [dict.fromkeys(etapas, 0.0) for _ in preguntas]
+    rutas = [""] * n
+    respuestas = [None] * n
+
+    vectores = {}
+
+    def _embeber(indices: List[int]) -> None:
+        """Embed the questions in one call; the pipeline then reads them from the embedding cache."""
+        if not indices:
+            return
+        inicio = time.perf_counter()
+        try:
+            vectores.update(zip(indices, embed_textos([preguntas[i] for i in indices])))
+        except Exception as error:
+            print(f"⚡ Embedding failed for a batch of {len(indices)} questions: {error}")
+        for i in indices:
+            tiempos[i]["embedding"] = (time.perf_counter() - inicio) * 1000 / len(indices)
+
+    # The FAQ lookup embeds every question it cannot match by text
+    if len(obtener_almacen_faq()):
+        _embeber(list(range(n)))
+
+    # FAQ store and BM25 first, as in the app: they decide who needs a dense search
+    lexicos = [None] * n
+    for i in range(n):
+        inicio = time.perf_counter()
+        respuestas[i] = responder_desde_faq(preguntas[i], idiomas[i])
+        if respuestas[i] is not None:
+            rutas[i] = "faq"
+        else:
+            lexicos[i] = buscar_contexto_lexico(preguntas[i], cliente, k)
+        tiempos[i]["preparacion"] += (time.perf_counter() - inicio) * 1000
+
+    densas = [i for i in range(n) if respuestas[i] is None and not lexicos[i][1]]
+    _embeber([i for i in densas if i not in vectores])
+    densas = [i for i in densas if vectores.get(i)]
+
+    hits_densos = {}
+    if densas:
+        inicio = time.perf_counter()
+        try:
+            hits_densos = dict(zip(densas, buscar_hits_densos_lote(cliente, [vectores[i] for i in densas], k)))
+        except Exception as error:
+            print(f"⚡ Dense search failed for a batch of {len(densas)} questions: {error}")
+        for i in densas:
+            tiempos[i]["busqueda"] = (time.perf_counter() - inicio) * 1000 / len(densas)
+
+    preparadas, pendientes = {}, []
+    for i in range(n):
+        if respuestas[i] is not None:
+            continue
+        inicio = time.perf_counter()
+        _, vector_consulta, hits, respuesta_directa = _preparar_respuesta(
+            preguntas[i], cliente, idiomas[i], k, lexico=lexicos[i], hits_densos=hits_densos.get(i)
+        )
+        tiempos[i]["preparacion"] += (time.perf_counter() - inicio) * 1000
+        preparadas[i] = (vector_consulta, hits)
+        if respuesta_directa is not None:
+            respuestas[i] = respuesta_directa
+            rutas[i] = "extractiva" if hits else "cache"
+        else:
+            pendientes.append(i)
+
+    prompts = []
+    for i in pendientes:
+        inicio = time.perf_counter()
+        contexto, puntuaciones = _separar_hits(preparadas[i][1])
+        prompts.append(construir_prompt(contexto, preguntas[i], idiomas[i], puntuaciones))
+        tiempos[i]["contexto"] = (time.perf_counter() - inicio) * 1000
+
+    if pendientes:
+        inicio = time.perf_counter()
+        try:
+            generadas = generar_respuestas_hf_lote(prompts, [max_tokens] * len(pendientes))
+        except Exception as error:
+            print(f"⚡ Generation failed for a batch of {len(pendientes)} questions: {error}")
+            generadas = [RESPUESTA_TIMEOUT] * len(pendientes)
+        for i, respuesta in zip(pendientes, generadas):
+            tiempos[i]["generacion"] = (time.perf_counter() - inicio) * 1000 / len(pendientes)
+            respuestas[i] = respuesta.strip() or RESPUESTA_VACIA
+            rutas[i] = "generativa"
+            vector_consulta, hits = preparadas[i]
+            _guardar_en_cache(vector_consulta, hits, idiomas[i], preguntas[i], respuestas[i])
+
+    salida = []
+    for i in range(n):
+        tiempos[i]["total"] = sum(tiempos[i].values())
+        salida.append({
+            "respuesta": respuestas[i],
+            "ruta": rutas[i],
+            "hits": preparadas.get(i, (None, []))[1],
+            "tiempos_ms": tiempos[i],
+        })
+    return salida
+
+
+# === Async pipeline ===
+_ejecutor_generacion = ThreadPoolExecutor(max_workers=HILOS_GENERACION, thread_name_prefix="generacion")
 
+
+@st.cache_resource(show_spinner=False)
+def obtener_bucle_async() -> asyncio.AbstractEventLoop:
+    """
+    Start the process-wide event loop used by the async pipeline.
+
+    The loop runs in a daemon thread so Streamlit script threads can submit
+    coroutines to it, and async clients stay bound to a single loop.
+    """
+    bucle = asyncio.new_event_loop()
+    threading.Thread(target=bucle.run_forever, name="bucle-rag-async", daemon=True).start()
+    return bucle
+
+
+def generar_respuesta_stream_en_ejecutor(
+    contexto: List[str],
+    pregunta: str,
+    idioma: str = "",
+    al_esperar: Optional[Callable[[int], None]] = None,
+    plazo: Optional[Plazo] = None,
+    puntuaciones: Optional[List[float]] = None,
+) -> Iterator[str]:
+    """
+    Run generar_respuesta_stream in the generation executor and relay its fragments.
+
+    Admission waits and decoding happen in an executor thread; the caller only
+    reads fragments from a queue. Queue positions are relayed through the same
+    queue so ``al_esperar`` (a UI callback) still runs on the caller's thread.
+    Closing the returned generator closes the stream in the executor, which
+    cancels decoding and frees the generation slot, and waits for it.
+
+    Args and yields: see generar_respuesta_stream.
+    """
+    canal: "queue.Queue[tuple]" = queue.Queue()
+    cerrar = threading.Event()
+
+    def _producir() -> None:
+        flujo = generar_respuesta_stream(
+            contexto, pregunta, idioma, lambda posicion: canal.put(("posicion", posicion)), plazo, puntuaciones
+        )
+        try:
+            for fragmento in flujo:
+                if cerrar.is_set():
+                    break
+                canal.put(("fragmento", fragmento))
+        except Exception as error:
+            canal.put(("error", error))
+        finally:
+            flujo.close()
+            canal.put(("fin", None))
+
+    contexto_llamada = contextvars.copy_context()  # Keep the request trace in the executor thread
+    futuro = _ejecutor_generacion.submit(contexto_llamada.run, _producir)
+    try:
+        while True:
+            tipo, valor = canal.get()
+            if tipo == "fin":
+                return
+            if tipo == "error":
+                raise valor
+            if tipo == "posicion":
+                if al_esperar is not None:
+                    al_esperar(valor)
+                continue
+            yield valor
+    finally:
+        cerrar.set()
+        futuro.result()
+
+
+async def _con_traza(corrutina, traza: Optional[dict]):
+    with continuar_traza(traza):
+        return await corrutina
+
+
+def ejecutar_async(corrutina, timeout: Optional[float] = None):
+    """Run a coroutine on the shared event loop and wait for its result from a sync caller.
+
+    Spans timed inside the coroutine are added to the caller's request trace.
+    On timeout the coroutine is cancelled and TimeoutError is raised.
+    """
+    envuelta = _con_traza(corrutina, traza_actual())
+    futuro = asyncio.run_coroutine_threadsafe(envuelta, obtener_bucle_async())
     try:
-        respuesta = generar_respuesta_hf(prompt)
-        return respuesta or "⚠️ No se pudo generar una respuesta útil."
-    except Exception:
-        return "⚡ El modelo no respondió a tiempo. Intenta nuevamente."
+        return futuro.result(timeout)
+    except TimeoutError:
+        futuro.cancel()
+        raise
+
+
+@st.cache_resource(show_spinner=False)
+def cargar_qdrant_async() -> AsyncQdrantClient:
+    """
+    Load an AsyncQdrantClient connected to Qdrant Cloud.
+
+    Returns:
+        AsyncQdrantClient: A non-blocking Qdrant client instance.
+    """
+    return AsyncQdrantClient(
+        url=QDRANT_URL,
+        api_key=QDRANT_API_KEY,
+        prefer_grpc=QDRANT_PREFER_GRPC,
+        timeout=QDRANT_TIMEOUT,
+    )
+
+
+async def buscar_hits_relevantes_async(
+    pregunta: str,
+    cliente_async: AsyncQdrantClient,
+    k: int = 3,
+    vector_consulta: Optional[List[float]] = None,
+    lexico: Tuple[Hits, bool] = SIN_HITS_LEXICOS,
+    plazo: Optional[Plazo] = None,
+) -> Tuple[Hits, bool]:
+    """
+    Non-blocking variant of buscar_hits_relevantes.
+
+    Args:
+        pregunta (str): The user's question.
+        cliente_async (AsyncQdrantClient): Connected async Qdrant client.
+        k (int): Number of top documents to retrieve.
+        vector_consulta (List[float], optional): Precomputed embedding of the question.
+        lexico (Tuple[Hits, bool], optional): Result of buscar_contexto_lexico to fuse with.
+        plazo (Plazo, optional): Request deadline. The search is cancelled when its
+            budget runs out and the BM25 hits are returned on their own, as they
+            are when Qdrant cannot be reached or answers with an error.
+
+    Returns:
+        Tuple[Hits, bool]: Scored hits and whether they are confident (see buscar_hits_relevantes).
+    """
+    hits_lexicos, confiable = lexico
+    if confiable:
+        incrementar("retrieval_total", ruta="lexica")
+        return hits_lexicos, False
+
+    if vector_consulta is None:
+        vector_consulta = await embed_texto_async(pregunta, _etapa(plazo, PRESUPUESTO_EMBEDDING))
+
+    if not vector_consulta:
+        print("⚡ Failed to generate embedding.")
+        return hits_lexicos, False
+
+    etapa = _etapa(plazo, PRESUPUESTO_BUSQUEDA)
+    try:
+        with medir_etapa("busqueda"):
+            resultados = await asyncio.wait_for(
+                cliente_async.search(
+                    collection_name=COLLECTION_NAME,
+                    query_vector=vector_consulta,
+                    limit=k,
+                    search_params=PARAMETROS_BUSQUEDA,
+                    with_payload=["text"],
+                    with_vectors=False,
+                    timeout=_timeout_qdrant(plazo),
+                ),
+                timeout=etapa.restante() if etapa is not None else None,
+            )
+    except asyncio.TimeoutError:
+        incrementar("deadline_exceeded_total", stage="busqueda")
+        print("⚡ Dense search did not finish within the deadline, using keyword hits.")
+        return hits_lexicos, False
+    except ERRORES_QDRANT as error:
+        if _es_timeout(error):
+            incrementar("deadline_exceeded_total", stage="busqueda")
+        else:
+            incrementar("search_failures_total")
+        print(f"⚡ Dense search failed, using keyword hits: {error}")
+        return hits_lexicos, False
+
+    return _combinar_hits([(hit.id, hit.payload["text"], hit.score) for hit in resultados], hits_lexicos, k)
+
+
+async def buscar_contexto_relevante_async(
+    pregunta: str,
+    cliente_async: AsyncQdrantClient,
+    k: int = 3,
+    vector_consulta: Optional[List[float]] = None,
+    lexico: Tuple[Hits, bool] = SIN_HITS_LEXICOS,
+    plazo: Optional[Plazo] = None,
+) -> List[str]:
+    """
+    Non-blocking variant of buscar_contexto_relevante (text-only view of buscar_hits_relevantes_async).
+
+    Returns:
+        List[str]: List of relevant text fragments.
+    """
+    hits, _ = await buscar_hits_relevantes_async(pregunta, cliente_async, k, vector_consulta, lexico, plazo)
+    return [texto for _, texto, _ in hits]
+
+
+async def generar_respuesta_async(
+    contexto: List[str],
+    pregunta: str,
+    idioma: str = "",
+    plazo: Optional[Plazo] = None,
+    puntuaciones: Optional[List[float]] = None,
+) -> str:
+    """
+    Generate an answer in the generation executor without blocking the event loop.
+
+    Args:
+        contexto (List[str]): Retrieved context fragments.
+        pregunta (str): The user's question.
+        idioma (str, optional): Language code ("es", "en"). If empty, auto-detected.
+        plazo (Plazo, optional): Request deadline (see generar_respuesta).
+        puntuaciones (List[float], optional): Retrieval score of each fragment.
+
+    Returns:
+        str: The generated answer.
+    """
+    bucle = asyncio.get_running_loop()
+    contexto_llamada = contextvars.copy_context()  # Keep the request trace in the executor thread
+    return await bucle.run_in_executor(
+        _ejecutor_generacion, contexto_llamada.run, generar_respuesta, contexto, pregunta, idioma, None, plazo,
+        puntuaciones,
+    )
+
+
+async def _preparar_respuesta_async(
+    pregunta: str,
+    cliente: QdrantClient,
+    cliente_async: AsyncQdrantClient,
+    idioma: str,
+    k: int,
+    plazo: Optional[Plazo] = None,
+):
+    """
+    Async counterpart of _preparar_respuesta with the independent stages overlapped.
+
+    The embedding and the BM25 search (which may refresh its index from Qdrant)
+    start together in worker threads, and the language is detected on the loop
+    while they run. When the BM25 hits are confident the embedding task is
+    cancelled and only a cached vector is used, as in the sync path; a local
+    embedding already running finishes in its thread and lands in the
+    embedding cache.
+    """
+    tarea_embedding = asyncio.create_task(embed_texto_async(pregunta, _etapa(plazo, PRESUPUESTO_EMBEDDING)))
+    tarea_lexica = asyncio.create_task(asyncio.to_thread(buscar_contexto_lexico, pregunta, cliente, k))
+    if not idioma:
+        idioma = detectar_idioma(pregunta)  # Memoized n-gram classifier, cheaper than a thread hop
+
+    try:
+        lexico = await tarea_lexica
+    except BaseException:
+        tarea_embedding.cancel()
+        raise
+
+    if lexico[1]:
+        tarea_embedding.cancel()
+        vector_consulta = buscar_embedding_en_cache(pregunta)
+    else:
+        vector_consulta = await tarea_embedding
+
+    if vector_consulta:
+        respuesta_cacheada = cache_respuestas.buscar(vector_consulta, idioma)
+        if respuesta_cacheada is not None:
+            return idioma, vector_consulta, [], respuesta_cacheada
+
+    if MODO_INDICE == "local":
+        # The in-process index needs no network round trip, but may refresh (or fall back to Qdrant)
+        hits, confiable = await asyncio.to_thread(
+            buscar_hits_relevantes, pregunta, cliente, k, vector_consulta, lexico, plazo
+        )
+    else:
+        hits, confiable = await buscar_hits_relevantes_async(
+            pregunta, cliente_async, k, vector_consulta=vector_consulta, lexico=lexico, plazo=plazo
+        )
+
+    return idioma, vector_consulta, hits, _enrutar(pregunta, hits, confiable, idioma)
+
+
+async def responder_pregunta_async(
+    pregunta: str,
+    cliente: QdrantClient,
+    cliente_async: AsyncQdrantClient,
+    idioma: str = "",
+    k: int = 3,
+    plazo: Optional[Plazo] = None,
+) -> str:
+    """
+    Async variant of responder_pregunta.
+
+    Embedding runs in a thread pool, the search uses the async Qdrant client,
+    and generation runs in a thread pool so one slow request does not stall
+    other requests in the same server process.
+
+    Args:
+        pregunta (str): The user's question.
+        cliente (QdrantClient): Connected Qdrant client (cache invalidation and local index).
+        cliente_async (AsyncQdrantClient): Connected async Qdrant client.
+        idioma (str, optional): Language code ("es", "en"). If empty, auto-detected.
+        k (int): Number of top documents to retrieve.
+        plazo (Plazo, optional): Request deadline. Defaults to REQUEST_DEADLINE seconds from now.
+
+    Returns:
+        str: The answer.
+    """
+    plazo = plazo or Plazo()
+    with nueva_traza():
+        idioma, vector_consulta, hits, respuesta_directa = await _preparar_respuesta_async(
+            pregunta, cliente, cliente_async, idioma, k, plazo
+        )
+        if respuesta_directa is not None:
+            return respuesta_directa
+
+        contexto, puntuaciones = _separar_hits(hits)
+        respuesta = await generar_respuesta_async(contexto, pregunta, idioma, plazo, puntuaciones)
+        _guardar_en_cache(vector_consulta, contexto, idioma, pregunta, respuesta, plazo)
+        return respuesta
@@ -8,41 +8,79 @@ Functions:
 """
 
 # === Imports ===
+import os
+import hmac
 import streamlit as st
 from config.settings import cargar_configuracion
 from utils.language_switch import leer_idioma
+from utils.language_detection import resolver_idioma
+from utils.chat_history import HistorialChat
+from utils.admission import CubetaTokens
 from ui.layout import (
     mostrar_mensaje_bienvenida,
     mostrar_aviso_logging,
     mostrar_boton_empezar,
     mostrar_footer_aviso_logging,
     mostrar_mensaje_recruiter,
-    mostrar_mensaje_bot
+    mostrar_mensaje_bot,
+    mostrar_panel_debug,
+    html_intercambio,
+    mostrar_historial,
+    mostrar_boton_anteriores
 )
 from agent.rag_agent import (
     cargar_qdrant,
-    buscar_contexto_relevante,
-    generar_respuesta
+    cargar_semilla_cache_respuestas,
+    responder_desde_faq,
+    responder_pregunta_stream
 )
 from vector_db.log_to_google_sheet import log_to_google_sheet
+from utils.metrics import iniciar_servidor_metricas, resumen_etapas, ultimas_trazas, valores_gauges
 
 # === Load Configuration ===
 CONFIG = cargar_configuracion()
+METRICS_PORT = os.getenv("METRICS_PORT")  # Prometheus endpoint on localhost; disabled if unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # Open the debug panel with ?admin=<token>
+VENTANA_HISTORIAL = int(os.getenv("CHAT_HISTORY_WINDOW", "10"))  # Exchanges shown before "load earlier"
+
+# === Metrics ===
+@st.cache_resource(show_spinner=False)
+def iniciar_metricas() -> None:
+    """Start the local Prometheus endpoint once per process."""
+    if METRICS_PORT:
+        try:
+            iniciar_servidor_metricas(int(METRICS_PORT))
+        except OSError as error:
+            print(f"⚡ Metrics endpoint not started: {error}")
+
+
+def es_admin() -> bool:
+    """Return True if the URL carries the admin token."""
+    token = st.query_params.get("admin", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+iniciar_metricas()
 
 # === Load Knowledge Base ===
 qdrant_client = cargar_qdrant()
+cargar_semilla_cache_respuestas()
 
 # === Initialize Session State ===
 if "chat_started" not in st.session_state:
     st.session_state["chat_started"] = False
 if "historial_chat" not in st.session_state:
-    st.session_state["historial_chat"] = []
+    st.session_state["historial_chat"] = HistorialChat(html_intercambio)
+if "historial_visibles" not in st.session_state:
+    st.session_state["historial_visibles"] = VENTANA_HISTORIAL
 if "input_ready" not in st.session_state:
     st.session_state["input_ready"] = False
 if "input_text" not in st.session_state:
     st.session_state["input_text"] = ""
 if "new_question" not in st.session_state:
     st.session_state["new_question"] = ""
+if "cubeta_preguntas" not in st.session_state:
+    st.session_state["cubeta_preguntas"] = CubetaTokens()
 
 # === Function to handle input submission ===
 def submit_question() -> None:
@@ -59,6 +97,9 @@ def main() -> None:
     
     idioma: str = leer_idioma()
 
+    if es_admin():
+        mostrar_panel_debug(resumen_etapas(), valores_gauges(), ultimas_trazas())
+
     # === Welcome Screen ===
     if not st.session_state["chat_started"]:
         mostrar_mensaje_bienvenida(idioma)
@@ -73,16 +114,20 @@ def main() -> None:
         # Button to go back to the welcome screen
         if st.button("⬅️"):
             st.session_state["chat_started"] = False
-            st.session_state["historial_chat"] = []
+            st.session_state["historial_chat"].vaciar()
+            st.session_state["historial_visibles"] = VENTANA_HISTORIAL
             st.session_state["input_ready"] = False
             st.session_state["input_text"] = ""
             st.session_state["new_question"] = ""
             st.rerun()
 
-        # Display chat history
-        for pregunta_antigua, respuesta_antigua in st.session_state["historial_chat"]:
-            mostrar_mensaje_recruiter(pregunta_antigua)
-            mostrar_mensaje_bot(respuesta_antigua)
+        # Display the recent window of the chat history (pre-rendered HTML)
+        historial = st.session_state["historial_chat"]
+        ocultos = len(historial) - st.session_state["historial_visibles"]
+        if ocultos > 0 and mostrar_boton_anteriores(ocultos):
+            st.session_state["historial_visibles"] += VENTANA_HISTORIAL
+            st.rerun()
+        mostrar_historial(historial.ventana(st.session_state["historial_visibles"]))
 
         # New question input with Enter key submission
         if not st.session_state.get("input_ready", False):
@@ -97,21 +142,48 @@ def main() -> None:
             # Now show the footer info AFTER the input
             mostrar_footer_aviso_logging()
 
+        # Per-session rate limit: drop the question instead of queueing it
+        if st.session_state["input_ready"] and not st.session_state["cubeta_preguntas"].consumir():
+            espera = st.session_state["cubeta_preguntas"].espera()
+            st.warning(f"🚦 Has enviado varias preguntas seguidas. Espera {espera:.0f} segundos antes de enviar otra.")
+            st.session_state["input_text"] = ""
+            st.session_state["input_ready"] = False
+
         # Process the question only if ready
         if st.session_state["input_ready"]:
+            mostrar_mensaje_recruiter(st.session_state["input_text"])
             thinking_placeholder = st.empty()
             thinking_placeholder.info("🤖 Pensando...")
 
-        try:
-            contexto = buscar_contexto_relevante(st.session_state["input_text"], qdrant_client)
-            respuesta = generar_respuesta(contexto, st.session_state["input_text"])
-        except Exception as e:
-            respuesta = "⚠️ Ha ocurrido un error al generar la respuesta. Inténtalo más tarde."
-            st.error(f"❌ Error técnico: {e}")
+            def mostrar_posicion_cola(posicion: int) -> None:
+                thinking_placeholder.info(f"⏳ Hay muchas preguntas en curso. Tu posición en la cola: {posicion}")
+
+            try:
+                # Stream the answer into a bot bubble as it is decoded
+                burbuja_bot = st.empty()
+                respuesta = ""
+                idioma_respuesta = resolver_idioma(st.session_state["input_text"], idioma)
+
+                # Frequent questions are answered from the precomputed FAQ store
+                respuesta_faq = responder_desde_faq(st.session_state["input_text"], idioma_respuesta)
+                if respuesta_faq is not None:
+                    respuesta = respuesta_faq
+                else:
+                    for fragmento in responder_pregunta_stream(
+                        st.session_state["input_text"], qdrant_client, idioma=idioma_respuesta,
+                        al_esperar=mostrar_posicion_cola
+                    ):
+                        thinking_placeholder.empty()
+                        respuesta += fragmento
+                        mostrar_mensaje_bot(respuesta + " ▌", contenedor=burbuja_bot)
+                respuesta = respuesta.strip()
+            except Exception as e:
+                respuesta = "⚠️ Ha ocurrido un error al generar la respuesta. Inténtalo más tarde."
+                st.error(f"❌ Error técnico: {e}")
 
             thinking_placeholder.empty()
 
-            st.session_state["historial_chat"].append((st.session_state["input_text"], respuesta))
+            st.session_state["historial_chat"].anadir(st.session_state["input_text"], respuesta)
             try:
                 log_to_google_sheet(st.session_state["input_text"], respuesta)
             except Exception as e:
@@ -121,9 +193,8 @@ def main() -> None:
             st.session_state["input_text"] = ""
             st.session_state["input_ready"] = False
 
-            # Success and info messages
+            # Success message
             st.success("✅ Pregunta enviada correctamente!")
-            st.info("🚦 Por favor, espere unos segundos antes de enviar otra pregunta.")
 
             st.rerun()
 
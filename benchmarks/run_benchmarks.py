@@ -0,0 +1,350 @@
+"""
+run_benchmarks.py
+
+Per-stage latency benchmark suite for the ItsMeHi RAG pipeline.
+
+Stages run against local stand-ins only, never against live services:
+    embedding        -> embed_texto with the embedding cache disabled
+    embedding_cache  -> embed_texto answered from the in-memory cache
+    busqueda         -> buscar_contexto_relevante against Qdrant's ":memory:" mode
+    busqueda_local   -> buscar_contexto_relevante with the in-process index (INDEX_MODE=local)
+    contexto         -> construir_prompt (token-budgeted context packing)
+    generacion       -> generar_respuesta_hf with the local flan-t5 model
+    generacion_stub  -> generar_respuesta_hf with a tiny random T5 (pipeline overhead only)
+    repeticion_prompts -> repeated and paraphrased questions replayed through the
+                        semantic answer cache; reports how often a prompt that
+                        reaches the generator is an exact repeat (tasa_aciertos)
+
+Each stage runs in a fresh process so peak RSS is attributed to that stage.
+Results (p50/p95/p99 latency, throughput, peak RSS) are written as JSON and
+compared against a stored baseline; the exit code is 1 on regressions.
+
+Usage:
+    python benchmarks/run_benchmarks.py --guardar-base          # record benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --etapas busqueda contexto generacion_stub
+"""
+
+# === Imports ===
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import os
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import tempfile
+import multiprocessing as mp
+from datetime import datetime
+from typing import Callable, Dict, List
+
+# === Constants ===
+RAIZ = Path(__file__).resolve().parent.parent
+RUTA_BASE = RAIZ / "benchmarks" / "baseline.json"
+RUTA_RESULTADOS = RAIZ / "benchmarks" / "results" / "latest.json"
+DIMENSION = 384
+PUNTOS_COLECCION = 500
+
+PREGUNTAS = [
+    "¿Qué experiencia tienes en Python?",
+    "¿Has trabajado con Power BI?",
+    "¿Qué proyectos de NLP has hecho?",
+    "¿Cuándo podrías empezar?",
+    "What is your experience with ETL pipelines?",
+    "Which languages do you speak?",
+    "Tell me about your background in linguistics.",
+    "Are you available to work remotely?",
+]
+PASAJES = [
+    "Soy analista de datos especializado en procesamiento de lenguaje natural.",
+    "Tengo experiencia creando pipelines ETL y dashboards en Power BI.",
+    "Tengo experiencia creando pipelines ETL y dashboards en Power BI.",
+    "He trabajado en clasificación de feedback textual de clientes con modelos de lenguaje. " * 4,
+    "Hablo español e inglés y tengo formación en lingüística.",
+]
+PARAFRASIS = [
+    "¿Cuánta experiencia tienes con Python?",
+    "¿Has usado Power BI alguna vez?",
+    "¿Qué has hecho en NLP?",
+    "What's your experience with ETL?",
+    "What languages do you speak?",
+    "Can you work remotely?",
+]
+
+# === Stages ===
+def _vector_aleatorio(generador: random.Random) -> List[float]:
+    return [generador.gauss(0, 1) for _ in range(DIMENSION)]
+
+
+def _preparar_coleccion():
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import Distance, PointStruct, VectorParams
+    from agent.rag_agent import COLLECTION_NAME
+
+    generador = random.Random(0)
+    cliente = QdrantClient(":memory:")
+    cliente.create_collection(
+        collection_name=COLLECTION_NAME,
+        vectors_config=VectorParams(size=DIMENSION, distance=Distance.COSINE),
+    )
+    cliente.upsert(
+        collection_name=COLLECTION_NAME,
+        points=[
+            PointStruct(id=i, vector=_vector_aleatorio(generador), payload={"text": f"Fragmento {i}"})
+            for i in range(PUNTOS_COLECCION)
+        ],
+    )
+    return cliente, [_vector_aleatorio(generador) for _ in range(32)]
+
+
+def etapa_embedding() -> Callable[[int], None]:
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "0"
+    from vector_db.embedding_client import embed_texto
+
+    embed_texto(PREGUNTAS[0])  # Warm up the model
+    return lambda i: embed_texto(f"{PREGUNTAS[i % len(PREGUNTAS)]} ({i})")
+
+
+def etapa_embedding_cache() -> Callable[[int], None]:
+    os.environ["EMBEDDING_CACHE_DIR"] = tempfile.mkdtemp()
+    from vector_db.embedding_client import embed_textos, embed_texto
+
+    embed_textos(PREGUNTAS)
+    return lambda i: embed_texto(PREGUNTAS[i % len(PREGUNTAS)])
+
+
+def etapa_busqueda() -> Callable[[int], None]:
+    from agent.rag_agent import buscar_contexto_relevante
+
+    cliente, consultas = _preparar_coleccion()
+    return lambda i: buscar_contexto_relevante("", cliente, 3, vector_consulta=consultas[i % len(consultas)])
+
+
+def etapa_busqueda_local() -> Callable[[int], None]:
+    os.environ["INDEX_MODE"] = "local"
+    from agent.rag_agent import buscar_contexto_relevante
+
+    cliente, consultas = _preparar_coleccion()
+    buscar_contexto_relevante("", cliente, 3, vector_consulta=consultas[0])  # Build the mirror
+    return lambda i: buscar_contexto_relevante("", cliente, 3, vector_consulta=consultas[i % len(consultas)])
+
+
+def etapa_contexto() -> Callable[[int], None]:
+    from agent.rag_agent import construir_prompt
+
+    construir_prompt(PASAJES, PREGUNTAS[0], "es")  # Load the tokenizer
+    return lambda i: construir_prompt(PASAJES, PREGUNTAS[i % len(PREGUNTAS)], "es")
+
+
+def _prompt_generacion(i: int) -> str:
+    contexto = "\n".join(PASAJES[:2])
+    return f"Usa el siguiente contexto para responder.\n\nContexto:\n{contexto}\n\nPregunta: {PREGUNTAS[i % len(PREGUNTAS)]}\nRespuesta:"
+
+
+def etapa_generacion() -> Callable[[int], None]:
+    from vector_db.generate_response_hf import generar_respuesta_hf
+
+    generar_respuesta_hf(_prompt_generacion(0), max_tokens=8)
+    return lambda i: generar_respuesta_hf(_prompt_generacion(i), max_tokens=32)
+
+
+def crear_modelo_stub(destino: Path) -> Path:
+    """Save a tiny randomly initialized T5 that shares flan-t5's tokenizer."""
+    import torch
+    from transformers import AutoTokenizer, T5Config, T5ForConditionalGeneration
+
+    tokenizer = AutoTokenizer.from_pretrained(RAIZ / "models" / "flan-t5-base")
+    torch.manual_seed(0)
+    configuracion = T5Config(
+        vocab_size=len(tokenizer), d_model=32, d_kv=8, d_ff=64, num_layers=2, num_decoder_layers=2,
+        num_heads=2, decoder_start_token_id=tokenizer.pad_token_id, pad_token_id=tokenizer.pad_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+    )
+    T5ForConditionalGeneration(configuracion).save_pretrained(destino)
+    tokenizer.save_pretrained(destino)
+    return destino
+
+
+def etapa_generacion_stub() -> Callable[[int], None]:
+    os.environ["GENERATION_MODEL_PATH"] = str(crear_modelo_stub(Path(tempfile.mkdtemp())))
+    return etapa_generacion()
+
+
+def etapa_repeticion_prompts() -> Callable[[int], None]:
+    """
+    Replay a skewed mix of repeated and paraphrased questions through the answer cache.
+
+    Every question the cache misses builds its prompt over the same passages;
+    a hit is a prompt whose token ids already reached the generator, i.e. the
+    hit rate an exact-prompt encoder cache would get behind the answer cache.
+    """
+    from agent.rag_agent import (
+        MAX_CACHE_RESPUESTAS, TTL_CACHE_RESPUESTAS, UMBRAL_CACHE_RESPUESTAS, CacheSemanticaRespuestas, construir_prompt,
+    )
+    from utils.language_detection import detectar_idioma
+    from vector_db.embedding_client import embed_texto
+    from vector_db.generate_response_hf import cargar_tokenizer
+
+    generador = random.Random(0)
+    preguntas = PREGUNTAS + PARAFRASIS
+    pesos = [1 / (rango + 1) for rango in range(len(preguntas))]  # Zipf-like popularity
+    cache = CacheSemanticaRespuestas(UMBRAL_CACHE_RESPUESTAS, TTL_CACHE_RESPUESTAS, MAX_CACHE_RESPUESTAS)
+    tokenizer = cargar_tokenizer()
+    vistos = set()
+    conteo = {"aciertos": 0, "fallos": 0}
+
+    def operacion(i: int) -> None:
+        pregunta = generador.choices(preguntas, pesos)[0]
+        idioma = detectar_idioma(pregunta)
+        vector = embed_texto(pregunta)
+        if cache.buscar(vector, idioma) is not None:
+            return
+        clave = tuple(tokenizer.encode(construir_prompt(PASAJES, pregunta, idioma)))
+        conteo["aciertos" if clave in vistos else "fallos"] += 1
+        vistos.add(clave)
+        cache.guardar(vector, idioma, pregunta, "respuesta")
+
+    def metricas() -> dict:
+        total = conteo["aciertos"] + conteo["fallos"]
+        return {
+            "prompts_generados": total,
+            "tasa_aciertos": conteo["aciertos"] / total if total else 0.0,
+            "tasa_aciertos_cache_respuestas": cache.estadisticas()["tasa_aciertos"],
+        }
+
+    operacion.metricas = metricas
+    return operacion
+
+
+ETAPAS: Dict[str, Callable[[], Callable[[int], None]]] = {
+    "embedding": etapa_embedding,
+    "embedding_cache": etapa_embedding_cache,
+    "busqueda": etapa_busqueda,
+    "busqueda_local": etapa_busqueda_local,
+    "contexto": etapa_contexto,
+    "generacion": etapa_generacion,
+    "generacion_stub": etapa_generacion_stub,
+    "repeticion_prompts": etapa_repeticion_prompts,
+}
+
+# === Measurement ===
+def percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _medir_etapa(nombre: str, iteraciones: int, cola: mp.Queue) -> None:
+    os.chdir(RAIZ)  # Model paths are relative to the repository root
+    try:
+        operacion = ETAPAS[nombre]()
+        latencias = []
+        inicio_total = time.perf_counter()
+        for i in range(iteraciones):
+            inicio = time.perf_counter()
+            operacion(i)
+            latencias.append(time.perf_counter() - inicio)
+        total = time.perf_counter() - inicio_total
+
+        metricas = {
+            "iteraciones": iteraciones,
+            "p50_ms": percentil(latencias, 50) * 1000,
+            "p95_ms": percentil(latencias, 95) * 1000,
+            "p99_ms": percentil(latencias, 99) * 1000,
+            "media_ms": sum(latencias) / len(latencias) * 1000,
+            "throughput_ops_s": iteraciones / total if total else 0.0,
+            "rss_pico_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }
+        if hasattr(operacion, "metricas"):
+            metricas.update(operacion.metricas())
+        cola.put(metricas)
+    except Exception as error:
+        cola.put({"error": f"{type(error).__name__}: {error}"})
+
+
+def medir_etapa(nombre: str, iteraciones: int) -> dict:
+    """Run one stage in a fresh process and return its metrics."""
+    contexto = mp.get_context("spawn")
+    cola = contexto.Queue()
+    proceso = contexto.Process(target=_medir_etapa, args=(nombre, iteraciones, cola))
+    proceso.start()
+    resultado = cola.get()
+    proceso.join()
+    return resultado
+
+# === Baseline comparison ===
+def comparar_con_base(actual: dict, base: dict, tolerancia: float) -> List[str]:
+    """Return a description of every stage whose p95 latency regressed beyond the tolerance."""
+    regresiones = []
+    for nombre, metricas in actual["etapas"].items():
+        referencia = base.get("etapas", {}).get(nombre)
+        if not referencia or "error" in metricas or "error" in referencia:
+            continue
+        ratio = metricas["p95_ms"] / referencia["p95_ms"] if referencia["p95_ms"] else 1.0
+        if ratio > 1 + tolerancia:
+            regresiones.append(
+                f"{nombre}: p95 {referencia['p95_ms']:.2f} ms -> {metricas['p95_ms']:.2f} ms (x{ratio:.2f})"
+            )
+    return regresiones
+
+# === Main ===
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-stage latency benchmarks for the RAG pipeline.")
+    parser.add_argument("--etapas", nargs="+", choices=list(ETAPAS), default=list(ETAPAS))
+    parser.add_argument("--iteraciones", type=int, default=50)
+    parser.add_argument("--iteraciones-generacion", type=int, default=10)
+    parser.add_argument("--salida", type=Path, default=RUTA_RESULTADOS)
+    parser.add_argument("--base", type=Path, default=RUTA_BASE)
+    parser.add_argument("--guardar-base", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Allowed p95 slowdown (0.2 = 20%%).")
+    args = parser.parse_args()
+
+    resultados = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "entorno": {"python": platform.python_version(), "plataforma": platform.platform(), "cpus": os.cpu_count()},
+        "etapas": {},
+    }
+
+    print(f"{'Etapa':<16} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'ops/s':>9} {'RSS (MB)':>9}")
+    for nombre in args.etapas:
+        iteraciones = args.iteraciones_generacion if nombre.startswith("generacion") else args.iteraciones
+        metricas = medir_etapa(nombre, iteraciones)
+        resultados["etapas"][nombre] = metricas
+
+        if "error" in metricas:
+            print(f"{nombre:<16} ⚡ skipped: {metricas['error']}")
+        else:
+            print(
+                f"{nombre:<16} {metricas['p50_ms']:>9.2f} {metricas['p95_ms']:>9.2f} {metricas['p99_ms']:>9.2f} "
+                f"{metricas['throughput_ops_s']:>9.1f} {metricas['rss_pico_mb']:>9.0f}"
+            )
+            if "tasa_aciertos" in metricas:
+                print(f"{'':<16} 🎯 hit rate {metricas['tasa_aciertos']:.1%} over {metricas['prompts_generados']} generated prompts")
+
+    args.salida.parent.mkdir(parents=True, exist_ok=True)
+    args.salida.write_text(json.dumps(resultados, indent=2), encoding="utf-8")
+    print(f"✅ Results saved to {args.salida}")
+
+    if args.guardar_base:
+        args.base.write_text(json.dumps(resultados, indent=2), encoding="utf-8")
+        print(f"✅ Baseline saved to {args.base}")
+        return
+
+    if not args.base.exists():
+        print(f"ℹ️ No baseline at {args.base}; run with --guardar-base to create one.")
+        return
+
+    regresiones = comparar_con_base(resultados, json.loads(args.base.read_text(encoding="utf-8")), args.tolerancia)
+    if regresiones:
+        print("❌ Latency regressions against the baseline:")
+        for regresion in regresiones:
+            print(f"   - {regresion}")
+        sys.exit(1)
+
+    print("✅ No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# test_embedding_cache.py
+
+import sys
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import streamlit as st
+from vector_db.embedding_client import embed_texto, estadisticas_cache_embeddings, normalizar_texto
+
+st.title("🧪 Embedding Cache Test")
+
+texto_entrada = st.text_input("✏️ Pregunta a embeber:", value="¿Qué experiencia tienes en Python?")
+
+if st.button("Embeber dos veces"):
+    if texto_entrada.strip():
+        inicio = time.perf_counter()
+        primero = embed_texto(texto_entrada)
+        t_primero = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        segundo = embed_texto(f"  {texto_entrada.upper()}  ")
+        t_segundo = time.perf_counter() - inicio
+
+        st.write(f"🔑 Texto normalizado: `{normalizar_texto(texto_entrada)}`")
+        st.write(f"⏱️ Primera llamada: {t_primero * 1000:.1f} ms — segunda: {t_segundo * 1000:.1f} ms")
+
+        if primero and primero == segundo:
+            st.success("✅ La segunda llamada se sirvió desde la caché.")
+        else:
+            st.error("❌ Los vectores no coinciden: la caché no se ha usado.")
+
+        st.json(estadisticas_cache_embeddings())
+    else:
+        st.warning("⚠️ Introduce algún texto antes de continuar.")
@@ -0,0 +1,39 @@
+# test_extractive_routing.py
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import streamlit as st
+from agent.rag_agent import _combinar_hits, _enrutar, buscar_hits_relevantes
+
+st.title("🧭 Extractive Routing Test")
+
+pregunta = st.text_input("🗣️ Pregunta:", value="¿Qué experiencia tienes en Python?")
+pasaje = st.text_area(
+    "📄 Pasaje recuperado:",
+    value="Tengo cinco años de experiencia en Python desarrollando APIs y pipelines de datos.",
+)
+
+if st.button("Comprobar enrutado"):
+    if pregunta.strip() and pasaje.strip():
+        hits = [("doc-1", pasaje.strip(), 12.0), ("doc-2", "Me gusta el senderismo.", 1.5)]
+
+        # Confident BM25 hits only: the dense search is skipped, but generation must not be
+        hits_lexicos, confiable = buscar_hits_relevantes(pregunta.strip(), cliente=None, lexico=(hits, True))
+        respuesta = _enrutar(pregunta.strip(), hits_lexicos, confiable, "es")
+        if not confiable and respuesta is None:
+            st.success("✅ Una coincidencia solo léxica pasa por el generador.")
+        else:
+            st.error(f"❌ Una coincidencia solo léxica se respondió de forma extractiva: {respuesta}")
+
+        # Confident dense hit that also ranks first after fusion: eligible for an extractive answer
+        hits_densos = [("doc-1", pasaje.strip(), 0.91), ("doc-2", "Me gusta el senderismo.", 0.42)]
+        hits_fusionados, confiable = _combinar_hits(hits_densos, hits, 3)
+        if confiable:
+            st.success("✅ Un acierto denso confiable puede responderse de forma extractiva.")
+            st.markdown(_enrutar(pregunta.strip(), hits_fusionados, confiable, "es") or "_(ninguna frase cubre la pregunta)_")
+        else:
+            st.error("❌ El acierto denso confiable no se marcó como tal.")
+    else:
+        st.warning("⚠️ Introduce una pregunta y un pasaje.")
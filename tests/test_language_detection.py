@@ -0,0 +1,44 @@
+# test_language_detection.py
+
+import sys
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import streamlit as st
+from utils.language_detection import detectar_idioma, resolver_idioma
+
+st.title("🌐 Language Detection Test")
+
+texto = st.text_input("🗣️ Pregunta:", value="What experience do you have with Power BI?")
+idioma_ui = st.radio("Idioma de la interfaz:", options=["(ninguno)", "es", "en"], horizontal=True)
+
+if texto.strip():
+    detectar_idioma.cache_clear()
+    inicio = time.perf_counter()
+    detectado = detectar_idioma(texto)
+    milisegundos = (time.perf_counter() - inicio) * 1000
+
+    resuelto = resolver_idioma(texto, None if idioma_ui == "(ninguno)" else idioma_ui)
+
+    st.success(f"✅ Detectado: `{detectado}` en {milisegundos:.3f} ms — idioma de respuesta: `{resuelto}`")
+    st.json(detectar_idioma.cache_info()._asdict())
+else:
+    st.info("✍️ Introduce una pregunta para detectar su idioma.")
+
+# English questions with accented loanwords must not be forced to Spanish
+CASOS = [
+    ("Can you send me your résumé?", "en"),
+    ("Is your résumé up to date with your latest projects?", "en"),
+    ("¿Tienes el currículum actualizado?", "es"),
+    ("Qué proyectos has hecho con Python", "es"),
+    ("¡Gracias por tu tiempo!", "es"),
+]
+
+if st.button("Comprobar casos con acentos"):
+    for pregunta, esperado in CASOS:
+        detectado = detectar_idioma(pregunta)
+        if detectado == esperado:
+            st.success(f"✅ `{detectado}` — {pregunta}")
+        else:
+            st.error(f"❌ Se esperaba `{esperado}` y se detectó `{detectado}` — {pregunta}")
@@ -0,0 +1,38 @@
+# test_log_to_google_sheet.py
+
+import sys
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import streamlit as st
+from vector_db.log_to_google_sheet import (
+    RegistradorAsincrono,
+    RegistroEscrituraAnticipada,
+    SinkArchivoLocal
+)
+
+st.title("📝 Async Logger Test — Local Sink")
+
+num_filas = st.slider("🔢 Rows to log:", min_value=1, max_value=100, value=25)
+
+if st.button("Log rows"):
+    carpeta = Path(tempfile.mkdtemp())
+    sink = SinkArchivoLocal(carpeta / "logs.csv")
+    wal = RegistroEscrituraAnticipada(carpeta / "pending_logs.jsonl")
+    registrador = RegistradorAsincrono(sink, wal, tamano_lote=10, intervalo_flush=0.5)
+
+    for i in range(num_filas):
+        registrador.registrar(f"Pregunta {i}", f"Respuesta {i}")
+
+    registrador.detener(timeout=10)
+
+    filas = sink.ruta.read_text(encoding="utf-8").splitlines()
+    pendientes = wal.pendientes()
+
+    if len(filas) == num_filas and not pendientes:
+        st.success(f"✅ {len(filas)} rows written in batches, write-ahead log fully acknowledged.")
+    else:
+        st.error(f"❌ {len(filas)} rows written, {len(pendientes)} still pending.")
+
+    st.code("\n".join(filas[:10]), language="text")
@@ -0,0 +1,27 @@
+# test_metrics.py
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import streamlit as st
+from agent.rag_agent import cargar_qdrant, responder_pregunta
+from utils.metrics import exportar_prometheus, resumen_etapas, ultimas_trazas
+
+st.title("📈 Metrics Test")
+
+pregunta = st.text_input("🗣️ Pregunta:", value="¿Qué experiencia tienes en Python?")
+
+if st.button("Responder"):
+    respuesta = responder_pregunta(pregunta, cargar_qdrant())
+    st.success(f"✅ {respuesta}")
+
+    traza = ultimas_trazas()[0]
+    st.subheader(f"🧵 Traza ({traza['total_ms']:.0f} ms)")
+    st.table([{"etapa": etapa, "ms": round(ms, 2)} for etapa, ms in traza["spans"]])
+
+st.subheader("⏱️ Latencia por etapa")
+st.json(resumen_etapas())
+
+st.subheader("📄 Prometheus")
+st.code(exportar_prometheus(), language="text")
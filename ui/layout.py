@@ -9,6 +9,10 @@ Functions:
     mostrar_input_pregunta(idioma): Display the input box for recruiter questions.
     mostrar_respuesta_chat(respuesta): Display the chatbot's answer.
     mostrar_footer_aviso_logging(): Show a small footer reminding about logging.
+    mostrar_panel_debug(etapas, gauges, trazas): Show per-stage latency, caches, queues and recent traces (admin only).
+    html_intercambio(pregunta, respuesta): Pre-render a question/answer pair as HTML bubbles.
+    mostrar_historial(html): Display pre-rendered chat history in a single element.
+    mostrar_boton_anteriores(ocultos): Display the 'load earlier messages' button and return its state.
 """
 
 # === Imports ===
@@ -65,10 +69,9 @@ def mostrar_footer_aviso_logging() -> None:
     )
 
 
-def mostrar_mensaje_recruiter(mensaje: str) -> None:
-    """Display the recruiter's message in a styled chat bubble."""
-    st.markdown(
-        f"""
+def html_mensaje_recruiter(mensaje: str) -> str:
+    """Return the HTML of the recruiter's chat bubble."""
+    return f"""
         <div style="
             background: linear-gradient(135deg, #d4edda, #c3e6cb);
             padding: 12px;
@@ -80,14 +83,17 @@ def mostrar_mensaje_recruiter(mensaje: str) -> None:
             ">
             <b>🧑‍💼 Tú:</b> {mensaje}
         </div>
-        """,
-        unsafe_allow_html=True
-    )
+        """
 
-def mostrar_mensaje_bot(mensaje: str) -> None:
-    """Display the bot's message in a styled chat bubble."""
-    st.markdown(
-        f"""
+
+def mostrar_mensaje_recruiter(mensaje: str) -> None:
+    """Display the recruiter's message in a styled chat bubble."""
+    st.markdown(html_mensaje_recruiter(mensaje), unsafe_allow_html=True)
+
+
+def html_mensaje_bot(mensaje: str) -> str:
+    """Return the HTML of the bot's chat bubble."""
+    return f"""
         <div style="
             background: linear-gradient(135deg, #f8f9fa, #e9ecef);
             padding: 12px;
@@ -99,9 +105,34 @@ def mostrar_mensaje_bot(mensaje: str) -> None:
             ">
             <b>🤖 {NOMBRE_BOT}:</b> {mensaje}
         </div>
-        """,
-        unsafe_allow_html=True
-    )
+        """
+
+
+def mostrar_mensaje_bot(mensaje: str, contenedor=None) -> None:
+    """Display the bot's message in a styled chat bubble.
+
+    Args:
+        mensaje (str): Text of the message.
+        contenedor (optional): Streamlit placeholder (e.g. ``st.empty()``) to render into,
+            so a streamed answer can be redrawn in place as it grows.
+    """
+    (contenedor or st).markdown(html_mensaje_bot(mensaje), unsafe_allow_html=True)
+
+
+def html_intercambio(pregunta: str, respuesta: str) -> str:
+    """Pre-render a question/answer pair as HTML bubbles."""
+    return html_mensaje_recruiter(pregunta) + html_mensaje_bot(respuesta)
+
+
+def mostrar_historial(html: str) -> None:
+    """Display pre-rendered chat history in a single Streamlit element."""
+    if html:
+        st.markdown(html, unsafe_allow_html=True)
+
+
+def mostrar_boton_anteriores(ocultos: int) -> bool:
+    """Display the 'load earlier messages' button and return True if clicked."""
+    return st.button(f"⬆️ Ver mensajes anteriores ({ocultos})")
 
 def mostrar_input_pregunta(idioma: str) -> str:
     """Display the input box for recruiter questions with autofocus and return the user's input."""
@@ -131,3 +162,30 @@ def mostrar_input_pregunta(idioma: str) -> str:
     
     return input_value
 
+
+def mostrar_panel_debug(etapas: dict, gauges: dict, trazas: list) -> None:
+    """Display the admin debug panel in the sidebar.
+
+    Args:
+        etapas (dict): Latency percentiles per stage (see utils.metrics.resumen_etapas).
+        gauges (dict): Current cache hit rates and queue depths.
+        trazas (list): Most recent request traces, newest first.
+    """
+    with st.sidebar.expander("🛠️ Debug", expanded=False):
+        st.markdown("**Latencia por etapa (ms)**")
+        if etapas:
+            st.dataframe(
+                [{"etapa": etapa, **{clave: round(valor, 2) for clave, valor in datos.items()}}
+                 for etapa, datos in sorted(etapas.items())],
+                hide_index=True,
+            )
+        else:
+            st.caption("Sin datos todavía.")
+
+        st.markdown("**Cachés y colas**")
+        st.json(gauges, expanded=False)
+
+        st.markdown("**Últimas trazas**")
+        for traza in trazas[:5]:
+            spans = " · ".join(f"{etapa} {ms:.0f}" for etapa, ms in traza["spans"])
+            st.caption(f"{traza.get('total_ms', 0):.0f} ms — {spans}")
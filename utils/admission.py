@@ -0,0 +1,168 @@
+"""Admission control for the generation stage of ItsMeHi.
+
+flan-t5 runs on the same CPU as the app, so a burst of sessions generating at
+once makes every request slow instead of a few requests fast. The controller
+caps how many generations run at the same time, keeps a bounded FIFO queue of
+waiters (reporting each one's position so the UI can show it), rejects new
+requests at once when the queue is full, and gives up on waiters after a
+maximum wait so admitted requests keep a bounded tail latency. A token bucket
+per session limits how often a single user can ask.
+
+Classes:
+    CubetaTokens: Per-session token bucket rate limiter.
+    ControlAdmision: Global concurrency limit with a bounded wait queue.
+"""
+
+# === Imports ===
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+from utils.metrics import incrementar, registrar_duracion
+
+# === Constants ===
+MAX_GENERACIONES_CONCURRENTES = int(os.getenv("GENERATION_MAX_CONCURRENT", "4"))
+MAX_COLA_GENERACION = int(os.getenv("GENERATION_MAX_QUEUE", "8"))  # Waiters beyond this are rejected at once
+MAX_ESPERA_ADMISION = float(os.getenv("ADMISSION_MAX_WAIT", "20"))  # Seconds in the queue before giving up
+CAPACIDAD_CUBETA_SESION = float(os.getenv("SESSION_RATE_BURST", "3"))  # Questions a session can send in a burst
+PREGUNTAS_POR_MINUTO_SESION = float(os.getenv("SESSION_RATE_PER_MINUTE", "6"))
+INTERVALO_AVISO_COLA = 0.5  # Seconds between queue position checks
+
+# === Rate limiting ===
+class CubetaTokens:
+    """
+    Token bucket: ``capacidad`` requests in a burst, refilled at ``por_minuto`` per minute.
+
+    Args:
+        capacidad (float): Maximum tokens (burst size).
+        por_minuto (float): Tokens added per minute.
+    """
+
+    def __init__(self, capacidad: float = CAPACIDAD_CUBETA_SESION, por_minuto: float = PREGUNTAS_POR_MINUTO_SESION):
+        self.capacidad = capacidad
+        self.tasa = por_minuto / 60
+        self.tokens = capacidad
+        self._ultima = time.monotonic()
+
+    def _rellenar(self) -> None:
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self._ultima) * self.tasa)
+        self._ultima = ahora
+
+    def consumir(self) -> bool:
+        """Take one token if available."""
+        self._rellenar()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def espera(self) -> float:
+        """Seconds until the next token is available."""
+        self._rellenar()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.tasa if self.tasa else float("inf")
+
+# === Admission ===
+class ControlAdmision:
+    """
+    Global concurrency limit with a bounded FIFO wait queue.
+
+    Args:
+        max_concurrentes (int): Generations allowed to run at the same time.
+        max_cola (int): Waiters allowed in the queue; further requests are rejected.
+        espera_maxima (float): Seconds a waiter stays queued before giving up.
+    """
+
+    def __init__(self, max_concurrentes: int = MAX_GENERACIONES_CONCURRENTES, max_cola: int = MAX_COLA_GENERACION,
+                 espera_maxima: float = MAX_ESPERA_ADMISION):
+        self.max_concurrentes = max(1, max_concurrentes)
+        self.max_cola = max(0, max_cola)
+        self.espera_maxima = espera_maxima
+        self.activos = 0
+        self._cola: "deque[object]" = deque()
+        self._condicion = threading.Condition()
+
+    def en_cola(self) -> int:
+        return len(self._cola)
+
+    def estado(self) -> dict:
+        """Return running generations and queued waiters."""
+        with self._condicion:
+            return {"activos": self.activos, "en_cola": len(self._cola)}
+
+    def adquirir(self, al_esperar: Optional[Callable[[int], None]] = None, espera: Optional[float] = None) -> bool:
+        """
+        Wait for a generation slot.
+
+        Args:
+            al_esperar (Callable[[int], None], optional): Called with the 1-based
+                queue position whenever it changes (outside the lock).
+            espera (float, optional): Seconds this caller can wait, if shorter than ``espera_maxima``.
+
+        Returns:
+            bool: True if admitted (call ``liberar`` afterwards), False if the
+            queue was full or the maximum wait elapsed.
+        """
+        turno = object()
+        with self._condicion:
+            if self.activos < self.max_concurrentes and not self._cola:
+                self.activos += 1
+                incrementar("admission_total", resultado="admitida")
+                return True
+            if len(self._cola) >= self.max_cola:
+                incrementar("admission_total", resultado="rechazada")
+                return False
+            self._cola.append(turno)
+
+        inicio = time.monotonic()
+        espera_maxima = self.espera_maxima if espera is None else min(espera, self.espera_maxima)
+        posicion_previa = 0
+        try:
+            while True:
+                with self._condicion:
+                    if self._cola[0] is turno and self.activos < self.max_concurrentes:
+                        self._cola.popleft()
+                        self.activos += 1
+                        self._condicion.notify_all()
+                        incrementar("admission_total", resultado="admitida")
+                        registrar_duracion("admision_cola", time.monotonic() - inicio)
+                        return True
+
+                    restante = espera_maxima - (time.monotonic() - inicio)
+                    if restante <= 0:
+                        incrementar("admission_total", resultado="agotada")
+                        return False
+
+                    posicion = self._cola.index(turno) + 1
+                    if posicion == posicion_previa:
+                        self._condicion.wait(min(restante, INTERVALO_AVISO_COLA))
+                        continue
+
+                posicion_previa = posicion
+                if al_esperar is not None:
+                    al_esperar(posicion)
+        finally:
+            with self._condicion:
+                if turno in self._cola:
+                    self._cola.remove(turno)
+                    self._condicion.notify_all()
+
+    def liberar(self) -> None:
+        """Give back a generation slot."""
+        with self._condicion:
+            self.activos -= 1
+            self._condicion.notify_all()
+
+    @contextmanager
+    def turno(self, al_esperar: Optional[Callable[[int], None]] = None, espera: Optional[float] = None) -> Iterator[bool]:
+        """Hold a generation slot for the duration of the block; yields whether it was admitted."""
+        admitido = self.adquirir(al_esperar, espera)
+        try:
+            yield admitido
+        finally:
+            if admitido:
+                self.liberar()
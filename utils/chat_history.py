@@ -0,0 +1,102 @@
+"""Chat history for ItsMeHi sessions.
+
+Each question/answer pair is rendered to HTML once, when it is added, so
+reruns only join the strings of the visible window instead of re-emitting a
+bubble per message. Only the most recent exchanges are kept as text plus
+HTML; older ones are spilled into zlib-compressed JSON blocks (rendered again
+only if the user pages back that far), and the oldest blocks are dropped
+beyond a hard cap, so per-session memory stays bounded.
+
+Classes:
+    HistorialChat: Bounded chat history with pre-rendered HTML and compressed spill.
+"""
+
+# === Imports ===
+import os
+import json
+import zlib
+from collections import deque
+from typing import Callable, List, Tuple
+
+# === Constants ===
+MAX_EN_MEMORIA = int(os.getenv("CHAT_HISTORY_IN_MEMORY", "40"))  # Exchanges kept with their HTML
+TAMANO_BLOQUE = int(os.getenv("CHAT_HISTORY_BLOCK_SIZE", "20"))  # Exchanges per compressed block
+MAX_TOTAL = int(os.getenv("CHAT_HISTORY_MAX", "400"))  # Exchanges kept per session
+
+# === History ===
+class HistorialChat:
+    """
+    Bounded chat history for one session.
+
+    Args:
+        renderizar (Callable[[str, str], str]): Renders a (question, answer) pair to HTML.
+        max_en_memoria (int): Recent exchanges kept as text plus pre-rendered HTML.
+        tamano_bloque (int): Exchanges per compressed block when spilling.
+        max_total (int): Exchanges kept overall; the oldest blocks are dropped beyond it.
+    """
+
+    def __init__(self, renderizar: Callable[[str, str], str], max_en_memoria: int = MAX_EN_MEMORIA,
+                 tamano_bloque: int = TAMANO_BLOQUE, max_total: int = MAX_TOTAL):
+        self.renderizar = renderizar
+        self.max_en_memoria = max(1, max_en_memoria)
+        self.tamano_bloque = max(1, tamano_bloque)
+        self.max_total = max(self.max_en_memoria, max_total)
+        self.descartados = 0
+        self._recientes: "deque[Tuple[str, str, str]]" = deque()
+        self._bloques: "deque[Tuple[int, bytes]]" = deque()  # (exchanges, compressed JSON), oldest first
+        self._en_bloques = 0
+        self._memo: Tuple[int, int, str] = (-1, -1, "")  # (version, window, HTML)
+        self._version = 0
+
+    def __len__(self) -> int:
+        return self._en_bloques + len(self._recientes)
+
+    def anadir(self, pregunta: str, respuesta: str) -> None:
+        """Add an exchange, rendering its HTML once."""
+        self._recientes.append((pregunta, respuesta, self.renderizar(pregunta, respuesta)))
+        self._version += 1
+
+        if len(self._recientes) >= self.max_en_memoria + self.tamano_bloque:
+            bloque = [self._recientes.popleft()[:2] for _ in range(self.tamano_bloque)]
+            self._bloques.append((len(bloque), zlib.compress(json.dumps(bloque, ensure_ascii=False).encode("utf-8"))))
+            self._en_bloques += len(bloque)
+
+        while len(self) > self.max_total and self._bloques:
+            tamano, _ = self._bloques.popleft()
+            self._en_bloques -= tamano
+            self.descartados += tamano
+
+    def vaciar(self) -> None:
+        """Drop the whole history."""
+        self._recientes.clear()
+        self._bloques.clear()
+        self._en_bloques = 0
+        self.descartados = 0
+        self._version += 1
+
+    def _html_bloques(self, cuantos: int) -> List[str]:
+        """Render the last ``cuantos`` spilled exchanges (decompressing only the blocks needed)."""
+        html: List[str] = []
+        for tamano, datos in reversed(self._bloques):
+            if cuantos <= 0:
+                break
+            pares = json.loads(zlib.decompress(datos).decode("utf-8"))[-cuantos:]
+            html[:0] = [self.renderizar(pregunta, respuesta) for pregunta, respuesta in pares]
+            cuantos -= tamano
+        return html
+
+    def ventana(self, visibles: int) -> str:
+        """
+        Return the HTML of the last ``visibles`` exchanges, oldest first.
+
+        The result is memoized until the history changes or the window size does.
+        """
+        version, ventana, html = self._memo
+        if version == self._version and ventana == visibles:
+            return html
+
+        recientes = list(self._recientes)[-visibles:] if visibles > 0 else []
+        partes = self._html_bloques(visibles - len(recientes)) + [h for _, _, h in recientes]
+        html = "".join(partes)
+        self._memo = (self._version, visibles, html)
+        return html
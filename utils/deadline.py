@@ -0,0 +1,46 @@
+"""Per-request deadlines for the ItsMeHi pipeline.
+
+A ``Plazo`` is created once per question and passed down to embedding,
+search and generation. Each stage takes its own budget with ``etapa`` (never
+beyond the request deadline) and turns the remaining time into whatever its
+backend understands: an HTTP timeout, a Qdrant search timeout, or a max-time
+stopping criterion for ``generate``.
+
+Classes:
+    Plazo: Absolute deadline on the monotonic clock.
+"""
+
+# === Imports ===
+import os
+import time
+from typing import Optional
+
+# === Constants ===
+PLAZO_PREGUNTA = float(os.getenv("REQUEST_DEADLINE", "30"))  # Seconds per question, end to end
+
+# === Deadline ===
+class Plazo:
+    """
+    Absolute deadline on the monotonic clock.
+
+    Args:
+        segundos (float): Seconds from now until the deadline.
+        limite (float, optional): Absolute ``time.monotonic()`` deadline; overrides ``segundos``.
+    """
+
+    def __init__(self, segundos: float = PLAZO_PREGUNTA, limite: Optional[float] = None):
+        self.limite = limite if limite is not None else time.monotonic() + segundos
+
+    def restante(self) -> float:
+        """Seconds left (0 once the deadline has passed)."""
+        return max(0.0, self.limite - time.monotonic())
+
+    def agotado(self) -> bool:
+        return time.monotonic() >= self.limite
+
+    def etapa(self, maximo: float) -> "Plazo":
+        """Return the deadline of a stage that may take at most ``maximo`` seconds."""
+        return Plazo(limite=min(self.limite, time.monotonic() + maximo))
+
+    def __repr__(self) -> str:
+        return f"Plazo(restante={self.restante():.2f}s)"
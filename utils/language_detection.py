@@ -0,0 +1,133 @@
+"""Language resolution for ItsMeHi.
+
+This module decides whether a question should be answered in Spanish or
+English. The language chosen in the UI wins; otherwise a small character
+trigram Naive Bayes classifier restricted to "es"/"en" is used. Its
+log-probability tables are computed once at import time from a built-in
+seed corpus, so detection is deterministic and takes well under a
+millisecond, and results are memoized.
+
+Functions:
+    detectar_idioma(texto): Classify a text as "es" or "en".
+    resolver_idioma(texto, idioma_ui): Prefer the UI language, otherwise detect it.
+"""
+
+# === Imports ===
+import math
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Optional
+
+# === Constants ===
+IDIOMAS = ("es", "en")
+IDIOMA_POR_DEFECTO = "es"
+TAMANO_MEMO = 2048
+MARCADORES_ES = set("ñ¿¡")  # Characters that never appear in English questions (unlike "é" in "résumé")
+
+CORPUS_SEMILLA = {
+    "es": (
+        "hola qué tal soy analista de datos y me gustaría saber más sobre tu experiencia "
+        "cuál es tu experiencia con python y el procesamiento de lenguaje natural "
+        "qué proyectos has hecho en los últimos años y qué herramientas usas "
+        "tienes experiencia creando pipelines etl y dashboards en power bi "
+        "por qué quieres trabajar con nosotros y cuándo podrías empezar "
+        "cuéntame sobre tu formación y tus estudios de lingüística "
+        "cómo trabajas en equipo y qué te motiva en el día a día "
+        "estás disponible para trabajar en remoto o de forma presencial "
+        "qué idiomas hablas y cuál es tu nivel de inglés "
+        "buscamos un candidato capaz de analizar el feedback de los clientes "
+        "el rol requiere habilidades en visualización de datos y aprendizaje automático "
+        "me puedes explicar cómo resolverías este problema con los datos que tenemos "
+        "cuáles son tus puntos fuertes y en qué te gustaría mejorar "
+        "has liderado algún proyecto o has trabajado con modelos de lenguaje "
+        "gracias por tu tiempo nos pondremos en contacto contigo muy pronto"
+    ),
+    "en": (
+        "hi there i am a data analyst and i would like to know more about your experience "
+        "what is your experience with python and natural language processing "
+        "which projects have you worked on in the last few years and what tools do you use "
+        "do you have experience building etl pipelines and dashboards in power bi "
+        "why do you want to work with us and when could you start "
+        "tell me about your background and your studies in linguistics "
+        "how do you work in a team and what motivates you every day "
+        "are you available to work remotely or on site "
+        "which languages do you speak and what is your level of spanish "
+        "we are looking for a candidate able to analyze customer feedback "
+        "the role requires skills in data visualization and machine learning "
+        "can you explain how you would solve this problem with the data we have "
+        "what are your strengths and what would you like to improve "
+        "have you led any project or worked with language models "
+        "thanks for your time we will get back to you very soon"
+    ),
+}
+
+# === Model ===
+
+def _normalizar(texto: str) -> str:
+    texto = unicodedata.normalize("NFC", texto.lower())
+    return " ".join(re.findall(r"[^\W\d_]+", texto))
+
+
+def _trigramas(texto: str):
+    relleno = f" {texto} "
+    return (relleno[i:i + 3] for i in range(len(relleno) - 2))
+
+
+def _entrenar(corpus: Dict[str, str]) -> Dict[str, Dict[str, float]]:
+    """Build add-one smoothed trigram log-probabilities per language."""
+    conteos = {idioma: Counter(_trigramas(_normalizar(texto))) for idioma, texto in corpus.items()}
+    vocabulario = set().union(*conteos.values())
+    tablas = {}
+
+    for idioma, conteo in conteos.items():
+        total = sum(conteo.values()) + len(vocabulario) + 1
+        tablas[idioma] = {trigrama: math.log((conteo[trigrama] + 1) / total) for trigrama in vocabulario}
+        tablas[idioma][""] = math.log(1 / total)  # Unseen trigram
+
+    return tablas
+
+
+TABLAS_LOG_PROB = _entrenar(CORPUS_SEMILLA)
+
+# === Functions ===
+
+@lru_cache(maxsize=TAMANO_MEMO)
+def detectar_idioma(texto: str) -> str:
+    """Classify a text as Spanish or English.
+
+    Args:
+        texto (str): Text to classify.
+
+    Returns:
+        str: "es" or "en" ("es" when there is nothing to classify).
+    """
+    normalizado = _normalizar(texto)
+    if not normalizado:
+        return IDIOMA_POR_DEFECTO
+    if MARCADORES_ES & set(texto.lower()):  # Checked before normalization, which drops "¿" and "¡"
+        return "es"
+
+    puntuaciones = {}
+    for idioma in IDIOMAS:
+        tabla = TABLAS_LOG_PROB[idioma]
+        desconocido = tabla[""]
+        puntuaciones[idioma] = sum(tabla.get(trigrama, desconocido) for trigrama in _trigramas(normalizado))
+
+    return max(IDIOMAS, key=lambda idioma: (puntuaciones[idioma], idioma == IDIOMA_POR_DEFECTO))
+
+
+def resolver_idioma(texto: str, idioma_ui: Optional[str] = None) -> str:
+    """Resolve the answer language for a question.
+
+    Args:
+        texto (str): The user's question.
+        idioma_ui (str, optional): Language selected in the UI ("es" or "en").
+
+    Returns:
+        str: The UI language if set, otherwise the detected language.
+    """
+    if idioma_ui in IDIOMAS:
+        return idioma_ui
+    return detectar_idioma(texto)
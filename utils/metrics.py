@@ -0,0 +1,241 @@
+"""Metrics and request tracing for ItsMeHi.
+
+This module collects per-stage timings, counters and gauges for the RAG
+pipeline in a process-wide registry, exports them in the Prometheus text
+format through a small local HTTP endpoint, and keeps recent samples and the
+last request traces for the admin debug panel.
+
+Functions:
+    medir_etapa(etapa): Context manager that times a pipeline stage.
+    registrar_duracion(etapa, segundos): Record a stage duration measured by the caller.
+    nueva_traza(): Context manager that groups the spans of one request.
+    traza_actual(), continuar_traza(traza): Carry a request trace into another thread or event loop.
+    incrementar(nombre, valor, **etiquetas): Increase a counter.
+    observar(nombre, valor, **etiquetas): Record a value in a histogram (e.g. token counts).
+    registrar_gauge(nombre, funcion, ayuda): Register a gauge computed on each scrape.
+    exportar_prometheus(): Render every metric in the Prometheus text format.
+    resumen_etapas(): p50/p95/p99 latency per stage from recent samples.
+    ultimas_trazas(): Most recent request traces.
+    iniciar_servidor_metricas(puerto): Serve /metrics on localhost in a daemon thread.
+"""
+
+# === Imports ===
+import time
+import threading
+import contextvars
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# === Constants ===
+PREFIJO = "itsmehi"
+BUCKETS_SEGUNDOS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BUCKETS_TOKENS = (16, 32, 64, 128, 256, 384, 512, 1024)
+MUESTRAS_POR_ETAPA = 1000
+TRAZAS_GUARDADAS = 20
+
+# === Registry ===
+_lock = threading.Lock()
+_contadores: Dict[Tuple[str, tuple], float] = defaultdict(float)
+_histogramas: Dict[Tuple[str, tuple], dict] = {}
+_ayudas: Dict[str, str] = {}
+_gauges: Dict[str, Callable[[], Union[float, Dict[str, float]]]] = {}
+_muestras: Dict[str, deque] = defaultdict(lambda: deque(maxlen=MUESTRAS_POR_ETAPA))
+_trazas: deque = deque(maxlen=TRAZAS_GUARDADAS)
+_traza_actual: contextvars.ContextVar = contextvars.ContextVar("traza_actual", default=None)
+
+
+def _etiquetas(etiquetas: dict) -> tuple:
+    return tuple(sorted((clave, str(valor)) for clave, valor in etiquetas.items()))
+
+
+def incrementar(nombre: str, valor: float = 1.0, **etiquetas) -> None:
+    """Increase the counter ``itsmehi_<nombre>`` by ``valor``."""
+    with _lock:
+        _contadores[(nombre, _etiquetas(etiquetas))] += valor
+
+
+def observar(nombre: str, valor: float, buckets: Tuple[float, ...] = BUCKETS_TOKENS, **etiquetas) -> None:
+    """Record ``valor`` in the histogram ``itsmehi_<nombre>``."""
+    clave = (nombre, _etiquetas(etiquetas))
+    with _lock:
+        histograma = _histogramas.setdefault(clave, {"buckets": buckets, "conteos": [0] * len(buckets), "suma": 0.0, "n": 0})
+        for i, limite in enumerate(histograma["buckets"]):
+            if valor <= limite:
+                histograma["conteos"][i] += 1
+        histograma["suma"] += valor
+        histograma["n"] += 1
+
+
+def registrar_gauge(nombre: str, funcion: Callable[[], Union[float, Dict[str, float]]], ayuda: str = "") -> None:
+    """Register a gauge evaluated at scrape time.
+
+    Args:
+        nombre (str): Metric name without prefix.
+        funcion (Callable): Returns a number, or a dict mapping a ``tipo`` label to numbers.
+        ayuda (str): HELP text.
+    """
+    _gauges[nombre] = funcion
+    if ayuda:
+        _ayudas[nombre] = ayuda
+
+
+def registrar_duracion(etapa: str, segundos: float) -> None:
+    """Record a stage duration.
+
+    The duration goes to the ``itsmehi_stage_seconds`` histogram, to the recent
+    samples used for percentiles, and to the current request trace if any.
+    """
+    observar("stage_seconds", segundos, buckets=BUCKETS_SEGUNDOS, stage=etapa)
+    with _lock:
+        _muestras[etapa].append(segundos)
+    traza = _traza_actual.get()
+    if traza is not None:
+        traza["spans"].append((etapa, segundos * 1000))
+
+
+@contextmanager
+def medir_etapa(etapa: str):
+    """Time a pipeline stage (see registrar_duracion)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_duracion(etapa, time.perf_counter() - inicio)
+
+
+@contextmanager
+def nueva_traza(nombre: str = "pregunta"):
+    """Group the spans timed during one request into a trace."""
+    traza = {"nombre": nombre, "inicio": time.time(), "spans": []}
+    token = _traza_actual.set(traza)
+    inicio = time.perf_counter()
+    try:
+        yield traza
+    finally:
+        traza["total_ms"] = (time.perf_counter() - inicio) * 1000
+        try:
+            _traza_actual.reset(token)
+        except ValueError:
+            pass  # A streaming generator closed from another context
+        with _lock:
+            _trazas.append(traza)
+
+def traza_actual() -> Optional[dict]:
+    """Return the trace of the current request, if any."""
+    return _traza_actual.get()
+
+
+@contextmanager
+def continuar_traza(traza: Optional[dict]):
+    """Attach spans timed in another thread or event loop to an existing trace."""
+    token = _traza_actual.set(traza)
+    try:
+        yield traza
+    finally:
+        _traza_actual.reset(token)
+
+# === Reports ===
+def _formatear_etiquetas(etiquetas: tuple, extra: Optional[Tuple[str, str]] = None) -> str:
+    pares = list(etiquetas) + ([extra] if extra else [])
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{clave}="{valor}"' for clave, valor in pares) + "}"
+
+
+def exportar_prometheus() -> str:
+    """Render every metric in the Prometheus text exposition format."""
+    lineas: List[str] = []
+
+    with _lock:
+        contadores = dict(_contadores)
+        histogramas = {clave: dict(valor, conteos=list(valor["conteos"])) for clave, valor in _histogramas.items()}
+
+    for nombre in sorted({nombre for nombre, _ in contadores}):
+        lineas.append(f"# TYPE {PREFIJO}_{nombre} counter")
+        for (actual, etiquetas), valor in contadores.items():
+            if actual == nombre:
+                lineas.append(f"{PREFIJO}_{nombre}{_formatear_etiquetas(etiquetas)} {valor}")
+
+    for nombre in sorted({nombre for nombre, _ in histogramas}):
+        lineas.append(f"# TYPE {PREFIJO}_{nombre} histogram")
+        for (actual, etiquetas), histograma in histogramas.items():
+            if actual != nombre:
+                continue
+            for limite, conteo in zip(histograma["buckets"], histograma["conteos"]):
+                lineas.append(f"{PREFIJO}_{nombre}_bucket{_formatear_etiquetas(etiquetas, ('le', str(limite)))} {conteo}")
+            lineas.append(f"{PREFIJO}_{nombre}_bucket{_formatear_etiquetas(etiquetas, ('le', '+Inf'))} {histograma['n']}")
+            lineas.append(f"{PREFIJO}_{nombre}_sum{_formatear_etiquetas(etiquetas)} {histograma['suma']}")
+            lineas.append(f"{PREFIJO}_{nombre}_count{_formatear_etiquetas(etiquetas)} {histograma['n']}")
+
+    for nombre, funcion in sorted(_gauges.items()):
+        try:
+            valor = funcion()
+        except Exception:
+            continue
+        if nombre in _ayudas:
+            lineas.append(f"# HELP {PREFIJO}_{nombre} {_ayudas[nombre]}")
+        lineas.append(f"# TYPE {PREFIJO}_{nombre} gauge")
+        if isinstance(valor, dict):
+            for tipo, numero in valor.items():
+                lineas.append(f'{PREFIJO}_{nombre}{{tipo="{tipo}"}} {float(numero)}')
+        else:
+            lineas.append(f"{PREFIJO}_{nombre} {float(valor)}")
+
+    return "\n".join(lineas) + "\n"
+
+
+def resumen_etapas() -> Dict[str, dict]:
+    """Return count and p50/p95/p99 latency (ms) per stage from recent samples."""
+    with _lock:
+        muestras = {etapa: sorted(valores) for etapa, valores in _muestras.items() if valores}
+
+    def _p(valores: List[float], p: float) -> float:
+        return valores[min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))] * 1000
+
+    return {
+        etapa: {"n": len(valores), "p50_ms": _p(valores, 50), "p95_ms": _p(valores, 95), "p99_ms": _p(valores, 99)}
+        for etapa, valores in muestras.items()
+    }
+
+
+def valores_gauges() -> Dict[str, Union[float, Dict[str, float]]]:
+    """Evaluate every registered gauge (for the debug panel)."""
+    valores = {}
+    for nombre, funcion in _gauges.items():
+        try:
+            valores[nombre] = funcion()
+        except Exception as error:
+            valores[nombre] = f"⚡ {error}"
+    return valores
+
+
+def ultimas_trazas() -> List[dict]:
+    """Return the most recent request traces, newest first."""
+    with _lock:
+        return list(reversed(_trazas))
+
+# === HTTP endpoint ===
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        cuerpo = exportar_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args) -> None:
+        pass  # Keep scrapes out of the app logs
+
+
+def iniciar_servidor_metricas(puerto: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve ``/metrics`` in the Prometheus text format from a daemon thread."""
+    servidor = ThreadingHTTPServer((host, puerto), _ManejadorMetricas)
+    threading.Thread(target=servidor.serve_forever, name="servidor-metricas", daemon=True).start()
+    print(f"📈 Metrics available at http://{host}:{puerto}/metrics")
+    return servidor
@@ -0,0 +1,235 @@
+"""Text processing utilities for ItsMeHi.
+
+This module reads source documents (CVs, project write-ups, Markdown and PDF
+files) and splits them into token-bounded, overlapping chunks for embedding.
+At query time it packs retrieved passages into the generator's token budget.
+
+Functions:
+    leer_documentos(rutas): Stream (source, text) pairs from text, Markdown and PDF files.
+    dividir_frases(texto): Split a text into sentences and paragraphs.
+    dividir_en_chunks(texto, max_tokens, solapamiento, contar_tokens): Split text into overlapping chunks.
+    hash_contenido(texto): Stable content hash of a chunk.
+    son_casi_duplicados(texto_a, texto_b, umbral): Check whether two passages are near-duplicates.
+    empaquetar_contexto(pasajes, presupuesto_tokens, contar_tokens, puntuaciones): Pack whole passages into a token budget.
+"""
+
+# === Imports ===
+import re
+import hashlib
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# === Constants ===
+EXTENSIONES_TEXTO = {".txt", ".md", ".markdown"}
+EXTENSIONES_PDF = {".pdf"}
+PATRON_FRASES = re.compile(r"(?<=[.!?¡¿])\s+|\n\s*\n")
+PATRON_PALABRAS = re.compile(r"\w+")
+UMBRAL_CASI_DUPLICADO = 0.85
+
+# === Functions ===
+
+def _contar_palabras(texto: str) -> int:
+    return len(texto.split())
+
+
+def _expandir_rutas(rutas: Iterable[Path]) -> Iterator[Path]:
+    extensiones = EXTENSIONES_TEXTO | EXTENSIONES_PDF
+    for ruta in map(Path, rutas):
+        if ruta.is_dir():
+            yield from sorted(p for p in ruta.rglob("*") if p.suffix.lower() in extensiones)
+        elif ruta.suffix.lower() in extensiones:
+            yield ruta
+
+
+def _leer_pdf(ruta: Path) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        print(f"⚡ Skipping {ruta}: install 'pypdf' to read PDF files.")
+        return ""
+
+    lector = PdfReader(str(ruta))
+    return "\n\n".join(pagina.extract_text() or "" for pagina in lector.pages)
+
+
+def leer_documentos(rutas: Iterable[Path]) -> Iterator[Tuple[str, str]]:
+    """Stream documents one at a time from files or directories.
+
+    Args:
+        rutas (Iterable[Path]): Files or directories (searched recursively).
+
+    Yields:
+        Tuple[str, str]: (source path, full text) for each readable document.
+    """
+    for ruta in _expandir_rutas(rutas):
+        try:
+            if ruta.suffix.lower() in EXTENSIONES_PDF:
+                texto = _leer_pdf(ruta)
+            else:
+                texto = ruta.read_text(encoding="utf-8")
+        except Exception as error:
+            print(f"⚡ Error reading {ruta}: {error}")
+            continue
+
+        if texto.strip():
+            yield str(ruta), texto
+
+
+def dividir_frases(texto: str) -> List[str]:
+    """Split a text into sentences and paragraphs, dropping empty pieces.
+
+    Returns:
+        List[str]: Sentences with normalized whitespace.
+    """
+    return [" ".join(frase.split()) for frase in PATRON_FRASES.split(texto) if frase.strip()]
+
+
+def dividir_en_chunks(
+    texto: str,
+    max_tokens: int = 200,
+    solapamiento: int = 40,
+    contar_tokens: Callable[[str], int] = _contar_palabras,
+) -> List[str]:
+    """Split a text into overlapping chunks of at most ``max_tokens`` tokens.
+
+    Whole sentences are packed greedily so chunks do not end mid-sentence.
+    Each new chunk starts with the trailing sentences of the previous one, up
+    to ``solapamiento`` tokens. Sentences longer than the budget are cut into
+    word windows.
+
+    Args:
+        texto (str): Text to split.
+        max_tokens (int): Maximum tokens per chunk.
+        solapamiento (int): Tokens repeated between consecutive chunks.
+        contar_tokens (Callable[[str], int]): Token counter (defaults to words).
+
+    Returns:
+        List[str]: The chunks, in document order.
+    """
+    frases: List[Tuple[str, int]] = []
+    for frase in dividir_frases(texto):
+        tokens = contar_tokens(frase)
+        if tokens <= max_tokens:
+            frases.append((frase, tokens))
+            continue
+
+        palabras = frase.split()
+        paso = max(1, int(len(palabras) * max_tokens / tokens))
+        for inicio in range(0, len(palabras), paso):
+            trozo = " ".join(palabras[inicio:inicio + paso])
+            frases.append((trozo, contar_tokens(trozo)))
+
+    chunks: List[str] = []
+    actual: List[Tuple[str, int]] = []
+    tokens_actuales = 0
+
+    for frase, tokens in frases:
+        if actual and tokens_actuales + tokens > max_tokens:
+            chunks.append(" ".join(f for f, _ in actual))
+
+            # Carry the tail of the previous chunk as overlap
+            cola: List[Tuple[str, int]] = []
+            tokens_cola = 0
+            for previa in reversed(actual):
+                if tokens_cola + previa[1] > solapamiento or tokens_cola + previa[1] + tokens > max_tokens:
+                    break
+                cola.insert(0, previa)
+                tokens_cola += previa[1]
+            actual, tokens_actuales = cola, tokens_cola
+
+        actual.append((frase, tokens))
+        tokens_actuales += tokens
+
+    if actual:
+        chunks.append(" ".join(f for f, _ in actual))
+
+    return chunks
+
+
+def hash_contenido(texto: str) -> str:
+    """Return a stable SHA-256 hex digest of a chunk's normalized text."""
+    return hashlib.sha256(" ".join(texto.split()).encode("utf-8")).hexdigest()
+
+
+def _shingles(texto: str, n: int = 3) -> set:
+    palabras = PATRON_PALABRAS.findall(texto.lower())
+    if len(palabras) < n:
+        return {tuple(palabras)} if palabras else set()
+    return {tuple(palabras[i:i + n]) for i in range(len(palabras) - n + 1)}
+
+
+def son_casi_duplicados(texto_a: str, texto_b: str, umbral: float = UMBRAL_CASI_DUPLICADO) -> bool:
+    """Check whether two passages are near-duplicates.
+
+    Uses the Jaccard similarity of word 3-shingles, which tolerates small edits
+    such as punctuation, casing or a changed word.
+
+    Returns:
+        bool: True if the similarity is at least ``umbral``.
+    """
+    a, b = _shingles(texto_a), _shingles(texto_b)
+    if not a or not b:
+        return a == b
+    return len(a & b) / len(a | b) >= umbral
+
+
+def empaquetar_contexto(
+    pasajes: Sequence[str],
+    presupuesto_tokens: int,
+    contar_tokens: Callable[[str], int] = _contar_palabras,
+    puntuaciones: Optional[Sequence[float]] = None,
+    umbral_duplicado: float = UMBRAL_CASI_DUPLICADO,
+    fraccion_minima: float = 0.0,
+) -> List[str]:
+    """Pack whole retrieved passages into a token budget.
+
+    Passages are ordered by score (retrieval order if no scores are given),
+    those scoring below ``fraccion_minima`` of the best score are dropped so a
+    weak hit does not take budget just because it fits, duplicates and
+    near-duplicates are dropped, and passages are added whole
+    while they fit. A passage that does not fit is skipped so a shorter,
+    lower-ranked one can still use the remaining budget. If even the best
+    passage is too long, its leading sentences that fit are kept.
+
+    Args:
+        pasajes (Sequence[str]): Retrieved passages.
+        presupuesto_tokens (int): Maximum tokens for the joined context.
+        contar_tokens (Callable[[str], int]): Token counter (e.g. the generator's tokenizer).
+        puntuaciones (Sequence[float], optional): Retrieval score of each passage.
+        umbral_duplicado (float): Shingle Jaccard similarity above which passages are near-duplicates.
+        fraccion_minima (float): Minimum score relative to the best one (ignored without scores).
+
+    Returns:
+        List[str]: Selected passages, best first.
+    """
+    if puntuaciones is None:
+        orden = list(range(len(pasajes)))
+    else:
+        orden = sorted(range(len(pasajes)), key=lambda i: puntuaciones[i], reverse=True)
+        if orden and puntuaciones[orden[0]] > 0:
+            minima = fraccion_minima * puntuaciones[orden[0]]
+            orden = [i for i in orden if puntuaciones[i] >= minima]
+
+    seleccionados: List[str] = []
+    tokens_usados = 0
+
+    for indice in orden:
+        pasaje = " ".join(pasajes[indice].split())
+        if not pasaje or any(son_casi_duplicados(pasaje, previo, umbral_duplicado) for previo in seleccionados):
+            continue
+
+        tokens = contar_tokens(pasaje) + (1 if seleccionados else 0)  # Newline separator
+        if tokens_usados + tokens <= presupuesto_tokens:
+            seleccionados.append(pasaje)
+            tokens_usados += tokens
+        elif not seleccionados:
+            recorte = []
+            for frase in dividir_frases(pasaje):
+                if contar_tokens(" ".join(recorte + [frase])) > presupuesto_tokens:
+                    break
+                recorte.append(frase)
+            if recorte:
+                seleccionados.append(" ".join(recorte))
+                tokens_usados = contar_tokens(seleccionados[0])
+
+    return seleccionados
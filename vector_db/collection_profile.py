@@ -0,0 +1,227 @@
+"""
+collection_profile.py
+
+Tunable profiles for the ItsMeHi Qdrant collection.
+
+A profile fixes how vectors are stored and searched, trading recall for
+latency and memory:
+    "precision"   -> float32 vectors in RAM, no quantization, wide HNSW search (default)
+    "equilibrado" -> int8 scalar quantization in RAM, rescored with the original vectors
+    "memoria"     -> int8 quantization in RAM, original vectors on disk, denser rescoring
+
+The profile is selected with ``QDRANT_PROFILE``; individual fields can be
+overridden with ``QDRANT_HNSW_M``, ``QDRANT_HNSW_EF_CONSTRUCT``,
+``QDRANT_HNSW_EF``, ``QDRANT_QUANTIZATION`` ("int8" or "none"),
+``QDRANT_ON_DISK``, ``QDRANT_RESCORE`` and ``QDRANT_OVERSAMPLING``.
+
+Run as a script to apply a profile to an existing collection:
+    python vector_db/collection_profile.py --perfil equilibrado
+    python vector_db/collection_profile.py --mostrar
+"""
+
+# === Imports ===
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import os
+import argparse
+from typing import Optional
+from dotenv import load_dotenv
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    Disabled,
+    Distance,
+    HnswConfigDiff,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+    VectorParamsDiff,
+)
+
+# === Load environment variables ===
+load_dotenv()
+
+# === Constants ===
+NOMBRE_COLECCION = "itsmehi_collection"
+PERFIL_POR_DEFECTO = os.getenv("QDRANT_PROFILE", "precision").lower()
+
+PERFILES = {
+    "precision": {
+        "hnsw_m": 16,
+        "hnsw_ef_construct": 100,
+        "hnsw_ef": 128,
+        "cuantizacion": "none",
+        "en_disco": False,
+        "reevaluar": False,
+        "sobremuestreo": 1.0,
+    },
+    "equilibrado": {
+        "hnsw_m": 16,
+        "hnsw_ef_construct": 128,
+        "hnsw_ef": 64,
+        "cuantizacion": "int8",
+        "en_disco": False,
+        "reevaluar": True,
+        "sobremuestreo": 2.0,
+    },
+    "memoria": {
+        "hnsw_m": 8,
+        "hnsw_ef_construct": 64,
+        "hnsw_ef": 32,
+        "cuantizacion": "int8",
+        "en_disco": True,
+        "reevaluar": True,
+        "sobremuestreo": 3.0,
+    },
+}
+
+# Environment overrides: variable -> (profile field, parser)
+_SOBRESCRITURAS = {
+    "QDRANT_HNSW_M": ("hnsw_m", int),
+    "QDRANT_HNSW_EF_CONSTRUCT": ("hnsw_ef_construct", int),
+    "QDRANT_HNSW_EF": ("hnsw_ef", int),
+    "QDRANT_QUANTIZATION": ("cuantizacion", str.lower),
+    "QDRANT_ON_DISK": ("en_disco", lambda valor: valor == "1"),
+    "QDRANT_RESCORE": ("reevaluar", lambda valor: valor == "1"),
+    "QDRANT_OVERSAMPLING": ("sobremuestreo", float),
+}
+
+# === Profiles ===
+def obtener_perfil(nombre: Optional[str] = None) -> dict:
+    """
+    Return a collection profile with environment overrides applied.
+
+    Args:
+        nombre (str, optional): Profile name. Defaults to QDRANT_PROFILE.
+
+    Returns:
+        dict: Profile fields plus its ``nombre``.
+
+    Raises:
+        ValueError: If the profile or the quantization type is unknown.
+    """
+    nombre = (nombre or PERFIL_POR_DEFECTO).lower()
+    if nombre not in PERFILES:
+        raise ValueError(f"⚠️ Unknown Qdrant profile: {nombre} (expected one of {', '.join(PERFILES)})")
+
+    perfil = dict(PERFILES[nombre], nombre=nombre)
+    for variable, (campo, convertir) in _SOBRESCRITURAS.items():
+        valor = os.getenv(variable)
+        if valor:
+            perfil[campo] = convertir(valor)
+
+    if perfil["cuantizacion"] not in ("int8", "none"):
+        raise ValueError(f"⚠️ Unknown quantization type: {perfil['cuantizacion']}")
+    return perfil
+
+
+def _cuantizacion(perfil: dict) -> Optional[ScalarQuantization]:
+    if perfil["cuantizacion"] != "int8":
+        return None
+    # Quantized vectors always stay in RAM; only the originals (used to rescore) may live on disk
+    return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True))
+
+
+def parametros_busqueda(perfil: Optional[dict] = None) -> SearchParams:
+    """
+    Build search-time parameters for a profile.
+
+    Args:
+        perfil (dict, optional): Collection profile. Defaults to the configured one.
+
+    Returns:
+        SearchParams: ``hnsw_ef`` plus quantization rescoring settings.
+    """
+    perfil = perfil or obtener_perfil()
+    cuantizacion = None
+    if perfil["cuantizacion"] != "none":
+        cuantizacion = QuantizationSearchParams(
+            rescore=perfil["reevaluar"],
+            oversampling=perfil["sobremuestreo"] if perfil["reevaluar"] else None,
+        )
+    return SearchParams(hnsw_ef=perfil["hnsw_ef"], quantization=cuantizacion)
+
+
+def crear_coleccion(
+    cliente: QdrantClient,
+    nombre: str = NOMBRE_COLECCION,
+    dimension: int = 384,
+    perfil: Optional[dict] = None,
+) -> None:
+    """
+    Create the collection with the storage and index settings of a profile.
+
+    Args:
+        cliente (QdrantClient): Connected Qdrant client.
+        nombre (str): Collection name.
+        dimension (int): Vector size.
+        perfil (dict, optional): Collection profile. Defaults to the configured one.
+    """
+    perfil = perfil or obtener_perfil()
+    cliente.create_collection(
+        collection_name=nombre,
+        vectors_config=VectorParams(size=dimension, distance=Distance.COSINE, on_disk=perfil["en_disco"]),
+        hnsw_config=HnswConfigDiff(m=perfil["hnsw_m"], ef_construct=perfil["hnsw_ef_construct"]),
+        quantization_config=_cuantizacion(perfil),
+    )
+
+
+def aplicar_perfil(cliente: QdrantClient, nombre: str = NOMBRE_COLECCION, perfil: Optional[dict] = None) -> None:
+    """
+    Apply a profile to an existing collection in place.
+
+    Qdrant rebuilds the HNSW graph and quantized vectors in the background, so
+    searches keep working while the new settings are optimized in.
+
+    Args:
+        cliente (QdrantClient): Connected Qdrant client.
+        nombre (str): Collection name.
+        perfil (dict, optional): Collection profile. Defaults to the configured one.
+    """
+    perfil = perfil or obtener_perfil()
+    cliente.update_collection(
+        collection_name=nombre,
+        vectors_config={"": VectorParamsDiff(on_disk=perfil["en_disco"])},
+        hnsw_config=HnswConfigDiff(m=perfil["hnsw_m"], ef_construct=perfil["hnsw_ef_construct"]),
+        quantization_config=_cuantizacion(perfil) or Disabled.DISABLED,
+    )
+
+
+def describir_coleccion(cliente: QdrantClient, nombre: str = NOMBRE_COLECCION) -> dict:
+    """Return the stored index and quantization settings of a collection."""
+    info = cliente.get_collection(nombre)
+    vectores = info.config.params.vectors
+    return {
+        "puntos": info.points_count,
+        "estado": str(info.status),
+        "hnsw": info.config.hnsw_config.model_dump(exclude_none=True),
+        "cuantizacion": info.config.quantization_config.model_dump(exclude_none=True) if info.config.quantization_config else None,
+        "en_disco": getattr(vectores, "on_disk", None),
+    }
+
+# === Main ===
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Apply a storage/index profile to the ItsMeHi Qdrant collection.")
+    parser.add_argument("--perfil", choices=list(PERFILES), default=PERFIL_POR_DEFECTO)
+    parser.add_argument("--coleccion", default=NOMBRE_COLECCION)
+    parser.add_argument("--mostrar", action="store_true", help="Only print the current collection settings.")
+    args = parser.parse_args()
+
+    cliente_qdrant = QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"))
+
+    print(f"📋 Current settings of '{args.coleccion}': {describir_coleccion(cliente_qdrant, args.coleccion)}")
+    if args.mostrar:
+        return
+
+    perfil = obtener_perfil(args.perfil)
+    aplicar_perfil(cliente_qdrant, args.coleccion, perfil)
+    print(f"✅ Profile '{perfil['nombre']}' applied: {describir_coleccion(cliente_qdrant, args.coleccion)}")
+    print(f"ℹ️ Set QDRANT_PROFILE={perfil['nombre']} so searches use hnsw_ef={perfil['hnsw_ef']} and matching rescoring.")
+
+
+if __name__ == "__main__":
+    main()
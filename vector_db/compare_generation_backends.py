@@ -0,0 +1,163 @@
+"""
+compare_generation_backends.py
+
+Parity and performance check of the flan-t5 inference backends
+(PyTorch, ONNX Runtime and ONNX Runtime int8).
+
+Each backend runs in its own process so peak RSS is measured in isolation.
+Outputs are compared against the PyTorch reference and a latency/RSS table
+is printed (and optionally written as JSON) to choose the backend per deployment.
+
+Usage:
+    python vector_db/compare_generation_backends.py --backends pytorch onnx onnx-int8 --salida resultados.json
+"""
+
+# === Imports ===
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import os
+import json
+import time
+import queue
+import argparse
+import difflib
+import resource
+import statistics
+import multiprocessing as mp
+
+# === Constants ===
+TIMEOUT_BACKEND = float(os.getenv("BACKEND_COMPARE_TIMEOUT", "1800"))  # Seconds per backend (load + runs)
+INTERVALO_ESPERA = 5.0  # Seconds between liveness checks of the worker process
+
+# === Sample prompts ===
+CONTEXTO = (
+    "Soy analista de datos especializado en procesamiento de lenguaje natural.\n"
+    "Tengo experiencia creando pipelines ETL y dashboards en Power BI."
+)
+PROMPTS = [
+    f"Usa el siguiente contexto para responder con claridad y precisión.\n\nContexto:\n{CONTEXTO}\n\nPregunta: ¿Qué experiencia tienes?\nRespuesta:",
+    f"Usa el siguiente contexto para responder con claridad y precisión.\n\nContexto:\n{CONTEXTO}\n\nPregunta: ¿Trabajas con Power BI?\nRespuesta:",
+    f"Use the following context to answer clearly and helpfully.\n\nContext:\n{CONTEXTO}\n\nQuestion: What is your specialization?\nAnswer:",
+    f"Use the following context to answer clearly and helpfully.\n\nContext:\n{CONTEXTO}\n\nQuestion: Have you built ETL pipelines?\nAnswer:",
+]
+
+# === Worker ===
+def _medir_backend(backend: str, repeticiones: int, max_tokens: int, cola: mp.Queue) -> None:
+    """Load one backend, generate every prompt and report outputs, latencies and peak RSS (or the error)."""
+    try:
+        os.environ["GENERATION_BACKEND"] = backend
+        from vector_db.generate_response_hf import cargar_modelo
+
+        inicio = time.perf_counter()
+        generador = cargar_modelo(backend)
+        segundos_carga = time.perf_counter() - inicio
+
+        # Warm-up run so one-off initialization is not counted as latency
+        generador(PROMPTS[0], max_new_tokens=8, do_sample=False)
+
+        salidas, latencias = [], []
+        for _ in range(repeticiones):
+            salidas = []
+            for prompt in PROMPTS:
+                inicio = time.perf_counter()
+                texto = generador(prompt, max_new_tokens=max_tokens, do_sample=False)[0]["generated_text"]
+                latencias.append(time.perf_counter() - inicio)
+                salidas.append(texto)
+
+        cola.put({
+            "backend": backend,
+            "segundos_carga": segundos_carga,
+            "latencia_media_ms": statistics.mean(latencias) * 1000,
+            "latencia_p95_ms": sorted(latencias)[int(0.95 * (len(latencias) - 1))] * 1000,
+            "rss_pico_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "salidas": salidas,
+        })
+    except BaseException as error:
+        cola.put({"backend": backend, "error": f"{type(error).__name__}: {error}"})
+
+
+def medir_backend(backend: str, repeticiones: int, max_tokens: int, timeout: float = TIMEOUT_BACKEND) -> dict:
+    """
+    Run the measurement of one backend in a fresh process.
+
+    Returns the worker's record, or an error record if the worker dies without
+    reporting (e.g. killed for running out of memory) or exceeds ``timeout``.
+    """
+    contexto = mp.get_context("spawn")
+    cola = contexto.Queue()
+    proceso = contexto.Process(target=_medir_backend, args=(backend, repeticiones, max_tokens, cola))
+    proceso.start()
+    limite = time.monotonic() + timeout
+
+    try:
+        while True:
+            try:
+                return cola.get(timeout=max(0.0, min(INTERVALO_ESPERA, limite - time.monotonic())))
+            except queue.Empty:
+                pass
+
+            if not proceso.is_alive():
+                try:
+                    return cola.get(timeout=1.0)  # Reported just before exiting
+                except queue.Empty:
+                    return {"backend": backend, "error": f"worker exited with code {proceso.exitcode} without a result"}
+            if time.monotonic() >= limite:
+                return {"backend": backend, "error": f"no result within {timeout:.0f}s"}
+    finally:
+        proceso.join(timeout=INTERVALO_ESPERA)
+        if proceso.is_alive():
+            proceso.terminate()
+            proceso.join()
+
+# === Parity ===
+def comparar_salidas(referencia: list, candidatas: list) -> dict:
+    """Compare generated texts against the reference outputs."""
+    exactas = sum(r.strip() == c.strip() for r, c in zip(referencia, candidatas))
+    similitudes = [difflib.SequenceMatcher(None, r, c).ratio() for r, c in zip(referencia, candidatas)]
+    return {
+        "coincidencias_exactas": f"{exactas}/{len(referencia)}",
+        "similitud_media": statistics.mean(similitudes) if similitudes else 0.0,
+    }
+
+# === Main ===
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare flan-t5 inference backends.")
+    parser.add_argument("--backends", nargs="+", default=["pytorch", "onnx", "onnx-int8"])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--salida", type=Path, help="Optional JSON file for the results.")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT_BACKEND, help="Seconds allowed per backend.")
+    args = parser.parse_args()
+
+    backends = list(dict.fromkeys(["pytorch", *args.backends]))  # PyTorch is always the reference
+    resultados = [medir_backend(backend, args.repeticiones, args.max_tokens, args.timeout) for backend in backends]
+    referencia = resultados[0].get("salidas")
+
+    print(f"{'Backend':<10} {'Carga (s)':>10} {'Media (ms)':>11} {'p95 (ms)':>10} {'RSS (MB)':>9}  Paridad")
+    for resultado in resultados:
+        if "error" in resultado:
+            print(f"{resultado['backend']:<10} ❌ failed: {resultado['error']}")
+            continue
+        if referencia is not None:
+            resultado["paridad"] = comparar_salidas(referencia, resultado["salidas"])
+            paridad = (
+                f"{resultado['paridad']['coincidencias_exactas']} exact, "
+                f"{resultado['paridad']['similitud_media']:.2f} similarity"
+            )
+        else:
+            paridad = "⚠️ no PyTorch reference"
+        print(
+            f"{resultado['backend']:<10} {resultado['segundos_carga']:>10.2f} "
+            f"{resultado['latencia_media_ms']:>11.1f} {resultado['latencia_p95_ms']:>10.1f} "
+            f"{resultado['rss_pico_mb']:>9.0f}  {paridad}"
+        )
+
+    if args.salida:
+        args.salida.write_text(json.dumps(resultados, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"✅ Results saved to {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
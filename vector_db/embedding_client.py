@@ -1,10 +1,22 @@
 # vector_db/embedding_client.py
 
 import os
-from typing import List
+import json
+import atexit
+import asyncio
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import numpy as np
 from dotenv import load_dotenv
 from huggingface_hub import InferenceClient
 import streamlit as st
+from utils.deadline import Plazo
+from utils.metrics import incrementar, medir_etapa, registrar_gauge
 
 # === Load environment variables ===
 load_dotenv()
@@ -13,38 +25,489 @@ load_dotenv()
 token_api = os.getenv("HF_API_TOKEN")
 modelo_embeddings = os.getenv("HF_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 
+# Backend used to compute embeddings:
+#   "local" -> in-process SentenceTransformer on CPU (PyTorch)
+#   "onnx"  -> in-process SentenceTransformer served with ONNX Runtime
+#   "api"   -> remote Hugging Face Inference API
+backend_embeddings = os.getenv("EMBEDDING_BACKEND", "local").lower()
+tamano_lote_embeddings = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+DIMENSION_EMBEDDING = 384
+
+# Two-tier embedding cache: in-memory LRU in front of a memory-mapped disk store
+cache_embeddings_activa = os.getenv("EMBEDDING_CACHE_ENABLED", "1") == "1"
+tamano_cache_memoria = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+ruta_cache_disco = Path(os.getenv("EMBEDDING_CACHE_DIR", "data/cache/embeddings"))
+max_mb_cache_disco = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "64"))
+INTERVALO_COMPACTACION_INDICE = 60.0  # Seconds between full rewrites of the disk cache index
+MAX_LINEAS_REGISTRO_INDICE = 1024  # Appended index entries before forcing a rewrite
+
+# === Embedding cache ===
+def normalizar_texto(texto: str) -> str:
+    """
+    Normalize a question so trivially different spellings share a cache key.
+
+    Applies Unicode NFC, lowercasing, whitespace collapsing and strips
+    surrounding punctuation such as "¿" and "?".
+
+    Args:
+        texto (str): Raw text.
+
+    Returns:
+        str: Normalized text.
+    """
+    texto = unicodedata.normalize("NFC", texto).lower()
+    texto = " ".join(texto.split())
+    return texto.strip("¿?¡!.,;: ")
+
+
+def clave_cache(texto: str, modelo: str = modelo_embeddings) -> str:
+    """Build the cache key for a text as a hash of model name plus normalized text."""
+    return hashlib.sha1(f"{modelo}\x00{normalizar_texto(texto)}".encode("utf-8")).hexdigest()
+
+
+class CacheMemoriaLRU:
+    """Bounded, thread-safe in-memory LRU of float32 vectors."""
+
+    def __init__(self, max_entradas: int):
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entradas.get(clave)
+            if vector is not None:
+                self._entradas.move_to_end(clave)
+            return vector
+
+    def guardar(self, clave: str, vector: np.ndarray) -> None:
+        if self.max_entradas <= 0:
+            return
+        with self._lock:
+            self._entradas[clave] = vector
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+
+class CacheDiscoEmbeddings:
+    """
+    Persistent embedding store that survives Streamlit restarts.
+
+    Vectors live in a fixed-size float32 memory-mapped file (one row per slot)
+    and a small JSON index maps cache keys to slots in LRU order. The number of
+    slots is derived from the size budget, so when the file is full the least
+    recently used slot is overwritten.
+
+    New entries are appended to a log (one ``[key, slot]`` line per vector,
+    written after the vector is flushed) and replayed on open. The full index
+    is rewritten atomically only every INTERVALO_COMPACTACION_INDICE seconds,
+    after MAX_LINEAS_REGISTRO_INDICE log lines, and at interpreter exit.
+    """
+
+    def __init__(self, directorio: Path, dimension: int, max_mb: float):
+        self.directorio = Path(directorio)
+        self.dimension = dimension
+        self.capacidad = max(1, int(max_mb * 1024 * 1024) // (dimension * 4))
+        self._ruta_vectores = self.directorio / "vectores.f32"
+        self._ruta_indice = self.directorio / "indice.json"
+        self._ruta_registro = self.directorio / "indice.log"
+        self._lock = threading.Lock()
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._libres: List[int] = []
+        self._lineas_registro = 0
+        self._ultima_compactacion = time.monotonic()
+        self._abrir()
+        atexit.register(self.cerrar)
+
+    def _abrir(self) -> None:
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        indice = {}
+        if self._ruta_indice.exists() and self._ruta_vectores.exists():
+            try:
+                indice = json.loads(self._ruta_indice.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                indice = {}
+
+        compatible = (
+            indice.get("dimension") == self.dimension
+            and indice.get("capacidad") == self.capacidad
+        )
+        modo = "r+" if compatible else "w+"
+        self._vectores = np.memmap(
+            self._ruta_vectores, dtype=np.float32, mode=modo, shape=(self.capacidad, self.dimension)
+        )
+
+        if compatible:
+            self._slots = OrderedDict((clave, int(slot)) for clave, slot in indice.get("entradas", []))
+            self._reproducir_registro()
+        ocupados = set(self._slots.values())
+        self._libres = [slot for slot in range(self.capacidad - 1, -1, -1) if slot not in ocupados]
+        if not compatible or self._ruta_registro.exists():
+            # Record dimension and capacity before any log entry, or fold the replayed log
+            # (and any torn last line) into the index so new lines never follow a partial one
+            self._guardar_indice()
+
+    def _reproducir_registro(self) -> None:
+        """Apply the entries appended since the last index rewrite (a torn last line is ignored)."""
+        if not self._ruta_registro.exists():
+            return
+        propietarios = {slot: clave for clave, slot in self._slots.items()}
+        with self._ruta_registro.open(encoding="utf-8") as registro:
+            for linea in registro:
+                try:
+                    clave, slot = json.loads(linea)
+                except ValueError:
+                    break
+                if not 0 <= slot < self.capacidad:
+                    continue
+                anterior = propietarios.get(slot)
+                if anterior is not None and anterior != clave:
+                    self._slots.pop(anterior, None)
+                self._slots[clave] = slot
+                self._slots.move_to_end(clave)
+                propietarios[slot] = clave
+
+    def _registrar(self, nuevas: List[tuple]) -> None:
+        with self._ruta_registro.open("a", encoding="utf-8") as registro:
+            registro.writelines(json.dumps([clave, slot]) + "\n" for clave, slot in nuevas)
+        self._lineas_registro += len(nuevas)
+
+        if (
+            self._lineas_registro >= MAX_LINEAS_REGISTRO_INDICE
+            or time.monotonic() - self._ultima_compactacion >= INTERVALO_COMPACTACION_INDICE
+        ):
+            self._guardar_indice()
+
+    def _guardar_indice(self) -> None:
+        """Rewrite the full index atomically and drop the log it now contains."""
+        indice = {
+            "dimension": self.dimension,
+            "capacidad": self.capacidad,
+            "entradas": list(self._slots.items()),
+        }
+        temporal = self._ruta_indice.with_suffix(".tmp")
+        temporal.write_text(json.dumps(indice), encoding="utf-8")
+        os.replace(temporal, self._ruta_indice)
+        self._ruta_registro.unlink(missing_ok=True)
+        self._lineas_registro = 0
+        self._ultima_compactacion = time.monotonic()
+
+    def cerrar(self) -> None:
+        """Persist the LRU order and compact the log (called at interpreter exit)."""
+        with self._lock:
+            try:
+                self._guardar_indice()
+            except OSError as error:
+                print(f"⚡ Error saving embedding cache index: {error}")
+
+    def obtener(self, clave: str) -> Optional[np.ndarray]:
+        with self._lock:
+            slot = self._slots.get(clave)
+            if slot is None:
+                return None
+            self._slots.move_to_end(clave)
+            return np.array(self._vectores[slot], dtype=np.float32)
+
+    def guardar_lote(self, entradas: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            nuevas = []
+            for clave, vector in entradas.items():
+                if len(vector) != self.dimension:
+                    continue
+                slot = self._slots.get(clave)
+                if slot is None:
+                    if self._libres:
+                        slot = self._libres.pop()
+                    else:
+                        _, slot = self._slots.popitem(last=False)
+                self._vectores[slot] = vector
+                self._slots[clave] = slot
+                self._slots.move_to_end(clave)
+                nuevas.append((clave, slot))
+            if nuevas:
+                self._vectores.flush()  # Vectors reach disk before the log points at them
+                self._registrar(nuevas)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+
+_estadisticas_cache = {
+    "hits_memoria": 0,
+    "hits_disco": 0,
+    "misses": 0,
+    "segundos_calculo": 0.0,
+}
+_lock_estadisticas = threading.Lock()
+_cache_memoria = CacheMemoriaLRU(tamano_cache_memoria)
+
+
+@st.cache_resource(show_spinner=False)
+def get_cache_disco() -> Optional[CacheDiscoEmbeddings]:
+    try:
+        return CacheDiscoEmbeddings(ruta_cache_disco, DIMENSION_EMBEDDING, max_mb_cache_disco)
+    except Exception as error:
+        print(f"⚡ Disk embedding cache disabled: {error}")
+        return None
+
+
+def estadisticas_cache_embeddings() -> dict:
+    """
+    Return hit/miss counters of the embedding cache.
+
+    Returns:
+        dict: Hits per tier, misses, hit rate, mean miss latency and the
+        estimated seconds saved by serving hits from the cache.
+    """
+    with _lock_estadisticas:
+        datos = dict(_estadisticas_cache)
+
+    hits = datos["hits_memoria"] + datos["hits_disco"]
+    total = hits + datos["misses"]
+    media_miss = datos["segundos_calculo"] / datos["misses"] if datos["misses"] else 0.0
+    disco = get_cache_disco() if cache_embeddings_activa else None
+
+    datos.update({
+        "tasa_aciertos": hits / total if total else 0.0,
+        "segundos_por_miss": media_miss,
+        "segundos_ahorrados": hits * media_miss,
+        "entradas_memoria": len(_cache_memoria),
+        "entradas_disco": len(disco) if disco else 0,
+    })
+    return datos
+
+
+registrar_gauge(
+    "embedding_cache",
+    lambda: {clave: valor for clave, valor in estadisticas_cache_embeddings().items()
+             if clave in ("tasa_aciertos", "entradas_memoria", "entradas_disco")},
+    "Embedding cache hit rate and entries per tier.",
+)
+
 # === Cached Hugging Face client ===
 @st.cache_resource(show_spinner="🔗 Connecting to Hugging Face embedding model...")
 def get_cliente_inferencia() -> InferenceClient:
     return InferenceClient(token=token_api)
 
-# === Embedding function ===
-def embed_texto(texto: str) -> List[float]:
+# === Cached local model ===
+@st.cache_resource(show_spinner="🔄 Loading local embedding model (all-MiniLM-L6-v2)...")
+def get_modelo_local(backend: str = "torch"):
     """
-    Generate an embedding vector for a given input text using Hugging Face Inference API.
+    Load the SentenceTransformer model once per process and keep it warm.
 
     Args:
-        texto (str): The text to embed.
+        backend (str): SentenceTransformer backend, "torch" or "onnx".
 
     Returns:
-        List[float]: The embedding vector as a list of floats, or an empty list on failure.
+        SentenceTransformer: The loaded embedding model on CPU.
     """
-    if not texto:
-        return []
+    from sentence_transformers import SentenceTransformer
 
-    cliente = get_cliente_inferencia()
+    if backend == "onnx":
+        return SentenceTransformer(modelo_embeddings, device="cpu", backend="onnx")
+    return SentenceTransformer(modelo_embeddings, device="cpu")
 
-    try:
+# === Backends ===
+# Local backends run a short CPU pass and ignore the timeout; the API backend applies it per request
+def _embed_local(textos: List[str], backend: str = "torch", timeout: Optional[float] = None) -> List[List[float]]:
+    modelo = get_modelo_local(backend)
+    vectores = modelo.encode(
+        textos,
+        batch_size=tamano_lote_embeddings,
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    )
+    return vectores.astype("float32").tolist()
+
+
+def _embed_onnx(textos: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+    return _embed_local(textos, backend="onnx")
+
+
+def _embed_api(textos: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+    cliente = get_cliente_inferencia() if timeout is None else InferenceClient(token=token_api, timeout=timeout)
+    vectores = []
+
+    for texto in textos:
         embedding = cliente.feature_extraction(text=texto, model=modelo_embeddings)
 
         if hasattr(embedding, "tolist"):
             embedding = embedding.tolist()
 
-        if not embedding or not isinstance(embedding, list):
-            raise ValueError("⚠️ Invalid or empty embedding.")
+        vectores.append(embedding)
 
-        return embedding
+    return vectores
+
+
+BACKENDS_EMBEDDING: Dict[str, Callable[..., List[List[float]]]] = {
+    "local": _embed_local,
+    "onnx": _embed_onnx,
+    "api": _embed_api,
+}
+
+# === Embedding functions ===
+def embed_textos(textos: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+    """
+    Generate embedding vectors for a batch of texts with the configured backend.
+
+    Query-time and ingestion-time embedding both go through this function,
+    so they share the same model and the same output space.
+
+    Args:
+        textos (List[str]): The texts to embed.
+        timeout (float, optional): Seconds allowed for the remote API call.
+
+    Returns:
+        List[List[float]]: One 384-dim vector per input text, in the same order.
+
+    Raises:
+        ValueError: If the backend is unknown or returns malformed vectors.
+    """
+    if not textos:
+        return []
+
+    if backend_embeddings not in BACKENDS_EMBEDDING:
+        raise ValueError(f"⚠️ Unknown embedding backend: {backend_embeddings}")
+
+    with medir_etapa("embedding"):
+        if not cache_embeddings_activa:
+            return _calcular_embeddings(list(textos), timeout)
+        return _embed_con_cache(textos, timeout)
+
+
+def _embed_con_cache(textos: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+
+    claves = [clave_cache(texto) for texto in textos]
+    resultado: Dict[str, np.ndarray] = {}
+    disco = get_cache_disco()
+    hits_memoria = hits_disco = 0
+
+    for clave in claves:
+        if clave in resultado:
+            continue
+        vector = _cache_memoria.obtener(clave)
+        if vector is not None:
+            hits_memoria += 1
+        elif disco is not None:
+            vector = disco.obtener(clave)
+            if vector is not None:
+                hits_disco += 1
+                _cache_memoria.guardar(clave, vector)
+        if vector is not None:
+            resultado[clave] = vector
+
+    pendientes = {}
+    for clave, texto in zip(claves, textos):
+        if clave not in resultado and clave not in pendientes:
+            pendientes[clave] = texto
+
+    segundos = 0.0
+    if pendientes:
+        inicio = time.perf_counter()
+        calculados = _calcular_embeddings(list(pendientes.values()), timeout)
+        segundos = time.perf_counter() - inicio
+
+        nuevos = {
+            clave: np.asarray(vector, dtype=np.float32)
+            for clave, vector in zip(pendientes, calculados)
+        }
+        for clave, vector in nuevos.items():
+            _cache_memoria.guardar(clave, vector)
+        if disco is not None:
+            try:
+                disco.guardar_lote(nuevos)
+            except Exception as error:
+                print(f"⚡ Error writing embedding cache: {error}")
+        resultado.update(nuevos)
+
+    with _lock_estadisticas:
+        _estadisticas_cache["hits_memoria"] += hits_memoria
+        _estadisticas_cache["hits_disco"] += hits_disco
+        _estadisticas_cache["misses"] += len(pendientes)
+        _estadisticas_cache["segundos_calculo"] += segundos
+
+    incrementar("embedding_cache_total", hits_memoria, resultado="hit_memoria")
+    incrementar("embedding_cache_total", hits_disco, resultado="hit_disco")
+    incrementar("embedding_cache_total", len(pendientes), resultado="miss")
+
+    return [resultado[clave].tolist() for clave in claves]
+
+
+def buscar_embedding_en_cache(texto: str) -> Optional[List[float]]:
+    """
+    Return the cached embedding of a text without calling the model.
+
+    Args:
+        texto (str): The text to look up.
+
+    Returns:
+        List[float]: The cached vector, or None if it is not in the memory or disk cache.
+    """
+    if not texto or not cache_embeddings_activa:
+        return None
+
+    clave = clave_cache(texto)
+    vector = _cache_memoria.obtener(clave)
+    if vector is None:
+        disco = get_cache_disco()
+        vector = disco.obtener(clave) if disco is not None else None
+    return vector.tolist() if vector is not None else None
+
+
+def _calcular_embeddings(textos: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+    with medir_etapa("embedding_modelo"):
+        vectores = BACKENDS_EMBEDDING[backend_embeddings](textos, timeout=timeout)
+    incrementar("embedding_texts_total", len(textos), backend=backend_embeddings)
+
+    if len(vectores) != len(textos) or any(not isinstance(v, list) or not v for v in vectores):
+        raise ValueError("⚠️ Invalid or empty embedding.")
+
+    return vectores
+
+
+def embed_texto(texto: str, plazo: Optional[Plazo] = None) -> Optional[List[float]]:
+    """
+    Generate an embedding vector for a given input text.
+
+    Args:
+        texto (str): The text to embed.
+        plazo (Plazo, optional): Deadline for the embedding; nothing is computed once it has passed.
+
+    Returns:
+        Optional[List[float]]: The embedding vector as a list of floats, or None for
+        empty input, on failure or on timeout.
+    """
+    if not texto:
+        return None
+
+    if plazo is not None and plazo.agotado():
+        incrementar("deadline_exceeded_total", stage="embedding")
+        return buscar_embedding_en_cache(texto)
+
+    try:
+        return embed_textos([texto], timeout=plazo.restante() if plazo is not None else None)[0]
 
     except Exception as error:
         print(f"⚡ Error generating embedding: {error}")
         return None
+
+
+async def embed_texto_async(texto: str, plazo: Optional[Plazo] = None) -> Optional[List[float]]:
+    """
+    Non-blocking variant of embed_texto for the async pipeline.
+
+    The embedding runs in the default thread pool so the event loop stays free;
+    the caller's context is copied so its timing spans join the request trace.
+
+    Args:
+        texto (str): The text to embed.
+        plazo (Plazo, optional): Deadline for the embedding.
+
+    Returns:
+        Optional[List[float]]: The embedding vector, or None for empty input, on failure or on timeout.
+    """
+    return await asyncio.to_thread(embed_texto, texto, plazo)
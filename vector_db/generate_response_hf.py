@@ -2,32 +2,484 @@
 generate_response_hf.py (versión local)
 
 Loads a local Hugging Face model and generates responses to user prompts.
+Concurrent requests from different Streamlit sessions, streamed or not, are
+grouped by a micro-batching scheduler and decoded together in a single
+``generate`` call; streamed requests get their own rows' tokens as they are
+decoded.
+
+The inference backend is selected with ``GENERATION_BACKEND``:
+    "pytorch"   -> full-precision PyTorch model (default)
+    "onnx"      -> model exported once to ONNX and served with ONNX Runtime
+    "onnx-int8" -> same export with dynamic int8 quantization
+
+Every entry point accepts an optional ``Plazo`` (request deadline): decoding
+stops through a stopping criterion when it passes, and prompts whose deadline
+expired while queued are dropped without running.
 """
 
 # === Imports ===
+import os
+import time
+import queue
+import shutil
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence
 import streamlit as st
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
+from transformers import (
+    AutoTokenizer,
+    AutoModelForSeq2SeqLM,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TextIteratorStreamer,
+    pipeline,
+)
+from transformers.generation.streamers import BaseStreamer
+from utils.deadline import Plazo
+from utils.metrics import incrementar, medir_etapa, observar, registrar_duracion, registrar_gauge
+
+# === Constants ===
+RUTA_MODELO = os.getenv("GENERATION_MODEL_PATH", "models/flan-t5-base")
+RUTA_MODELO_ONNX = os.getenv("GENERATION_ONNX_DIR", "models/flan-t5-base-onnx")
+BACKEND_GENERACION = os.getenv("GENERATION_BACKEND", "pytorch").lower()
+BACKENDS_GENERACION = ("pytorch", "onnx", "onnx-int8")
+LOTES_ACTIVOS = os.getenv("GENERATION_BATCHING", "1") == "1"
+MAX_LOTE_GENERACION = int(os.getenv("GENERATION_MAX_BATCH_SIZE", "8"))
+MAX_ESPERA_LOTE_MS = float(os.getenv("GENERATION_MAX_WAIT_MS", "20"))
+BUCKETS_LOTE = (1, 2, 4, 8, 16, 32)
+GRACIA_PLAZO = 2.0  # Seconds a caller waits past its deadline for the decoder to notice it
+
+# === ONNX export ===
+def exportar_modelo_onnx(cuantizar: bool = False) -> Path:
+    """
+    Export the local flan-t5 model to ONNX once, optionally with dynamic int8 quantization.
+
+    Exports are cached on disk: ``models/flan-t5-base-onnx`` for the float model
+    and ``models/flan-t5-base-onnx-int8`` for the quantized one.
+
+    Args:
+        cuantizar (bool): Whether to return the dynamically int8-quantized export.
+
+    Returns:
+        Path: Directory holding the ONNX files and the tokenizer.
+    """
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    destino = Path(RUTA_MODELO_ONNX)
+    if not list(destino.glob("encoder_model*.onnx")):
+        print(f"📦 Exporting {RUTA_MODELO} to ONNX in {destino}...")
+        modelo = ORTModelForSeq2SeqLM.from_pretrained(RUTA_MODELO, export=True)
+        modelo.save_pretrained(destino)
+        AutoTokenizer.from_pretrained(RUTA_MODELO).save_pretrained(destino)
+
+    if not cuantizar:
+        return destino
+
+    destino_int8 = destino.with_name(f"{destino.name}-int8")
+    if not list(destino_int8.glob("encoder_model*.onnx")):
+        print(f"📦 Quantizing ONNX model to int8 in {destino_int8}...")
+        configuracion = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        for archivo in sorted(destino.glob("*.onnx")):
+            cuantizador = ORTQuantizer.from_pretrained(destino, file_name=archivo.name)
+            cuantizador.quantize(save_dir=destino_int8, quantization_config=configuracion)
+        for archivo in destino.iterdir():
+            if archivo.suffix != ".onnx" and archivo.is_file():
+                shutil.copy(archivo, destino_int8 / archivo.name)
+
+    return destino_int8
+
+
+def _archivos_onnx(directorio: Path) -> dict:
+    """Map the encoder/decoder ONNX files of an export (plain or quantized) to ORTModel kwargs."""
+    nombres = {archivo.name for archivo in directorio.glob("*.onnx")}
+    argumentos = {}
+
+    for clave, base in (
+        ("encoder_file_name", "encoder_model"),
+        ("decoder_file_name", "decoder_model"),
+        ("decoder_with_past_file_name", "decoder_with_past_model"),
+    ):
+        for candidato in (f"{base}_quantized.onnx", f"{base}.onnx"):
+            if candidato in nombres:
+                argumentos[clave] = candidato
+                break
+
+    return argumentos
 
 # === Model loader with cache ===
 @st.cache_resource(show_spinner="🔄 Loading local model (flan-t5-base)...")
-def cargar_modelo():
-    ruta = "models/flan-t5-base"
+def cargar_modelo(backend: str = BACKEND_GENERACION):
+    """
+    Load the generation pipeline for the selected inference backend.
+
+    Args:
+        backend (str): "pytorch", "onnx" or "onnx-int8".
+
+    Returns:
+        Pipeline: A ``text2text-generation`` pipeline. Its ``model`` exposes
+        ``generate`` for every backend, so streaming and batching work unchanged.
+    """
+    if backend not in BACKENDS_GENERACION:
+        raise ValueError(f"⚠️ Unknown generation backend: {backend}")
+
+    if backend == "pytorch":
+        tokenizer = AutoTokenizer.from_pretrained(RUTA_MODELO)
+        modelo = AutoModelForSeq2SeqLM.from_pretrained(RUTA_MODELO)
+        return pipeline("text2text-generation", model=modelo, tokenizer=tokenizer)
+
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+    ruta = exportar_modelo_onnx(cuantizar=backend == "onnx-int8")
     tokenizer = AutoTokenizer.from_pretrained(ruta)
-    modelo = AutoModelForSeq2SeqLM.from_pretrained(ruta)
+    modelo = ORTModelForSeq2SeqLM.from_pretrained(ruta, **_archivos_onnx(ruta))
     return pipeline("text2text-generation", model=modelo, tokenizer=tokenizer)
 
+# === Tokenizer ===
+@st.cache_resource(show_spinner=False)
+def cargar_tokenizer():
+    """Load the flan-t5 tokenizer alone (shared by every backend)."""
+    return AutoTokenizer.from_pretrained(RUTA_MODELO)
+
+
+def contar_tokens(texto: str) -> int:
+    """
+    Count the encoder tokens of a text with the generator's tokenizer.
+
+    Falls back to a word count if the tokenizer cannot be loaded.
+    """
+    try:
+        return len(cargar_tokenizer().encode(texto, add_special_tokens=False))
+    except Exception:
+        return len(texto.split())
+
+# === Deadlines ===
+class CriterioPlazos(StoppingCriteria):
+    """
+    Stop each sequence of a batch once its own deadline has passed or its
+    request was cancelled (sequences without either run on).
+    """
+
+    def __init__(self, plazos: List[Optional[Plazo]], cancelaciones: Optional[List[Optional[threading.Event]]] = None):
+        self.plazos = plazos
+        self.cancelaciones = cancelaciones or [None] * len(plazos)
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        vencidos = [plazo is not None and plazo.agotado() for plazo in self.plazos]
+        if any(vencidos):
+            incrementar("deadline_exceeded_total", sum(vencidos), stage="generacion")
+        cancelados = [evento is not None and evento.is_set() for evento in self.cancelaciones]
+        if any(cancelados):
+            incrementar("generation_cancelled_total", sum(cancelados))
+        parar = [vencido or cancelado for vencido, cancelado in zip(vencidos, cancelados)]
+        return torch.tensor(parar, dtype=torch.bool, device=input_ids.device)
+
+
+# === Streaming ===
+class StreamerLote(BaseStreamer):
+    """
+    Hand each sequence of a batched ``generate`` to its own request's streamer.
+
+    ``TextIteratorStreamer`` only accepts batch size 1, so this streamer takes
+    the whole batch at every decoding step and forwards each row's token to the
+    streamer of that row (rows without one are skipped). A row's streamer is
+    ended as soon as the row finishes (end of sequence, padding after a stop
+    criterion, or its own token limit) instead of when the whole batch does.
+
+    Args:
+        streamers (Sequence[TextIteratorStreamer]): Streamer of each row, or None.
+        max_tokens (Sequence[int]): Token limit of each row.
+        fin (set): Token ids that mark a finished row (EOS and padding).
+    """
+
+    def __init__(self, streamers: Sequence[Optional[TextIteratorStreamer]], max_tokens: Sequence[int], fin: set):
+        self.streamers = list(streamers)
+        self.max_tokens = list(max_tokens)
+        self.fin = fin
+        self.emitidos = [0] * len(self.streamers)
+        self._inicio = True
+
+    def _terminar(self, fila: int) -> None:
+        streamer = self.streamers[fila]
+        if streamer is not None:
+            self.streamers[fila] = None
+            streamer.end()
+
+    def put(self, value) -> None:
+        if self._inicio:  # Decoder start tokens
+            self._inicio = False
+            return
+        for fila, token in enumerate(value.reshape(len(self.streamers), -1)[:, -1].tolist()):
+            streamer = self.streamers[fila]
+            if streamer is None:
+                continue
+            if token in self.fin:
+                self._terminar(fila)
+                continue
+            streamer.put(value.new_tensor([token]))
+            self.emitidos[fila] += 1
+            if self.emitidos[fila] >= self.max_tokens[fila]:
+                self._terminar(fila)
+
+    def end(self) -> None:
+        for fila in range(len(self.streamers)):
+            self._terminar(fila)
+
+
 # === Generation function ===
-def generar_respuesta_hf(prompt: str, max_tokens: int = 256) -> str:
+def generar_respuesta_hf(prompt: str, max_tokens: int = 256, plazo: Optional[Plazo] = None) -> str:
     """
     Generate a response from a local text generation model.
 
     Args:
         prompt (str): Input prompt or question.
         max_tokens (int): Maximum tokens to generate.
+        plazo (Plazo, optional): Deadline; decoding stops when it passes and
+            returns the text generated so far.
 
     Returns:
         str: Generated text response.
+
+    Raises:
+        TimeoutError: If the deadline passed before generation started.
+    """
+    if LOTES_ACTIVOS:
+        futuro = obtener_planificador().enviar(prompt, max_tokens, plazo)
+        try:
+            return futuro.result(None if plazo is None else plazo.restante() + GRACIA_PLAZO)
+        except TimeoutError:
+            futuro.cancel()  # Dropped by the scheduler if it has not started yet
+            raise
+
+    if plazo is not None and plazo.agotado():
+        raise TimeoutError("⚡ Deadline passed before generation started.")
+    return generar_respuestas_hf_lote([prompt], [max_tokens], [plazo])[0]
+
+# === Batched generation ===
+def generar_respuestas_hf_lote(
+    prompts: List[str],
+    max_tokens: List[int],
+    plazos: Optional[List[Optional[Plazo]]] = None,
+    streamers: Optional[List[Optional[TextIteratorStreamer]]] = None,
+    cancelaciones: Optional[List[Optional[threading.Event]]] = None,
+) -> List[str]:
+    """
+    Generate responses for several prompts in one padded ``generate`` call.
+
+    Greedy decoding is independent per sequence, so the batch is decoded up to
+    the largest token limit and each output is then cut to its own limit.
+    Sequences whose deadline passes are finished early while the rest go on.
+
+    Args:
+        prompts (List[str]): Input prompts.
+        max_tokens (List[int]): Maximum tokens to generate for each prompt.
+        plazos (List[Plazo], optional): Deadline for each prompt (None for no deadline).
+        streamers (List[TextIteratorStreamer], optional): Streamer fed with the
+            tokens of each prompt as they are decoded (None for no streaming).
+        cancelaciones (List[threading.Event], optional): Event that stops each
+            prompt's decoding when set (None for no cancellation).
+
+    Returns:
+        List[str]: Generated text for each prompt, in the same order.
     """
     generador = cargar_modelo()
-    resultado = generador(prompt, max_new_tokens=max_tokens, do_sample=False)[0]["generated_text"]
-    return resultado
+    tokenizer, modelo = generador.tokenizer, generador.model
+
+    entradas = tokenizer(prompts, return_tensors="pt", padding=True)
+    opciones = {}
+    if (plazos and any(plazo is not None for plazo in plazos)) or (
+        cancelaciones and any(evento is not None for evento in cancelaciones)
+    ):
+        opciones["stopping_criteria"] = StoppingCriteriaList([CriterioPlazos(plazos or [None] * len(prompts), cancelaciones)])
+    if streamers and any(streamer is not None for streamer in streamers):
+        fin = {tokenizer.eos_token_id, tokenizer.pad_token_id}
+        opciones["streamer"] = StreamerLote(streamers, max_tokens, fin)
+    with medir_etapa("generacion_modelo"):
+        salidas = modelo.generate(**entradas, max_new_tokens=max(max_tokens), do_sample=False, **opciones)
+
+    # Position 0 holds the decoder start token
+    recortadas = [salida[: 1 + limite] for salida, limite in zip(salidas, max_tokens)]
+
+    observar("generation_batch_size", len(prompts), buckets=BUCKETS_LOTE)
+    for tokens_entrada in entradas["attention_mask"].sum(dim=1).tolist():
+        observar("generation_input_tokens", tokens_entrada)
+    incrementar(
+        "generation_output_tokens_total",
+        sum(int((salida[1:] != tokenizer.pad_token_id).sum()) for salida in recortadas),
+    )
+    return tokenizer.batch_decode(recortadas, skip_special_tokens=True)
+
+
+class PlanificadorGeneracion:
+    """
+    Micro-batching scheduler for concurrent generation requests.
+
+    Callers submit prompts from any thread and get a Future back. A single
+    worker thread takes the first pending prompt, keeps collecting more for up
+    to ``max_espera_ms`` or until ``max_lote`` prompts are queued, runs them as
+    one batch and resolves each caller's Future with its own result. Prompts
+    submitted with a streamer also receive their tokens while the batch decodes.
+    """
+
+    def __init__(self, generar_lote=generar_respuestas_hf_lote, max_lote: int = MAX_LOTE_GENERACION,
+                 max_espera_ms: float = MAX_ESPERA_LOTE_MS):
+        self.generar_lote = generar_lote
+        self.max_lote = max(1, max_lote)
+        self.max_espera = max_espera_ms / 1000
+        self._cola: "queue.Queue[tuple]" = queue.Queue()
+        self._hilo = threading.Thread(target=self._bucle, name="planificador-generacion", daemon=True)
+        self._hilo.start()
+
+    def enviar(self, prompt: str, max_tokens: int = 256, plazo: Optional[Plazo] = None,
+               streamer: Optional[TextIteratorStreamer] = None,
+               cancelacion: Optional[threading.Event] = None) -> Future:
+        """
+        Queue a prompt for generation and return a Future with the generated text.
+
+        If a streamer is given it receives the decoded text as it is produced
+        and is always ended, also when the prompt is cancelled or fails.
+        Setting ``cancelacion`` stops the prompt's row at the next decoding step.
+        """
+        futuro: Future = Future()
+        if streamer is not None:
+            futuro.add_done_callback(lambda _: streamer.end())
+        self._cola.put((prompt, max_tokens, futuro, time.perf_counter(), plazo, streamer, cancelacion))
+        return futuro
+
+    def pendientes(self) -> int:
+        """Number of prompts waiting for the next batch."""
+        return self._cola.qsize()
+
+    def _recoger_lote(self) -> List[tuple]:
+        lote = [self._cola.get()]
+        limite = time.monotonic() + self.max_espera
+
+        while len(lote) < self.max_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._cola.get(timeout=restante))
+            except queue.Empty:
+                break
+
+        return lote
+
+    def _bucle(self) -> None:
+        while True:
+            lote = []
+            for peticion in self._recoger_lote():
+                _, _, futuro, _, plazo, _, _ = peticion
+                if not futuro.set_running_or_notify_cancel():
+                    continue
+                if plazo is not None and plazo.agotado():
+                    incrementar("deadline_exceeded_total", stage="generacion_cola")
+                    futuro.set_exception(TimeoutError("⚡ Deadline passed while waiting for generation."))
+                    continue
+                lote.append(peticion)
+            if not lote:
+                continue
+
+            ahora = time.perf_counter()
+            for _, _, _, encolada, *_ in lote:
+                registrar_duracion("generacion_cola", ahora - encolada)
+
+            try:
+                resultados = self.generar_lote(
+                    [p for p, *_ in lote], [m for _, m, *_ in lote], [plazo for *_, plazo, _, _ in lote],
+                    [streamer for *_, streamer, _ in lote], [cancelacion for *_, cancelacion in lote],
+                )
+            except Exception as error:
+                for _, _, futuro, *_ in lote:
+                    futuro.set_exception(error)
+                continue
+
+            for (_, _, futuro, *_), resultado in zip(lote, resultados):
+                futuro.set_result(resultado)
+
+
+@st.cache_resource(show_spinner=False)
+def obtener_planificador() -> PlanificadorGeneracion:
+    """Return the process-wide generation scheduler shared by all sessions."""
+    planificador = PlanificadorGeneracion()
+    registrar_gauge("generation_queue_depth", planificador.pendientes, "Prompts waiting for the next batch.")
+    return planificador
+
+
+# === Streaming generation ===
+def generar_respuesta_hf_stream(prompt: str, max_tokens: int = 256, plazo: Optional[Plazo] = None) -> Iterator[str]:
+    """
+    Stream a response from the local model as text deltas.
+
+    With batching enabled the prompt goes through the shared scheduler like any
+    other request and its row of the batch is streamed back; otherwise it is
+    decoded alone in a background thread. Either way each decoded fragment is
+    yielded as soon as it is available.
+
+    Closing the generator early (the consumer stopped iterating) cancels the
+    decoding of this prompt and waits until it has stopped, so the caller can
+    release its generation slot knowing the model is no longer working for it.
+
+    Args:
+        prompt (str): Input prompt or question.
+        max_tokens (int): Maximum tokens to generate.
+        plazo (Plazo, optional): Deadline; the stream ends when it passes.
+
+    Yields:
+        str: Consecutive fragments of the generated text.
+
+    Raises:
+        TimeoutError: If the deadline passed before generation started.
+    """
+    if plazo is not None and plazo.agotado():
+        raise TimeoutError("⚡ Deadline passed before generation started.")
+
+    streamer = TextIteratorStreamer(cargar_modelo().tokenizer, skip_special_tokens=True)
+    cancelacion = threading.Event()
+    hilo = None
+    inicio = time.perf_counter()
+
+    if LOTES_ACTIVOS:
+        futuro = obtener_planificador().enviar(prompt, max_tokens, plazo, streamer, cancelacion)
+    else:
+        futuro = Future()
+        futuro.add_done_callback(lambda _: streamer.end())
+
+        def _decodificar() -> None:
+            futuro.set_running_or_notify_cancel()
+            try:
+                futuro.set_result(
+                    generar_respuestas_hf_lote([prompt], [max_tokens], [plazo], [streamer], [cancelacion])[0]
+                )
+            except Exception as error:
+                futuro.set_exception(error)
+
+        hilo = threading.Thread(target=_decodificar, daemon=True)
+        hilo.start()
+
+    primero = True
+    terminado = False
+    try:
+        for fragmento in streamer:
+            if fragmento:
+                if primero:
+                    registrar_duracion("generacion_primer_token", time.perf_counter() - inicio)
+                    primero = False
+                yield fragmento
+        terminado = True
+    finally:
+        if not terminado:
+            # Stop decoding this row and wait until its streamer is ended by the worker
+            cancelacion.set()
+            futuro.cancel()
+            for _ in streamer:
+                pass
+        if hilo is not None:
+            hilo.join()
+
+    # The row's stream ends before the rest of the batch; only a failed request is waited on
+    if futuro.done() and not futuro.cancelled() and futuro.exception() is not None:
+        raise futuro.exception()
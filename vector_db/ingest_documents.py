@@ -0,0 +1,241 @@
+"""
+ingest_documents.py
+
+Streaming ingestion pipeline for the ItsMeHi knowledge base.
+
+Documents (CVs, project write-ups, Markdown, text and PDF files) are read one
+at a time, split into token-bounded overlapping chunks, embedded in batches
+across worker processes and upserted to Qdrant in parallel batches.
+
+Point ids are derived from the source file and a hash of the chunk content,
+so re-running the pipeline skips chunks that are already stored and, per
+source file, deletes chunks that no longer exist. A passage shared by two
+sources is stored once per source, so each keeps its own ``source`` payload
+and deleting one source's stale chunks never removes another's.
+
+Usage:
+    python vector_db/ingest_documents.py docs/cv.pdf docs/proyectos/ --procesos 4
+"""
+
+# === Imports ===
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import os
+import time
+import uuid
+import argparse
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List
+
+# Workers embed fresh text only; the query-time disk cache is not shared across processes
+os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "0")
+
+from dotenv import load_dotenv
+from qdrant_client import QdrantClient
+from qdrant_client.models import FieldCondition, Filter, HasIdCondition, MatchValue, PointStruct
+from utils.text_processing import dividir_en_chunks, hash_contenido, leer_documentos
+from vector_db.collection_profile import crear_coleccion
+from vector_db.embedding_client import DIMENSION_EMBEDDING, embed_textos, modelo_embeddings
+
+# === Constants ===
+NOMBRE_COLECCION = "itsmehi_collection"
+ESPACIO_IDS = uuid.UUID("5b0c3a52-6f1e-4d8a-9a57-1c2f3e4d5a6b")  # Namespace for source + content-hash ids
+
+# === Load environment variables ===
+load_dotenv()
+QDRANT_URL = os.getenv("QDRANT_URL")
+QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+
+# === Helpers ===
+def id_chunk(fuente: str, texto: str) -> str:
+    """Deterministic Qdrant point id (UUID) derived from the source and the chunk content."""
+    return str(uuid.uuid5(ESPACIO_IDS, f"{fuente}\n{hash_contenido(texto)}"))
+
+
+def cargar_contador_tokens() -> Callable[[str], int]:
+    """Count tokens with the embedding model's tokenizer, falling back to words."""
+    try:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(modelo_embeddings)
+        return lambda texto: len(tokenizer.tokenize(texto))
+    except Exception as error:
+        print(f"⚡ Tokenizer unavailable, counting words instead: {error}")
+        return lambda texto: len(texto.split())
+
+
+def generar_chunks(rutas: List[Path], max_tokens: int, solapamiento: int, fuentes: Dict[str, set]) -> Iterator[dict]:
+    """Stream chunk records from the documents, registering the ids seen per source."""
+    contar_tokens = cargar_contador_tokens()
+    for fuente, texto in leer_documentos(rutas):
+        ids_fuente = fuentes.setdefault(fuente, set())
+        for posicion, chunk in enumerate(dividir_en_chunks(texto, max_tokens, solapamiento, contar_tokens)):
+            clave = id_chunk(fuente, chunk)
+            ids_fuente.add(clave)
+            yield {"id": clave, "payload": {"text": chunk, "source": fuente, "chunk": posicion}}
+
+
+def agrupar(registros: Iterator[dict], tamano: int) -> Iterator[List[dict]]:
+    lote = []
+    for registro in registros:
+        lote.append(registro)
+        if len(lote) == tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def ids_existentes(cliente: QdrantClient, ids: List[str]) -> set:
+    puntos = cliente.retrieve(collection_name=NOMBRE_COLECCION, ids=ids, with_payload=False, with_vectors=False)
+    return {str(punto.id) for punto in puntos}
+
+# === Pipeline ===
+def ingerir(
+    cliente: QdrantClient,
+    rutas: List[Path],
+    max_tokens: int = 200,
+    solapamiento: int = 40,
+    lote_embeddings: int = 64,
+    procesos: int = 2,
+    lote_upsert: int = 128,
+    hilos_upsert: int = 4,
+    eliminar_obsoletos: bool = True,
+) -> dict:
+    """
+    Run the streaming ingestion pipeline.
+
+    Args:
+        cliente (QdrantClient): Connected Qdrant client.
+        rutas (List[Path]): Files or directories to ingest.
+        max_tokens (int): Maximum tokens per chunk (embedding tokenizer).
+        solapamiento (int): Overlapping tokens between consecutive chunks.
+        lote_embeddings (int): Chunks per embedding batch.
+        procesos (int): Worker processes used for embedding (1 = in-process).
+        lote_upsert (int): Points per upsert request.
+        hilos_upsert (int): Concurrent upsert requests.
+        eliminar_obsoletos (bool): Delete chunks of ingested sources that no longer exist.
+
+    Returns:
+        dict: Counters and throughput of the run.
+    """
+    if not cliente.collection_exists(collection_name=NOMBRE_COLECCION):
+        crear_coleccion(cliente, NOMBRE_COLECCION, DIMENSION_EMBEDDING)
+
+    inicio = time.perf_counter()
+    fuentes: Dict[str, set] = {}
+    estadisticas = {"chunks": 0, "nuevos": 0, "sin_cambios": 0, "eliminados": 0}
+
+    grupo_embeddings = ProcessPoolExecutor(max_workers=procesos) if procesos > 1 else None
+    grupo_upsert = ThreadPoolExecutor(max_workers=hilos_upsert)
+    embeddings_en_curso: "deque[tuple]" = deque()
+    upserts_en_curso: "deque[Future]" = deque()
+
+    def _upsert(lote: List[dict], vectores: List[List[float]]) -> None:
+        puntos = [
+            PointStruct(id=registro["id"], vector=vector, payload=registro["payload"])
+            for registro, vector in zip(lote, vectores)
+        ]
+        for desde in range(0, len(puntos), lote_upsert):
+            while len(upserts_en_curso) >= 2 * hilos_upsert:  # Bound the requests in flight
+                upserts_en_curso.popleft().result()
+            upserts_en_curso.append(grupo_upsert.submit(
+                cliente.upsert, collection_name=NOMBRE_COLECCION, points=puntos[desde:desde + lote_upsert], wait=True
+            ))
+
+    def _drenar(max_en_curso: int) -> None:
+        while len(embeddings_en_curso) > max_en_curso:
+            lote, futuro = embeddings_en_curso.popleft()
+            _upsert(lote, futuro.result())
+
+    try:
+        for lote in agrupar(generar_chunks(rutas, max_tokens, solapamiento, fuentes), lote_embeddings):
+            estadisticas["chunks"] += len(lote)
+
+            # Skip chunks of this source whose content hash is already stored (or repeated within the batch)
+            existentes = ids_existentes(cliente, list({r["id"] for r in lote}))
+            vistos = set()
+            pendientes = []
+            for registro in lote:
+                if registro["id"] not in existentes and registro["id"] not in vistos:
+                    pendientes.append(registro)
+                    vistos.add(registro["id"])
+            estadisticas["sin_cambios"] += len(lote) - len(pendientes)
+            estadisticas["nuevos"] += len(pendientes)
+            if not pendientes:
+                continue
+
+            textos = [r["payload"]["text"] for r in pendientes]
+            if grupo_embeddings is None:
+                _upsert(pendientes, embed_textos(textos))
+            else:
+                embeddings_en_curso.append((pendientes, grupo_embeddings.submit(embed_textos, textos)))
+                _drenar(2 * procesos)  # Bound the batches in flight
+
+        _drenar(0)
+        for futuro in upserts_en_curso:
+            futuro.result()
+    finally:
+        if grupo_embeddings is not None:
+            grupo_embeddings.shutdown()
+        grupo_upsert.shutdown()
+
+    if eliminar_obsoletos:
+        for fuente, ids in fuentes.items():
+            filtro = Filter(
+                must=[FieldCondition(key="source", match=MatchValue(value=fuente))],
+                must_not=[HasIdCondition(has_id=list(ids))],
+            )
+            obsoletos = cliente.count(collection_name=NOMBRE_COLECCION, count_filter=filtro, exact=True).count
+            if obsoletos:
+                cliente.delete(collection_name=NOMBRE_COLECCION, points_selector=filtro, wait=True)
+                estadisticas["eliminados"] += obsoletos
+
+    segundos = time.perf_counter() - inicio
+    estadisticas.update({
+        "documentos": len(fuentes),
+        "segundos": segundos,
+        "docs_por_segundo": len(fuentes) / segundos if segundos else 0.0,
+        "chunks_por_segundo": estadisticas["chunks"] / segundos if segundos else 0.0,
+    })
+    return estadisticas
+
+# === Main ===
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingest documents into the ItsMeHi Qdrant collection.")
+    parser.add_argument("rutas", nargs="+", type=Path, help="Files or directories (.txt, .md, .pdf).")
+    parser.add_argument("--max-tokens", type=int, default=200)
+    parser.add_argument("--solapamiento", type=int, default=40)
+    parser.add_argument("--lote-embeddings", type=int, default=64)
+    parser.add_argument("--procesos", type=int, default=max(1, min(4, (os.cpu_count() or 2) // 2)))
+    parser.add_argument("--lote-upsert", type=int, default=128)
+    parser.add_argument("--hilos-upsert", type=int, default=4)
+    parser.add_argument("--conservar-obsoletos", action="store_true", help="Do not delete stale chunks.")
+    args = parser.parse_args()
+
+    cliente_qdrant = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+
+    estadisticas = ingerir(
+        cliente_qdrant,
+        args.rutas,
+        max_tokens=args.max_tokens,
+        solapamiento=args.solapamiento,
+        lote_embeddings=args.lote_embeddings,
+        procesos=args.procesos,
+        lote_upsert=args.lote_upsert,
+        hilos_upsert=args.hilos_upsert,
+        eliminar_obsoletos=not args.conservar_obsoletos,
+    )
+
+    print(
+        f"✅ {estadisticas['documentos']} documents, {estadisticas['chunks']} chunks "
+        f"({estadisticas['nuevos']} new, {estadisticas['sin_cambios']} unchanged, "
+        f"{estadisticas['eliminados']} stale removed) in {estadisticas['segundos']:.1f}s — "
+        f"{estadisticas['docs_por_segundo']:.2f} docs/s, {estadisticas['chunks_por_segundo']:.1f} chunks/s."
+    )
+
+
+if __name__ == "__main__":
+    main()
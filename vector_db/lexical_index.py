@@ -0,0 +1,207 @@
+"""In-process BM25 index over the chunk texts of the Qdrant collection.
+
+Recruiter questions are often keyword-heavy ("Power BI", "ETL", "NLP"). For
+those, an inverted index over the same chunk texts stored in Qdrant finds the
+right passages in microseconds without embedding the question. The index is
+built once from the collection payloads (texts only, no vectors) and rebuilt
+in the background after the refresh interval.
+
+Classes:
+    IndiceBM25: Inverted index with BM25 scoring and a lexical confidence check.
+
+Functions:
+    tokenizar(texto): Lowercase, accent-free content terms of a text.
+    fusionar_rrf(listas, k, constante): Reciprocal rank fusion of ranked hit lists.
+"""
+
+# === Imports ===
+import re
+import math
+import time
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, List, Sequence, Tuple
+from qdrant_client import QdrantClient
+
+# === Constants ===
+TAMANO_PAGINA_SCROLL = 256
+K1 = 1.5
+B = 0.75
+CONSTANTE_RRF = 60
+PATRON_TERMINOS = re.compile(r"\w+")
+PALABRAS_VACIAS = {
+    # Spanish
+    "a", "al", "algo", "algun", "alguna", "como", "con", "cual", "cuales", "cuando", "de", "del", "donde", "el",
+    "en", "es", "esta", "este", "has", "hay", "la", "las", "le", "lo", "los", "me", "mi", "mis", "muy", "o",
+    "para", "pero", "por", "que", "quien", "se", "si", "sin", "sobre", "son", "su", "sus", "te", "tiene",
+    "tienes", "tu", "tus", "un", "una", "uno", "y", "ya", "yo",
+    # English
+    "about", "an", "and", "any", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "have",
+    "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "the", "to", "what", "when", "where", "which",
+    "who", "why", "with", "you", "your",
+}
+
+# === Functions ===
+
+def tokenizar(texto: str) -> List[str]:
+    """Return the lowercase, accent-free content terms of a text (stopwords removed)."""
+    sin_acentos = unicodedata.normalize("NFKD", texto.lower()).encode("ascii", "ignore").decode("ascii")
+    return [termino for termino in PATRON_TERMINOS.findall(sin_acentos) if termino not in PALABRAS_VACIAS]
+
+
+def fusionar_rrf(
+    listas: Sequence[Sequence[Tuple[object, str, float]]],
+    k: int,
+    constante: int = CONSTANTE_RRF,
+) -> List[Tuple[object, str, float]]:
+    """
+    Merge ranked hit lists with reciprocal rank fusion.
+
+    Each hit scores ``1 / (constante + rank)`` in every list it appears in, so
+    passages ranked well by both retrievers rise to the top regardless of how
+    their raw scores compare.
+
+    Args:
+        listas (Sequence[Sequence[Tuple[id, str, float]]]): (point id, text, score) lists, best first.
+        k (int): Number of fused results.
+        constante (int): RRF smoothing constant.
+
+    Returns:
+        List[Tuple[id, str, float]]: (point id, text, fused score) sorted by descending score.
+    """
+    puntuaciones: Dict[str, float] = defaultdict(float)
+    textos: Dict[str, Tuple[object, str]] = {}
+
+    for lista in listas:
+        for posicion, (clave, texto, _) in enumerate(lista, start=1):
+            puntuaciones[str(clave)] += 1.0 / (constante + posicion)
+            textos.setdefault(str(clave), (clave, texto))
+
+    mejores = sorted(puntuaciones, key=puntuaciones.get, reverse=True)[:k]
+    return [(*textos[clave], puntuaciones[clave]) for clave in mejores]
+
+# === Index ===
+class IndiceBM25:
+    """
+    BM25 inverted index over the texts of a Qdrant collection.
+
+    Args:
+        coleccion (str): Name of the Qdrant collection to index.
+        intervalo_refresco (float): Seconds between background rebuilds.
+        umbral_cobertura (float): Minimum share of the question's IDF mass the
+            best passage must contain for the lexical result to be trusted alone.
+        margen (float): Minimum ratio between the best and second-best BM25 score.
+    """
+
+    def __init__(self, coleccion: str, intervalo_refresco: float = 60.0, umbral_cobertura: float = 0.75,
+                 margen: float = 1.2):
+        self.coleccion = coleccion
+        self.intervalo_refresco = intervalo_refresco
+        self.umbral_cobertura = umbral_cobertura
+        self.margen = margen
+        self.ultima_sincronizacion = 0.0
+        # (ids, texts, postings, doc lengths, idf) swapped as one tuple so readers never see a partial update
+        self._datos: tuple = ([], [], {}, [], {})
+        self._refrescando = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._datos[0])
+
+    def _scroll(self, cliente: QdrantClient):
+        desplazamiento = None
+        while True:
+            puntos, desplazamiento = cliente.scroll(
+                collection_name=self.coleccion,
+                limit=TAMANO_PAGINA_SCROLL,
+                offset=desplazamiento,
+                with_payload=["text"],
+                with_vectors=False,
+            )
+            yield from puntos
+            if desplazamiento is None:
+                break
+
+    def indexar(self, documentos: Sequence[Tuple[object, str]]) -> None:
+        """Build the index from (point id, text) pairs."""
+        ids, textos, longitudes = [], [], []
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+
+        for posicion, (clave, texto) in enumerate(documentos):
+            terminos = tokenizar(texto)
+            ids.append(clave)
+            textos.append(texto)
+            longitudes.append(len(terminos))
+            for termino, frecuencia in Counter(terminos).items():
+                postings[termino].append((posicion, frecuencia))
+
+        n = len(ids)
+        idf = {termino: math.log(1 + (n - len(lista) + 0.5) / (len(lista) + 0.5)) for termino, lista in postings.items()}
+        self._datos = (ids, textos, dict(postings), longitudes, idf)
+
+    def construir(self, cliente: QdrantClient) -> None:
+        """Index every chunk text of the collection."""
+        self.indexar([(punto.id, punto.payload["text"]) for punto in self._scroll(cliente)])
+        self.ultima_sincronizacion = time.time()
+
+    def refrescar_si_toca(self, cliente: QdrantClient) -> None:
+        """Start a background rebuild if the refresh interval has elapsed."""
+        if time.time() - self.ultima_sincronizacion < self.intervalo_refresco:
+            return
+        if not self._refrescando.acquire(blocking=False):
+            return  # A rebuild is already running
+
+        def _reconstruir() -> None:
+            try:
+                self.construir(cliente)
+            except Exception as error:
+                print(f"⚡ Error rebuilding BM25 index: {error}")
+            finally:
+                self._refrescando.release()
+
+        threading.Thread(target=_reconstruir, name="refresco-indice-bm25", daemon=True).start()
+
+    def buscar(self, consulta: str, k: int = 3) -> Tuple[List[Tuple[object, str, float]], bool]:
+        """
+        Return the top-k passages by BM25 score and whether they can be trusted alone.
+
+        The result is confident when the best passage contains at least
+        ``umbral_cobertura`` of the question's IDF mass (terms absent from the
+        collection count with the highest IDF) and beats the runner-up by ``margen``.
+
+        Args:
+            consulta (str): The user's question.
+            k (int): Number of results.
+
+        Returns:
+            Tuple[List[Tuple[id, str, float]], bool]: (point id, text, score) sorted by
+            descending score, and the confidence flag.
+        """
+        ids, textos, postings, longitudes, idf = self._datos
+        terminos = set(tokenizar(consulta))
+        if not ids or not terminos:
+            return [], False
+
+        media_longitud = sum(longitudes) / len(longitudes) or 1.0
+        puntuaciones: Dict[int, float] = defaultdict(float)
+        presentes: Dict[int, set] = defaultdict(set)
+
+        for termino in terminos:
+            for posicion, frecuencia in postings.get(termino, ()):
+                normalizacion = K1 * (1 - B + B * longitudes[posicion] / media_longitud)
+                puntuaciones[posicion] += idf[termino] * frecuencia * (K1 + 1) / (frecuencia + normalizacion)
+                presentes[posicion].add(termino)
+
+        if not puntuaciones:
+            return [], False
+
+        mejores = sorted(puntuaciones, key=puntuaciones.get, reverse=True)[:k]
+        resultados = [(ids[i], textos[i], puntuaciones[i]) for i in mejores]
+
+        idf_maximo = max(idf.values())
+        masa_total = sum(idf.get(termino, idf_maximo) for termino in terminos)
+        cobertura = sum(idf[termino] for termino in presentes[mejores[0]]) / masa_total
+        segunda = puntuaciones[mejores[1]] if len(mejores) > 1 else 0.0
+        confiable = cobertura >= self.umbral_cobertura and puntuaciones[mejores[0]] >= self.margen * segunda
+
+        return resultados, confiable
@@ -5,6 +5,7 @@ from dotenv import load_dotenv
 
 # === Constants ===
 NOMBRE_COLECCION = "itsmehi_collection"
+TAMANO_PAGINA = 256
 
 # === Load environment variables ===
 load_dotenv()
@@ -17,13 +18,25 @@ cliente_qdrant = QdrantClient(
     api_key=QDRANT_API_KEY
 )
 
-# === List documents in collection ===
-resultados, _ = cliente_qdrant.scroll(
-    collection_name=NOMBRE_COLECCION,
-    limit=100  # You can increase if needed
-)
-
+# === List documents in collection (paginated) ===
 print(f"✅ Documentos encontrados en '{NOMBRE_COLECCION}':\n")
 
-for punto in resultados:
-    print(f"ID: {punto.id} | Texto: {punto.payload['text']}")
+total = 0
+desplazamiento = None
+while True:
+    resultados, desplazamiento = cliente_qdrant.scroll(
+        collection_name=NOMBRE_COLECCION,
+        limit=TAMANO_PAGINA,
+        offset=desplazamiento,
+        with_payload=["text"],
+        with_vectors=False,
+    )
+
+    for punto in resultados:
+        print(f"ID: {punto.id} | Texto: {punto.payload['text']}")
+    total += len(resultados)
+
+    if desplazamiento is None:
+        break
+
+print(f"\n📄 Total: {total} documentos.")
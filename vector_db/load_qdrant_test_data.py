@@ -1,13 +1,16 @@
 # === Imports ===
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams
-from sentence_transformers import SentenceTransformer
 import os
 from dotenv import load_dotenv
+from vector_db.embedding_client import embed_textos, DIMENSION_EMBEDDING
+from vector_db.collection_profile import crear_coleccion
 
 # === Constants ===
 NOMBRE_COLECCION = "itsmehi_collection"
-MODELO_EMBEDDINGS = "sentence-transformers/all-MiniLM-L6-v2"
 
 # === Load environment variables ===
 load_dotenv()
@@ -22,14 +25,8 @@ cliente_qdrant = QdrantClient(
 
 # === Create or ensure collection ===
 if not cliente_qdrant.collection_exists(collection_name=NOMBRE_COLECCION):
-    cliente_qdrant.create_collection(
-        collection_name=NOMBRE_COLECCION,
-        vectors_config=VectorParams(size=384, distance=Distance.COSINE),
-    )
-
+    crear_coleccion(cliente_qdrant, NOMBRE_COLECCION, DIMENSION_EMBEDDING)
 
-# === Initialize embedding model ===
-modelo_embeddings = SentenceTransformer(MODELO_EMBEDDINGS)
 
 # === Test documents (in Spanish) ===
 documentos = [
@@ -39,8 +36,8 @@ documentos = [
     "El rol requiere habilidades en Python, NLP y visualización de datos."
 ]
 
-# === Generate embeddings ===
-vectores = modelo_embeddings.encode(documentos).tolist()
+# === Generate embeddings (same backend as query time) ===
+vectores = embed_textos(documentos)
 
 # === Insert documents into Qdrant ===
 cliente_qdrant.upsert(
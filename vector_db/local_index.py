@@ -0,0 +1,166 @@
+"""In-process vector index mirrored from Qdrant.
+
+The whole collection (a few hundred CV chunks) is scrolled once into a
+contiguous matrix of L2-normalized vectors, so a query is a single
+matrix-vector product plus a top-k selection in NumPy instead of a network
+round trip. The mirror is refreshed incrementally in the background and
+callers fall back to Qdrant when it is older than the staleness limit.
+
+Classes:
+    IndiceLocal: Normalized float32/float16 matrix of the collection with top-k search.
+"""
+
+# === Imports ===
+import time
+import threading
+from typing import List, Tuple
+import numpy as np
+from qdrant_client import QdrantClient
+
+# === Constants ===
+TAMANO_PAGINA_SCROLL = 256
+
+# === Index ===
+class IndiceLocal:
+    """
+    Contiguous, normalized in-memory copy of a Qdrant collection.
+
+    Args:
+        coleccion (str): Name of the Qdrant collection to mirror.
+        dtype (str): "float32" or "float16" storage for the vector matrix.
+        intervalo_refresco (float): Seconds between incremental refreshes.
+        max_antiguedad (float): Seconds after the last successful sync at which
+            the mirror is considered stale and should not be used.
+    """
+
+    def __init__(self, coleccion: str, dtype: str = "float32", intervalo_refresco: float = 60.0,
+                 max_antiguedad: float = 600.0):
+        self.coleccion = coleccion
+        self.dtype = np.dtype(dtype)
+        self.intervalo_refresco = intervalo_refresco
+        self.max_antiguedad = max_antiguedad
+        self.ultima_sincronizacion = 0.0
+        # (ids, texts, matrix) swapped as one tuple so readers never see a partial update
+        self._datos: Tuple[list, List[str], np.ndarray] = ([], [], np.zeros((0, 0), dtype=self.dtype))
+        self._refrescando = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._datos[0])
+
+    def _normalizar(self, vectores: np.ndarray) -> np.ndarray:
+        vectores = np.asarray(vectores, dtype=np.float32)
+        normas = np.linalg.norm(vectores, axis=1, keepdims=True)
+        normas[normas == 0] = 1.0
+        return np.ascontiguousarray(vectores / normas, dtype=self.dtype)
+
+    def _scroll(self, cliente: QdrantClient, con_vectores: bool):
+        """Yield every point of the collection with paginated scroll."""
+        desplazamiento = None
+        while True:
+            puntos, desplazamiento = cliente.scroll(
+                collection_name=self.coleccion,
+                limit=TAMANO_PAGINA_SCROLL,
+                offset=desplazamiento,
+                with_payload=["text"] if con_vectores else False,
+                with_vectors=con_vectores,
+            )
+            yield from puntos
+            if desplazamiento is None:
+                break
+
+    def construir(self, cliente: QdrantClient) -> None:
+        """Load the full collection into memory."""
+        ids, textos, vectores = [], [], []
+        for punto in self._scroll(cliente, con_vectores=True):
+            ids.append(punto.id)
+            textos.append(punto.payload["text"])
+            vectores.append(punto.vector)
+
+        matriz = self._normalizar(vectores) if vectores else np.zeros((0, 0), dtype=self.dtype)
+        self._datos = (ids, textos, matriz)
+        self.ultima_sincronizacion = time.time()
+
+    def refrescar(self, cliente: QdrantClient) -> None:
+        """
+        Sync the mirror with the collection, fetching only points that changed.
+
+        Only ids are scrolled; new points are retrieved with their vectors and
+        removed ones are dropped. Changes are detected by point id, so an edited
+        chunk is only picked up if it is stored under a new id (e.g. a content hash).
+        """
+        if not len(self):
+            self.construir(cliente)
+            return
+
+        ids, textos, matriz = self._datos
+        ids_remotos = [punto.id for punto in self._scroll(cliente, con_vectores=False)]
+        conjunto_remoto, conjunto_local = set(ids_remotos), set(ids)
+
+        nuevos = [clave for clave in ids_remotos if clave not in conjunto_local]
+        conservar = [i for i, clave in enumerate(ids) if clave in conjunto_remoto]
+
+        if nuevos or len(conservar) != len(ids):
+            ids = [ids[i] for i in conservar]
+            textos = [textos[i] for i in conservar]
+            matriz = matriz[conservar]
+
+            if nuevos:
+                puntos = cliente.retrieve(
+                    collection_name=self.coleccion, ids=nuevos, with_payload=["text"], with_vectors=True
+                )
+                ids += [punto.id for punto in puntos]
+                textos += [punto.payload["text"] for punto in puntos]
+                matriz = np.vstack([matriz, self._normalizar([punto.vector for punto in puntos])])
+
+            self._datos = (ids, textos, np.ascontiguousarray(matriz))
+            print(f"🔄 Local index refreshed: +{len(nuevos)} / -{len(conjunto_local) - len(conservar)} points.")
+
+        self.ultima_sincronizacion = time.time()
+
+    def refrescar_si_toca(self, cliente: QdrantClient) -> None:
+        """Start a background refresh if the refresh interval has elapsed."""
+        if time.time() - self.ultima_sincronizacion < self.intervalo_refresco:
+            return
+        if not self._refrescando.acquire(blocking=False):
+            return  # A refresh is already running
+
+        def _refrescar() -> None:
+            try:
+                self.refrescar(cliente)
+            except Exception as error:
+                print(f"⚡ Error refreshing local index: {error}")
+            finally:
+                self._refrescando.release()
+
+        threading.Thread(target=_refrescar, name="refresco-indice-local", daemon=True).start()
+
+    def esta_vigente(self) -> bool:
+        """True if the mirror was synced within the staleness limit."""
+        return time.time() - self.ultima_sincronizacion <= self.max_antiguedad
+
+    def buscar(self, vector: List[float], k: int = 3) -> List[Tuple[object, str, float]]:
+        """
+        Return the top-k points by cosine similarity.
+
+        Args:
+            vector (List[float]): Query embedding.
+            k (int): Number of results.
+
+        Returns:
+            List[Tuple[id, str, float]]: (point id, text, score) sorted by descending score.
+        """
+        ids, textos, matriz = self._datos
+        if not ids:
+            return []
+
+        consulta = np.asarray(vector, dtype=np.float32)
+        norma = np.linalg.norm(consulta)
+        if norma:
+            consulta = consulta / norma
+
+        puntuaciones = (matriz @ consulta.astype(self.dtype)).astype(np.float32)
+        k = min(k, len(ids))
+        mejores = np.argpartition(-puntuaciones, k - 1)[:k]
+        mejores = mejores[np.argsort(-puntuaciones[mejores])]
+
+        return [(ids[i], textos[i], float(puntuaciones[i])) for i in mejores]
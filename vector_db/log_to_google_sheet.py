@@ -1,41 +1,339 @@
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from datetime import datetime
+"""Conversation logging for ItsMeHi.
+
+Log entries are written to a local append-only write-ahead log (JSONL) and
+queued for a background worker, so the request cycle never waits on the
+Google Sheets API. The worker flushes batches with ``append_rows`` when the
+batch is full or the flush interval elapses, and retries with backoff on
+quota or network errors. The Sheets connection itself is opened by the
+worker and retried the same way, so a failure at startup does not switch the
+process to the local file for good. Entries not yet confirmed by the sink are
+replayed from the write-ahead log after outages or restarts.
+
+Classes:
+    SinkGoogleSheets: Destination that appends rows to the first sheet of SHEET_ID.
+    SinkGoogleSheetsReconectable: Google Sheets destination that connects from the worker and retries.
+    SinkArchivoLocal: Destination that appends rows to a local CSV file (stand-in for tests).
+    RegistroEscrituraAnticipada: Append-only JSONL write-ahead log with acknowledgements.
+    RegistradorAsincrono: Bounded queue plus worker thread that batches rows into a sink.
+
+Functions:
+    log_to_google_sheet(pregunta, respuesta): Queue a conversation entry without blocking.
+"""
+
+# === Imports ===
 import os
+import csv
 import json
+import time
+import uuid
+import queue
+import atexit
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Set
 import streamlit as st
 from dotenv import load_dotenv
+from config.settings import cargar_configuracion
+from utils.metrics import incrementar, medir_etapa, registrar_gauge
 
 # === Load environment variables ===
 load_dotenv()
 
 # === Constants ===
 SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-SERVICE_ACCOUNT_INFO = json.loads(os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON"))
 SHEET_ID = os.getenv("SHEET_ID")
+LOG_SINK = os.getenv("LOG_SINK", "sheets").lower()  # "sheets" or "local"
+RUTA_WAL = Path(os.getenv("LOG_WAL_PATH", "data/logs/pending_logs.jsonl"))
+TAMANO_COLA = int(os.getenv("LOG_QUEUE_SIZE", "1000"))
+TAMANO_LOTE = int(os.getenv("LOG_BATCH_SIZE", "20"))
+INTERVALO_FLUSH = float(os.getenv("LOG_FLUSH_INTERVAL", "5"))  # Seconds
+MAX_ESPERA_REINTENTO = 60.0  # Seconds
+COMPACTAR_WAL_CADA = int(os.getenv("LOG_WAL_COMPACT_EVERY", "200"))  # Acknowledged rows between compactions
+INTERVALO_COMPACTACION_WAL = float(os.getenv("LOG_WAL_COMPACT_INTERVAL", "600"))  # Seconds
+
+CONFIG = cargar_configuracion()
+
+# === Sinks ===
+class SinkGoogleSheets:
+    """Append rows to the first sheet of the configured spreadsheet."""
+
+    def __init__(self):
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+
+        info_cuenta = json.loads(os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON"))
+        credentials = ServiceAccountCredentials.from_json_keyfile_dict(info_cuenta, scopes=SCOPE)
+        client = gspread.authorize(credentials)
+        self.sheet = client.open_by_key(SHEET_ID).sheet1  # Open the first sheet
+
+    def escribir(self, filas: List[List[str]]) -> None:
+        self.sheet.append_rows(filas)
+
+
+class SinkGoogleSheetsReconectable:
+    """
+    Google Sheets destination that opens its connection on the first write.
+
+    Connection errors are raised from ``escribir`` like any write error, so
+    the worker retries them with backoff and the rows stay pending in the
+    write-ahead log. Once the sheet is reachable, the retried batch and every
+    entry left pending in the meantime are written to it.
+    """
+
+    def __init__(self, conectar=SinkGoogleSheets):
+        self._conectar = conectar
+        self._sink = None
+
+    def escribir(self, filas: List[List[str]]) -> None:
+        if self._sink is None:
+            self._sink = self._conectar()
+            print("✅ Connected to Google Sheets.")
+        self._sink.escribir(filas)
+
+
+class SinkArchivoLocal:
+    """Append rows to a local CSV file."""
+
+    def __init__(self, ruta: Path = CONFIG["path_logs"]):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+
+    def escribir(self, filas: List[List[str]]) -> None:
+        with self.ruta.open("a", newline="", encoding="utf-8") as archivo:
+            csv.writer(archivo).writerows(filas)
+
+# === Write-ahead log ===
+class RegistroEscrituraAnticipada:
+    """
+    Append-only JSONL write-ahead log.
+
+    Each entry is written as ``{"id": ..., "fila": [...]}`` before it is queued.
+    Once the sink confirms a batch, an ``{"ack": [ids]}`` record is appended.
+    Entries without an acknowledgement are pending and get replayed. The log
+    is compacted after ``compactar_cada`` acknowledged rows or every
+    ``intervalo_compactacion`` seconds, so it only grows with pending entries.
+    """
+
+    def __init__(self, ruta: Path, compactar_cada: int = COMPACTAR_WAL_CADA,
+                 intervalo_compactacion: float = INTERVALO_COMPACTACION_WAL):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self.compactar_cada = max(1, compactar_cada)
+        self.intervalo_compactacion = intervalo_compactacion
+        self._confirmadas = 0  # Acknowledged rows since the last compaction
+        self._ultima_compactacion = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _anexar(self, registro: dict) -> None:
+        with self.ruta.open("a", encoding="utf-8") as archivo:
+            archivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            archivo.flush()
+            os.fsync(archivo.fileno())
+
+    def anadir(self, entrada: dict) -> None:
+        with self._lock:
+            self._anexar(entrada)
+
+    def confirmar(self, ids: List[str]) -> None:
+        with self._lock:
+            self._anexar({"ack": ids})
+            self._confirmadas += len(ids)
+            if (self._confirmadas >= self.compactar_cada
+                    or time.monotonic() - self._ultima_compactacion >= self.intervalo_compactacion):
+                self._compactar()
+
+    def _leer_pendientes(self) -> List[dict]:
+        if not self.ruta.exists():
+            return []
+
+        entradas, confirmadas = {}, set()
+        with self.ruta.open(encoding="utf-8") as archivo:
+            for linea in archivo:
+                try:
+                    registro = json.loads(linea)
+                except ValueError:
+                    continue  # Torn last line after a crash
+                if "ack" in registro:
+                    confirmadas.update(registro["ack"])
+                else:
+                    entradas[registro["id"]] = registro
+
+        return [entrada for clave, entrada in entradas.items() if clave not in confirmadas]
+
+    def pendientes(self) -> List[dict]:
+        with self._lock:
+            return self._leer_pendientes()
+
+    def _compactar(self) -> None:
+        pendientes = self._leer_pendientes()
+        temporal = self.ruta.with_suffix(".tmp")
+        with temporal.open("w", encoding="utf-8") as archivo:
+            for entrada in pendientes:
+                archivo.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(temporal, self.ruta)
+        self._confirmadas = 0
+        self._ultima_compactacion = time.monotonic()
+
+    def compactar(self) -> None:
+        """Rewrite the log keeping only pending entries."""
+        with self._lock:
+            self._compactar()
+
+# === Asynchronous logger ===
+class RegistradorAsincrono:
+    """
+    Non-blocking conversation logger.
+
+    ``registrar`` writes the row to the write-ahead log and puts it in a bounded
+    queue. A worker thread flushes batches to the sink on size or interval
+    triggers. If the queue is full the row stays in the write-ahead log and is
+    sent once the sink catches up.
+    """
+
+    def __init__(self, sink, wal: RegistroEscrituraAnticipada, tamano_cola: int = TAMANO_COLA,
+                 tamano_lote: int = TAMANO_LOTE, intervalo_flush: float = INTERVALO_FLUSH):
+        self.sink = sink
+        self.wal = wal
+        self.tamano_lote = max(1, tamano_lote)
+        self.intervalo_flush = intervalo_flush
+        self.enviadas = 0
+        self.aplazadas = 0
+        self._cola: "queue.Queue[dict]" = queue.Queue(maxsize=tamano_cola)
+        self._ids_en_cola: Set[str] = set()
+        self._requiere_reenvio = True  # Replay whatever a previous run left pending
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, name="registrador-sheets", daemon=True)
+        self._hilo.start()
+
+    def registrar(self, pregunta: str, respuesta: str) -> bool:
+        """
+        Queue a conversation entry.
+
+        Returns:
+            bool: False if the queue was full (the entry is still kept in the
+            write-ahead log and will be sent later).
+        """
+        fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        entrada = {"id": uuid.uuid4().hex, "fila": [fecha, pregunta, respuesta]}
+
+        try:
+            with medir_etapa("log_encolar"), self._lock:
+                self.wal.anadir(entrada)
+                self._cola.put_nowait(entrada)
+                self._ids_en_cola.add(entrada["id"])
+            return True
+        except queue.Full:
+            self.aplazadas += 1
+            incrementar("log_rows_deferred_total")
+            self._requiere_reenvio = True
+            print("⚡ Log queue full: entry kept in the write-ahead log for later replay.")
+            return False
+
+    def profundidad_cola(self) -> int:
+        return self._cola.qsize()
+
+    def _recoger_lote(self) -> List[dict]:
+        try:
+            lote = [self._cola.get(timeout=self.intervalo_flush)]
+        except queue.Empty:
+            return []
+
+        limite = time.monotonic() + self.intervalo_flush
+        while len(lote) < self.tamano_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._cola.get(timeout=restante))
+            except queue.Empty:
+                break
+
+        return lote
+
+    def _enviar(self, lote: List[dict]) -> bool:
+        """Write a batch to the sink, retrying with backoff until it succeeds or the logger stops."""
+        espera = 1.0
+        while True:
+            try:
+                with medir_etapa("log_envio"):
+                    self.sink.escribir([entrada["fila"] for entrada in lote])
+                break
+            except Exception as error:
+                incrementar("log_sink_errors_total")
+                print(f"⚡ Error saving logs ({len(lote)} rows), retrying in {espera:.0f}s: {error}")
+                self._requiere_reenvio = True
+                if self._parar.wait(espera):
+                    return False
+                espera = min(espera * 2, MAX_ESPERA_REINTENTO)
+
+        ids = [entrada["id"] for entrada in lote]
+        self.wal.confirmar(ids)
+        with self._lock:
+            self._ids_en_cola.difference_update(ids)
+        self.enviadas += len(lote)
+        incrementar("log_rows_sent_total", len(lote))
+        print(f"✅ {len(lote)} log rows saved.")
+        return True
+
+    def _reenviar_pendientes(self) -> None:
+        """Send write-ahead log entries that are pending but not queued, then compact the log."""
+        self._requiere_reenvio = False
+        with self._lock:
+            pendientes = [entrada for entrada in self.wal.pendientes() if entrada["id"] not in self._ids_en_cola]
+
+        for inicio in range(0, len(pendientes), self.tamano_lote):
+            if not self._enviar(pendientes[inicio:inicio + self.tamano_lote]):
+                return
+
+        self.wal.compactar()
+
+    def _bucle(self) -> None:
+        while not self._parar.is_set():
+            lote = self._recoger_lote()
+            if lote and not self._enviar(lote):
+                return
+            if self._requiere_reenvio and self._cola.empty():
+                self._reenviar_pendientes()
+
+    def vaciar(self, timeout: float = 10.0) -> None:
+        """Wait until the queue has been flushed, up to ``timeout`` seconds."""
+        limite = time.monotonic() + timeout
+        while time.monotonic() < limite:
+            with self._lock:
+                if not self._ids_en_cola:
+                    return
+            time.sleep(0.05)
+
+    def detener(self, timeout: float = 5.0) -> None:
+        """Flush what can be flushed within ``timeout`` and stop the worker."""
+        self.vaciar(timeout)
+        self._parar.set()
+        self._hilo.join(timeout)
+
+
+def _crear_sink():
+    if LOG_SINK == "local":
+        return SinkArchivoLocal()
+    if not SHEET_ID or not os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON"):
+        # Missing configuration will not fix itself; transient errors are retried by the worker
+        print(f"⚡ Google Sheets is not configured, logging to {CONFIG['path_logs']}.")
+        return SinkArchivoLocal()
+    return SinkGoogleSheetsReconectable()
+
 
-# === Load credentials and connect to sheet ===
-credentials = ServiceAccountCredentials.from_json_keyfile_dict(SERVICE_ACCOUNT_INFO, scopes=SCOPE)
-client = gspread.authorize(credentials)
+@st.cache_resource(show_spinner=False)
+def obtener_registrador() -> RegistradorAsincrono:
+    """Return the process-wide asynchronous logger."""
+    registrador = RegistradorAsincrono(_crear_sink(), RegistroEscrituraAnticipada(RUTA_WAL))
+    atexit.register(registrador.detener)
+    registrar_gauge("log_queue_depth", registrador.profundidad_cola, "Log rows waiting for the sink.")
+    return registrador
 
-try:
-    sheet = client.open_by_key(SHEET_ID).sheet1  # Open the first sheet
-except Exception as e:
-    st.error(f"⚡ Error connecting to Google Sheets: {e}")
-    sheet = None  # Disable logging if connection fails
 
 def log_to_google_sheet(pregunta: str, respuesta: str) -> None:
-    """Append a new conversation entry to Google Sheets safely."""
-    if sheet is None:
-        # No sheet connected, skip logging
-        print("⚡ Skipping logging: No connection to Google Sheets.")
-        return
-
-    fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    fila = [fecha, pregunta, respuesta]
-
-    try:
-        sheet.append_row(fila)
-        print(f"✅ Log saved to Google Sheets: {fila}")
-    except Exception as e:
-        st.error(f"⚡ Error saving log to Google Sheets: {e}")
+    """Queue a new conversation entry for Google Sheets without blocking the request."""
+    obtener_registrador().registrar(pregunta, respuesta)
@@ -0,0 +1,306 @@
+"""
+snapshot_collection.py
+
+Streaming snapshot export and import for the ItsMeHi Qdrant collection.
+
+A snapshot is a directory with:
+    vectores.npy    -> float32 matrix (points x dimension), written through a memory map
+    payloads.jsonl  -> one {"id", "payload"} object per point, in matrix row order
+    manifest.json   -> collection, embedding model, dimension, distance and point count
+
+Export streams the collection with paginated scroll, so memory stays flat
+regardless of its size. Import reads the payloads line by line alongside the
+memory-mapped matrix and recreates the points with parallel batched upserts,
+keeping only a bounded number of batches in flight, without re-embedding.
+``cargar_snapshot`` opens the matrix memory-mapped for offline work without
+touching Qdrant.
+
+Usage:
+    python vector_db/snapshot_collection.py exportar data/snapshots/2024-06-01
+    python vector_db/snapshot_collection.py importar data/snapshots/2024-06-01 --hilos 4
+"""
+
+# === Imports ===
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import os
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterator, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+from vector_db.collection_profile import crear_coleccion
+from vector_db.embedding_client import DIMENSION_EMBEDDING, modelo_embeddings
+
+# === Load environment variables ===
+load_dotenv()
+
+# === Constants ===
+NOMBRE_COLECCION = "itsmehi_collection"
+VERSION_FORMATO = 1
+ARCHIVO_VECTORES = "vectores.npy"
+ARCHIVO_PAYLOADS = "payloads.jsonl"
+ARCHIVO_MANIFIESTO = "manifest.json"
+
+# === Snapshot ===
+class Snapshot:
+    """
+    Snapshot opened from disk with the vector matrix memory-mapped.
+
+    Attributes:
+        manifiesto (dict): Snapshot metadata.
+        ids (list): Point ids, in matrix row order.
+        payloads (List[dict]): Point payloads, in matrix row order.
+        vectores (np.ndarray): Read-only memory-mapped float32 matrix.
+    """
+
+    def __init__(self, manifiesto: dict, ids: list, payloads: List[dict], vectores: np.ndarray):
+        self.manifiesto = manifiesto
+        self.ids = ids
+        self.payloads = payloads
+        self.vectores = vectores
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def lotes(self, tamano: int) -> Iterator[List[PointStruct]]:
+        """Yield the snapshot as batches of points ready to upsert."""
+        for inicio in range(0, len(self), tamano):
+            fin = min(inicio + tamano, len(self))
+            yield [
+                PointStruct(id=clave, vector=vector, payload=payload)
+                for clave, vector, payload in zip(
+                    self.ids[inicio:fin], self.vectores[inicio:fin].tolist(), self.payloads[inicio:fin]
+                )
+            ]
+
+
+def _scroll(cliente: QdrantClient, coleccion: str, tamano_pagina: int):
+    desplazamiento = None
+    while True:
+        puntos, desplazamiento = cliente.scroll(
+            collection_name=coleccion,
+            limit=tamano_pagina,
+            offset=desplazamiento,
+            with_payload=True,
+            with_vectors=True,
+        )
+        yield from puntos
+        if desplazamiento is None:
+            break
+
+
+def exportar_snapshot(
+    cliente: QdrantClient,
+    destino: Path,
+    coleccion: str = NOMBRE_COLECCION,
+    tamano_pagina: int = 256,
+) -> dict:
+    """
+    Stream a collection to a snapshot directory.
+
+    The vector matrix is preallocated from the point count and filled page by
+    page through a memory map. Points added while the export runs are left out
+    (and reported); points removed leave the matrix shorter, as the manifest says.
+
+    Args:
+        cliente (QdrantClient): Connected Qdrant client.
+        destino (Path): Output directory (created if needed).
+        coleccion (str): Collection to export.
+        tamano_pagina (int): Points per scroll request.
+
+    Returns:
+        dict: The written manifest.
+    """
+    destino = Path(destino)
+    destino.mkdir(parents=True, exist_ok=True)
+
+    info = cliente.get_collection(coleccion)
+    parametros = info.config.params.vectors
+    total = cliente.count(collection_name=coleccion, exact=True).count
+
+    vectores = np.lib.format.open_memmap(
+        destino / ARCHIVO_VECTORES, mode="w+", dtype=np.float32, shape=(total, parametros.size)
+    )
+    escritos = 0
+    omitidos = 0
+
+    with (destino / ARCHIVO_PAYLOADS).open("w", encoding="utf-8") as archivo:
+        for punto in _scroll(cliente, coleccion, tamano_pagina):
+            if escritos == total:
+                omitidos += 1
+                continue
+            vectores[escritos] = punto.vector
+            archivo.write(json.dumps({"id": punto.id, "payload": punto.payload}, ensure_ascii=False) + "\n")
+            escritos += 1
+
+    vectores.flush()
+    del vectores
+
+    if omitidos:
+        print(f"⚡ {omitidos} points were added during the export and are not in the snapshot.")
+
+    manifiesto = {
+        "version": VERSION_FORMATO,
+        "coleccion": coleccion,
+        "modelo": modelo_embeddings,
+        "dimension": parametros.size,
+        "distancia": str(parametros.distance.value),
+        "puntos": escritos,
+        "creado": datetime.now().isoformat(timespec="seconds"),
+    }
+    (destino / ARCHIVO_MANIFIESTO).write_text(json.dumps(manifiesto, indent=2), encoding="utf-8")
+    return manifiesto
+
+
+def _abrir_snapshot(origen: Path):
+    """Read the manifest and memory-map the matrix, checking both against the payload file."""
+    manifiesto = json.loads((origen / ARCHIVO_MANIFIESTO).read_text(encoding="utf-8"))
+    if manifiesto.get("version") != VERSION_FORMATO:
+        raise ValueError(f"⚠️ Unsupported snapshot version: {manifiesto.get('version')}")
+
+    with (origen / ARCHIVO_PAYLOADS).open("rb") as archivo:
+        lineas = sum(1 for _ in archivo)
+
+    vectores = np.load(origen / ARCHIVO_VECTORES, mmap_mode="r")[: manifiesto["puntos"]]
+    if lineas != manifiesto["puntos"] or vectores.shape != (manifiesto["puntos"], manifiesto["dimension"]):
+        raise ValueError(f"⚠️ Snapshot {origen} is incomplete or does not match its manifest.")
+
+    return manifiesto, vectores
+
+
+def _leer_lotes(origen: Path, vectores: np.ndarray, tamano: int) -> Iterator[List[PointStruct]]:
+    """Yield batches of points, reading the payloads lazily in step with the memory-mapped rows."""
+    lote, inicio = [], 0
+    with (origen / ARCHIVO_PAYLOADS).open(encoding="utf-8") as archivo:
+        for linea in archivo:
+            lote.append(json.loads(linea))
+            if len(lote) == tamano:
+                filas = vectores[inicio:inicio + len(lote)].tolist()
+                yield [PointStruct(id=r["id"], vector=v, payload=r["payload"]) for r, v in zip(lote, filas)]
+                inicio += len(lote)
+                lote = []
+    if lote:
+        filas = vectores[inicio:inicio + len(lote)].tolist()
+        yield [PointStruct(id=r["id"], vector=v, payload=r["payload"]) for r, v in zip(lote, filas)]
+
+
+def cargar_snapshot(origen: Path) -> Snapshot:
+    """
+    Open a snapshot without touching Qdrant.
+
+    Args:
+        origen (Path): Snapshot directory.
+
+    Returns:
+        Snapshot: Payloads in memory and the vector matrix memory-mapped read-only.
+
+    Raises:
+        ValueError: If the snapshot files do not match the manifest.
+    """
+    origen = Path(origen)
+    manifiesto, vectores = _abrir_snapshot(origen)
+
+    ids, payloads = [], []
+    with (origen / ARCHIVO_PAYLOADS).open(encoding="utf-8") as archivo:
+        for linea in archivo:
+            registro = json.loads(linea)
+            ids.append(registro["id"])
+            payloads.append(registro["payload"])
+
+    return Snapshot(manifiesto, ids, payloads, vectores)
+
+
+def importar_snapshot(
+    cliente: QdrantClient,
+    origen: Path,
+    coleccion: Optional[str] = None,
+    lote: int = 256,
+    hilos: int = 4,
+    recrear: bool = False,
+) -> int:
+    """
+    Restore a snapshot into a collection with parallel batched upserts.
+
+    Payloads are read lazily and at most ``2 * hilos`` batches are built or in
+    flight at a time, so memory stays flat regardless of the snapshot's size.
+
+    Args:
+        cliente (QdrantClient): Connected Qdrant client.
+        origen (Path): Snapshot directory.
+        coleccion (str, optional): Target collection. Defaults to the snapshot's collection.
+        lote (int): Points per upsert request.
+        hilos (int): Concurrent upsert requests.
+        recrear (bool): Drop the target collection before restoring.
+
+    Returns:
+        int: Number of points restored.
+
+    Raises:
+        ValueError: If the snapshot's model or dimension differs from the current embedding model.
+    """
+    origen = Path(origen)
+    manifiesto, vectores = _abrir_snapshot(origen)
+    coleccion = coleccion or manifiesto["coleccion"]
+
+    if manifiesto["dimension"] != DIMENSION_EMBEDDING or manifiesto["modelo"] != modelo_embeddings:
+        raise ValueError(
+            f"⚠️ Snapshot built with {manifiesto['modelo']} ({manifiesto['dimension']} dims), "
+            f"current model is {modelo_embeddings} ({DIMENSION_EMBEDDING} dims)."
+        )
+
+    if recrear and cliente.collection_exists(collection_name=coleccion):
+        cliente.delete_collection(collection_name=coleccion)
+    if not cliente.collection_exists(collection_name=coleccion):
+        crear_coleccion(cliente, coleccion, manifiesto["dimension"])
+
+    en_curso: "deque[Future]" = deque()
+    with ThreadPoolExecutor(max_workers=hilos) as grupo:
+        for puntos in _leer_lotes(origen, vectores, lote):
+            en_curso.append(grupo.submit(cliente.upsert, collection_name=coleccion, points=puntos, wait=True))
+            while len(en_curso) >= 2 * hilos:  # Bound the batches in flight
+                en_curso.popleft().result()
+        while en_curso:
+            en_curso.popleft().result()
+
+    return manifiesto["puntos"]
+
+# === Main ===
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export or restore a snapshot of the ItsMeHi Qdrant collection.")
+    subparsers = parser.add_subparsers(dest="accion", required=True)
+
+    exportar = subparsers.add_parser("exportar", help="Stream the collection to a snapshot directory.")
+    exportar.add_argument("destino", type=Path)
+    exportar.add_argument("--coleccion", default=NOMBRE_COLECCION)
+    exportar.add_argument("--tamano-pagina", type=int, default=256)
+
+    importar = subparsers.add_parser("importar", help="Restore a snapshot directory into a collection.")
+    importar.add_argument("origen", type=Path)
+    importar.add_argument("--coleccion", default=None, help="Defaults to the snapshot's collection.")
+    importar.add_argument("--lote", type=int, default=256)
+    importar.add_argument("--hilos", type=int, default=4)
+    importar.add_argument("--recrear", action="store_true", help="Drop the collection before restoring.")
+
+    args = parser.parse_args()
+    cliente_qdrant = QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"))
+    inicio = time.perf_counter()
+
+    if args.accion == "exportar":
+        manifiesto = exportar_snapshot(cliente_qdrant, args.destino, args.coleccion, args.tamano_pagina)
+        print(f"✅ {manifiesto['puntos']} points exported to {args.destino} in {time.perf_counter() - inicio:.1f}s.")
+    else:
+        puntos = importar_snapshot(cliente_qdrant, args.origen, args.coleccion, args.lote, args.hilos, args.recrear)
+        print(f"✅ {puntos} points restored from {args.origen} in {time.perf_counter() - inicio:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()